@@ -1,6 +1,7 @@
 """Bitfinex main module"""
 from .rest.restv1 import Client
 from .rest.restv2 import Client as ClientV2
+from .rest.async_restv2 import AsyncClient as AsyncClientV2
 from .websockets.client import WssClient
 
 # This is for packward compatability.
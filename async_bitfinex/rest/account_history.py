@@ -0,0 +1,185 @@
+"""Module for streaming the complete history of an account over many REST
+pages"""
+import json
+import re
+from collections import namedtuple
+
+from .history import IncompleteHistoryError, call_client
+
+
+def _row_type(name, fields):
+    """A namedtuple for rows of ``fields`` separated by spaces, where
+    placeholders are written as _ and renamed to _INDEX."""
+    return namedtuple(name, fields, rename=True)
+
+
+LedgerEntry = _row_type("LedgerEntry", "id currency _ mts _ amount balance _ description")
+
+Movement = _row_type(
+    "Movement",
+    "id currency currency_name _ _ mts_started mts_updated _ _ status _ _ amount fees _ _ "
+    "destination_address _ _ _ transaction_id"
+)
+
+HistoricalOrder = _row_type(
+    "HistoricalOrder",
+    "id gid cid symbol mts_create mts_update amount amount_orig type type_prev _ _ flags "
+    "status _ _ price price_avg price_trailing price_aux_limit _ _ _ notify hidden placed_id"
+)
+
+HistoricalTrade = _row_type(
+    "HistoricalTrade",
+    "id symbol mts_create order_id exec_amount exec_price order_type order_price maker fee "
+    "fee_currency"
+)
+
+FundingOffer = _row_type(
+    "FundingOffer",
+    "id symbol mts_created mts_updated amount amount_orig type _ _ flags status _ _ _ rate "
+    "period notify hidden _ renew"
+)
+
+FundingLoan = _row_type(
+    "FundingLoan",
+    "id symbol side mts_create mts_update amount flags status _ _ _ rate period mts_opening "
+    "mts_last_payout notify hidden _ renew _ no_close"
+)
+
+FundingCredit = _row_type("FundingCredit", " ".join(FundingLoan._fields) + " position_pair")
+
+FundingTrade = _row_type("FundingTrade", "id currency mts_create offer_id amount rate period maker")
+
+HISTORY_ENDPOINTS = {
+    "ledgers": ("v2/auth/r/ledgers/{}hist", LedgerEntry, "mts", str.upper, 2500),
+    "movements": ("v2/auth/r/movements/{}hist", Movement, "mts_updated", str.upper, 1000),
+    "orders_history": ("v2/auth/r/orders/{}hist", HistoricalOrder, "mts_update", str, 2500),
+    "trades_history": ("v2/auth/r/trades/{}hist", HistoricalTrade, "mts_create", str, 2500),
+    "funding_offers_history": ("v2/auth/r/funding/offers/{}hist", FundingOffer, "mts_updated",
+                               str, 500),
+    "funding_loans_history": ("v2/auth/r/funding/loans/{}hist", FundingLoan, "mts_update", str,
+                              500),
+    "funding_credits_history": ("v2/auth/r/funding/credits/{}hist", FundingCredit, "mts_update",
+                                str, 500),
+    "funding_trades": ("v2/auth/r/funding/trades/{}hist", FundingTrade, "mts_create", str, 500),
+}
+"""{name: (path format, row type, cursor field, symbol format, max limit)},
+named after the ``ClientV2`` methods of the same endpoints"""
+
+DEFAULT_LIMIT = 25
+"""Rows per request when no limit is given, the default of the endpoints"""
+
+
+_DECODER = json.JSONDecoder()
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def iter_json_rows(text):
+    """Yield the items of a JSON array one at a time, decoding each item only
+    when it is reached instead of the whole document up front."""
+    index = _SEPARATORS.match(text).end()
+    if text[index:index + 1] != "[":
+        raise ValueError("Expected a JSON array, got {!r}".format(text[:100]))
+    index += 1
+    while True:
+        index = _SEPARATORS.match(text, index).end()
+        if text[index:index + 1] == "]":
+            return
+        row, index = _DECODER.raw_decode(text, index)
+        yield row
+
+
+def make_row(row_type, row):
+    """Returns ``row`` as ``row_type``. Fields bitfinex added after the known
+    ones are dropped, missing ones are None."""
+    size = len(row_type._fields)
+    if len(row) < size:
+        row = row + [None] * (size - len(row))
+    return row_type._make(row[:size])
+
+
+async def stream_history(client, endpoint, symbol="", start=None, end=None, limit=None):
+    """Page through the complete history of an authenticated endpoint.
+
+    Pages are requested newest first with the ``end`` cursor set to the
+    time of the oldest row of the previous page, until a page is not full or
+    the rows are older than ``start``. Each page is decoded one row at a time
+    and yielded as a namedtuple, and rows returned again at a page edge are
+    dropped by id, keeping only the ids of the oldest time seen. So memory is
+    bounded by one page however long the history is.
+
+    When a full page holds no new rows, because more rows share its oldest
+    millisecond than fit in a page, it is requested again with a larger
+    limit. ``IncompleteHistoryError`` is raised if even the endpoint maximum
+    is not enough, instead of ending the history early.
+
+    The requests go through the client's ``scheduler`` when it has one, which
+    serves these history calls after order and account calls.
+
+    Parameters
+    ----------
+    client : AsyncClient or Client
+        The authenticated REST v2 client. Sync clients are run in the
+        default executor.
+
+    endpoint : str
+        One of ``HISTORY_ENDPOINTS``, e.g. ledgers or trades_history.
+
+    symbol : str
+        The symbol or currency, e.g. tBTCUSD or BTC. Default: all
+
+    start : int
+        Oldest millisecond timestamp, inclusive. Default: no limit
+
+    end : int
+        Newest millisecond timestamp, inclusive. Default: now
+
+    limit : int
+        Rows per request, at most the endpoint maximum. Default: 25
+
+    Yields
+    ------
+    namedtuple
+        LedgerEntry, Movement, HistoricalOrder, HistoricalTrade, FundingOffer,
+        FundingLoan, FundingCredit or FundingTrade, newest first.
+
+    Example
+    -------
+     ::
+
+        async for entry in stream_history(bfx_client, "ledgers", "BTC"):
+            print(entry.mts, entry.amount, entry.description)
+    """
+    path_format, row_type, cursor_field, format_symbol, max_limit = HISTORY_ENDPOINTS[endpoint]
+    path = path_format.format(format_symbol(symbol) + "/" if symbol else "")
+    cursor = row_type._fields.index(cursor_field)
+    limit = min(limit or DEFAULT_LIMIT, max_limit)
+    page_limit = limit
+    oldest, oldest_ids = None, set()
+    while True:
+        body = {"start": start, "end": end, "limit": page_limit}
+        body = {key: value for key, value in body.items() if value is not None}
+        text = await call_client(client, client.post_raw, path, body)
+        rows = new_rows = 0
+        for row in iter_json_rows(text):
+            rows += 1
+            mts = row[cursor]
+            if start is not None and mts < start:
+                return
+            if oldest is not None and mts >= oldest:
+                if mts > oldest or row[0] in oldest_ids:
+                    continue
+                oldest_ids.add(row[0])
+            else:
+                oldest, oldest_ids = mts, {row[0]}
+            new_rows += 1
+            yield make_row(row_type, row)
+        if rows < page_limit:
+            return
+        if new_rows:
+            end, page_limit = oldest, limit
+        elif page_limit < max_limit:
+            page_limit = min(page_limit * 4, max_limit)
+        else:
+            raise IncompleteHistoryError(
+                "More than {} {} rows at {}".format(max_limit, endpoint, oldest)
+            )
@@ -0,0 +1,172 @@
+"""Bitfinex Rest API V2 implementation for asyncio"""
+import inspect
+import json
+
+import aiohttp
+
+from .restv2 import TIMEOUT, BitfinexException, Client
+from .singleflight import AsyncSingleFlight, request_key
+
+
+async def _result(response):
+    """Await the response of a sync Client method if it is awaitable. Methods
+    answering from the account_cache return plain values."""
+    return await response if inspect.isawaitable(response) else response
+
+
+class AsyncClient(Client):
+    """Asyncio client for the bitfinex.com API REST V2.
+
+    Has the same methods as ``Client``, but they are coroutines sending the
+    requests over a pooled keep-alive ``aiohttp.ClientSession``, so many
+    requests can be in flight at once without blocking the event loop that
+    ``WssClient`` runs on.
+
+    The session is created on first use, inside the running event loop. Close
+    it with ``await client.close()``, or use the client as an async context
+    manager.
+
+    Parameters
+    ----------
+    key : str
+        Bitfinex api key
+
+    secret : str
+        Bitfinex api secret
+
+    nonce_multiplier : Optional float
+        Multiply nonce by this number
+
+    max_connections : Optional int
+        Maximum number of pooled connections. Default: 100
+
+    session : Optional aiohttp.ClientSession
+        Session used for all requests instead of the default one.
+
+    timeout : Optional float
+        Total timeout of each request in seconds. Default: 5.0
+
+    **kwargs
+        Passed on to ``Client``, e.g. account_cache.
+
+    .. Hint::
+
+        Authenticated requests are signed with an increasing nonce when the
+        request is created. Bitfinex rejects a nonce lower than one already
+        used, so authenticated requests sent concurrently can fail if they
+        overtake each other. Use separate api keys for heavy concurrent use.
+
+    Example
+    -------
+     ::
+
+        async with AsyncClient(key, secret) as bfx_client:
+            tickers, wallets = await asyncio.gather(
+                bfx_client.tickers(["tBTCUSD", "tETHUSD"]),
+                bfx_client.wallets_balance()
+            )
+    """
+
+    def __init__(self, key=None, secret=None, nonce_multiplier=1.0,
+                 max_connections=100, timeout=TIMEOUT, **kwargs):
+        self.max_connections = max_connections
+        self._session = None
+        super().__init__(key, secret, nonce_multiplier, timeout=timeout, **kwargs)
+
+    @staticmethod
+    def _create_session(pool_size, retries):
+        """The aiohttp session is created on first use, in the running loop"""
+        return None
+
+    @staticmethod
+    def _create_single_flight():
+        return AsyncSingleFlight()
+
+    @property
+    def session(self):
+        """The pooled ``aiohttp.ClientSession``, created on first use."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    @session.setter
+    def session(self, session):
+        self._session = session
+
+    async def close(self):
+        """Close the session and its pooled connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @staticmethod
+    async def _read_response(response, parse=True):
+        if response.status == 200:
+            if not parse:
+                return await response.text()
+            return await response.json(content_type=None)
+        text = await response.text()
+        try:
+            content = json.loads(text)
+        except ValueError:
+            content = text
+        raise BitfinexException(response.status, response.reason, content)
+
+    async def _post(self, path, payload, verify=False):
+        """
+        Send post request to bitfinex
+        """
+        return json.loads(await self._post_raw(path, payload, verify))
+
+    async def _post_raw(self, path, payload, verify=False):
+        """
+        Send post request to bitfinex and return the unparsed response body
+        """
+        if self.scheduler is not None:
+            await self.scheduler.acquire_async(path)
+        nonce = self._nonce()
+        headers = self._headers(path, nonce, payload)
+        async with self.session.post(self.base_url + path, headers=headers, data=payload,
+                                     ssl=None if verify else False) as response:
+            return await self._read_response(response, parse=False)
+
+    async def _get(self, path, **params):
+        """
+        Send get request to bitfinex. Concurrent requests with the same path
+        and parameters share one response when single_flight is enabled.
+        """
+        if self.single_flight is None:
+            return await self._send_get(path, params)
+        return await self.single_flight.do(request_key(path, params),
+                                           lambda: self._send_get(path, params))
+
+    async def _send_get(self, path, params):
+        """
+        Send get request to bitfinex
+        """
+        if self.scheduler is not None:
+            await self.scheduler.acquire_async(path)
+        params = {key: str(value) for key, value in params.items() if value is not None}
+        async with self.session.get(self.base_url + path, params=params) as response:
+            return await self._read_response(response)
+
+    async def wallets_balance(self):
+        """Coroutine version of ``Client.wallets_balance``"""
+        return await _result(super().wallets_balance())
+
+    async def active_positions(self):
+        """Coroutine version of ``Client.active_positions``"""
+        return await _result(super().active_positions())
+
+    async def margin_info(self, tradepair="base"):
+        """Coroutine version of ``Client.margin_info``"""
+        return await _result(super().margin_info(tradepair))
@@ -0,0 +1,178 @@
+"""Module for the opt-in response cache of public REST endpoints"""
+import functools
+import inspect
+import threading
+import time
+from collections import Counter, OrderedDict
+
+DEFAULT_CACHE_SIZE = 1024
+
+DEFAULT_TTLS = {
+    "symbols": 3600.0,
+    "symbols_details": 3600.0,
+    "platform_status": 5.0,
+    "tickers": 1.0,
+    "ticker": 1.0,
+    "books": 1.0,
+    "stats": 10.0,
+}
+"""Seconds a response is cached, per client method name"""
+
+MISSING = object()
+
+
+class TTLCache:
+    """A bounded mapping where every entry expires after its own TTL and the
+    least recently used entry is evicted when full.
+
+    Hits, misses, expirations and evictions are counted per namespace (e.g.
+    the endpoint name), see ``metrics``. The cache is thread safe, since sync
+    clients use it from executor threads.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of entries.
+
+    clock : func
+        Returns the current time in seconds. Default: time.monotonic
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, clock=time.monotonic):
+        assert maxsize > 0, "maxsize must be positive"
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+        self.expirations = Counter()
+        self.evictions = Counter()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, namespace, key):
+        """Returns the value stored for (namespace, key), or ``MISSING`` if
+        there is none or it has expired."""
+        entry_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                expires, value = entry
+                if expires > self.clock():
+                    self._entries.move_to_end(entry_key)
+                    self.hits[namespace] += 1
+                    return value
+                del self._entries[entry_key]
+                self.expirations[namespace] += 1
+            self.misses[namespace] += 1
+            return MISSING
+
+    def set(self, namespace, key, value, ttl):
+        """Store a value for ``ttl`` seconds, evicting the least recently
+        used entry if the cache is full."""
+        entry_key = (namespace, key)
+        with self._lock:
+            self._entries[entry_key] = (self.clock() + ttl, value)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.maxsize:
+                (evicted_namespace, _), _ = self._entries.popitem(last=False)
+                self.evictions[evicted_namespace] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        """Returns {namespace: {"hits", "misses", "expirations",
+        "evictions", "hit_rate"}}."""
+        with self._lock:
+            namespaces = set(self.hits) | set(self.misses) | set(self.evictions)
+        metrics = {}
+        for namespace in namespaces:
+            lookups = self.hits[namespace] + self.misses[namespace]
+            metrics[namespace] = {
+                "hits": self.hits[namespace],
+                "misses": self.misses[namespace],
+                "expirations": self.expirations[namespace],
+                "evictions": self.evictions[namespace],
+                "hit_rate": self.hits[namespace] / lookups if lookups else 0.0,
+            }
+        return metrics
+
+
+def create_cache(cache=None, cache_ttls=None, cache_size=DEFAULT_CACHE_SIZE):
+    """Returns the (cache, ttls) used by a REST client.
+
+    Parameters
+    ----------
+    cache : bool or TTLCache
+        True to create a cache, or a TTLCache to share between clients.
+        Default: None, no caching unless cache_ttls is given.
+
+    cache_ttls : dict
+        {method name: seconds} overriding ``DEFAULT_TTLS``. A TTL of 0
+        disables caching of that method.
+
+    cache_size : int
+        Maximum number of cached responses when a cache is created.
+    """
+    # An empty TTLCache is falsy, but sharing it still enables caching
+    if not isinstance(cache, TTLCache) and not cache and cache_ttls is None:
+        return None, {}
+    if not isinstance(cache, TTLCache):
+        cache = TTLCache(cache_size)
+    return cache, {**DEFAULT_TTLS, **(cache_ttls or {})}
+
+
+def _freeze(value):
+    """Returns a hashable version of method arguments"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+async def _store_when_done(cache, name, key, response, ttl):
+    value = await response
+    cache.set(name, key, value, ttl)
+    return value
+
+
+async def _cached_value(value):
+    return value
+
+
+def cached(method):
+    """Decorator caching the responses of a REST client method in
+    ``self.cache`` for ``self.cache_ttls[method name]`` seconds.
+
+    Works for sync clients and for awaitable responses of the async client,
+    where the awaited response is cached. Entries are keyed by the client
+    class and ``base_url`` as well as the arguments, so clients of other
+    API versions or hosts sharing a cache do not get each other's responses.
+    Cached responses are shared, so do not modify them.
+    """
+    name = method.__name__
+    # Whether the responses of each client class are awaitable, learned from
+    # the response that was cached
+    awaitable_responses = {}
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        ttl = self.cache_ttls.get(name) if self.cache is not None else None
+        if not ttl:
+            return method(self, *args, **kwargs)
+        key = (type(self), self.base_url, _freeze((args, kwargs)))
+        value = self.cache.get(name, key)
+        if value is not MISSING:
+            return _cached_value(value) if awaitable_responses[type(self)] else value
+        response = method(self, *args, **kwargs)
+        awaitable_responses[type(self)] = inspect.isawaitable(response)
+        if awaitable_responses[type(self)]:
+            return _store_when_done(self.cache, name, key, response, ttl)
+        self.cache.set(name, key, response, ttl)
+        return response
+    return wrapper
@@ -0,0 +1,247 @@
+"""Module for a local on-disk candle store synced from the REST API"""
+import json
+import mmap
+import os
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+
+from .history import CANDLE_COLUMNS, TIMEFRAME_MS, download_candles, new_candle_columns
+
+
+UNSUPPORTED_TIMEFRAMES = ("7D", "14D")
+"""Timeframes the store rejects, since their candles are not aligned to
+multiples of their length since the epoch"""
+
+
+def _typecode(column):
+    return "q" if column == "mts" else "d"
+
+
+def candle_start(timeframe, mts):
+    """Returns the start of the candle containing ``mts``. Monthly candles
+    start on the first day of the calendar month (UTC)."""
+    if timeframe == "1M":
+        moment = datetime.fromtimestamp(mts / 1000, timezone.utc)
+        month = datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+        return int(month.timestamp()) * 1000
+    step = TIMEFRAME_MS[timeframe]
+    return mts // step * step
+
+
+def next_candle_start(timeframe, mts):
+    """Returns the start of the candle after the one containing ``mts``."""
+    if timeframe == "1M":
+        moment = datetime.fromtimestamp(candle_start(timeframe, mts) / 1000, timezone.utc)
+        year, month = divmod(moment.month, 12)
+        following = datetime(moment.year + year, month + 1, 1, tzinfo=timezone.utc)
+        return int(following.timestamp()) * 1000
+    return candle_start(timeframe, mts) + TIMEFRAME_MS[timeframe]
+
+
+def merge_ranges(ranges):
+    """Merge overlapping or adjacent inclusive [start, end] ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def missing_ranges(ranges, start, end):
+    """Returns the parts of [start, end] not covered by the merged ``ranges``."""
+    missing = []
+    for range_start, range_end in ranges:
+        if range_end < start:
+            continue
+        if range_start > end:
+            break
+        if range_start > start:
+            missing.append((start, range_start - 1))
+        start = max(start, range_end + 1)
+    if start <= end:
+        missing.append((start, end))
+    return missing
+
+
+class CandleStore:
+    """Persistent candle history keyed by (symbol, timeframe).
+
+    Every series is a directory ``root/symbol/timeframe`` holding one raw
+    array file per candle column and ``columns.json``, the same layout as
+    ``history.ColumnWriter``, plus the time ranges already synced. Since
+    bitfinex leaves out candles without trades, the synced ranges and not the
+    candles decide what is missing.
+
+    ``sync`` downloads only the missing ranges, and ``read`` memory maps the
+    column files and returns zero-copy memoryview slices, so loading a warm
+    series needs no network and no copying.
+
+    Weekly candles (7D and 14D) are not supported.
+
+    Parameters
+    ----------
+    root : str
+        The store directory, created if it does not exist.
+
+    clock : func
+        Returns the current time in seconds, used to leave out the candle
+        that is still open. Default: time.time
+
+    Example
+    -------
+     ::
+
+        store = CandleStore("candles")
+        await store.sync(client, "tBTCUSD", "1m", start, end)
+        candles = store.read("tBTCUSD", "1m", start, end)
+        print(len(candles["mts"]), max(candles["high"]))
+    """
+
+    def __init__(self, root, clock=time.time):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.clock = clock
+
+    def path(self, symbol, timeframe):
+        return os.path.join(self.root, symbol, timeframe)
+
+    def meta(self, symbol, timeframe):
+        """Returns {"rows", "ranges", "byteorder", "columns"} of a series."""
+        try:
+            with open(os.path.join(self.path(symbol, timeframe), "columns.json")) as meta_file:
+                return json.load(meta_file)
+        except FileNotFoundError:
+            return {
+                "columns": [(column, _typecode(column)) for column in CANDLE_COLUMNS],
+                "byteorder": sys.byteorder,
+                "rows": 0,
+                "ranges": [],
+            }
+
+    def _write_meta(self, path, meta):
+        temp_path = os.path.join(path, "columns.json.tmp")
+        with open(temp_path, "w") as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(temp_path, os.path.join(path, "columns.json"))
+
+    def _map(self, path, column, rows):
+        """Returns a read-only memoryview of a column file."""
+        if not rows:
+            return memoryview(array(_typecode(column)))
+        with open(os.path.join(path, column + ".bin"), "rb") as column_file:
+            mapped = mmap.mmap(column_file.fileno(), 0, access=mmap.ACCESS_READ)
+        size = rows * array(_typecode(column)).itemsize
+        return memoryview(mapped)[:size].cast(_typecode(column))
+
+    def read(self, symbol, timeframe, start=None, end=None):
+        """Returns the stored candles with an MTS in [start, end].
+
+        Returns
+        -------
+        dict
+            {"mts": memoryview, "open": memoryview, ...}, read-only views of
+            the memory mapped column files. Copy them with ``array(typecode,
+            view)`` or ``numpy.asarray(view)`` if needed.
+        """
+        meta = self.meta(symbol, timeframe)
+        assert meta["byteorder"] == sys.byteorder, "store was written with another byte order"
+        path = self.path(symbol, timeframe)
+        columns = {column: self._map(path, column, meta["rows"]) for column in CANDLE_COLUMNS}
+        mts = columns["mts"]
+        first = 0 if start is None else bisect_left(mts, start)
+        last = len(mts) if end is None else bisect_right(mts, end)
+        return {column: values[first:last] for column, values in columns.items()}
+
+    def missing(self, symbol, timeframe, start, end):
+        """Returns the (start, end) ranges that are not synced yet."""
+        return missing_ranges(self.meta(symbol, timeframe)["ranges"], start, end)
+
+    async def sync(self, client, symbol, timeframe, start, end, **kwargs):
+        """Download the candles of [start, end] that are not stored yet.
+
+        The range is widened to whole candles, calendar months for 1M, and
+        the end is capped at the last closed candle, so a candle that is still
+        open is fetched again by the next sync.
+
+        Parameters
+        ----------
+        client : AsyncClient or Client
+            The REST v2 client.
+
+        symbol : str
+            The trading pair, e.g. tBTCUSD.
+
+        timeframe : str
+            Candle timeframe, e.g. 1m.
+
+        start : int
+            First millisecond timestamp, inclusive.
+
+        end : int
+            Last millisecond timestamp, inclusive.
+
+        **kwargs
+            Passed on to ``history.download_candles``, e.g. concurrency.
+
+        Returns
+        -------
+        int
+            The number of candles added.
+        """
+        assert timeframe not in UNSUPPORTED_TIMEFRAMES, "weekly candles are not supported"
+        start = candle_start(timeframe, start)
+        # Synced ranges cover whole candles, up to the last closed one
+        end = min(next_candle_start(timeframe, end),
+                  candle_start(timeframe, int(self.clock() * 1000))) - 1
+        added = 0
+        for missing_start, missing_end in self.missing(symbol, timeframe, start, end):
+            candles = new_candle_columns()
+            async for columns in download_candles(client, timeframe, symbol,
+                                                  missing_start, missing_end, **kwargs):
+                for column in CANDLE_COLUMNS:
+                    candles[column].extend(columns[column])
+            added += self.add(symbol, timeframe, candles, (missing_start, missing_end))
+        return added
+
+    def add(self, symbol, timeframe, candles, synced_range):
+        """Store candle columns that were downloaded for ``synced_range``.
+        Candles after the last stored one are appended to the column files,
+        other candles are merged and the files are replaced. Returns the
+        number of candles added."""
+        path = self.path(symbol, timeframe)
+        os.makedirs(path, exist_ok=True)
+        meta = self.meta(symbol, timeframe)
+        stored = self.read(symbol, timeframe)
+        added = len(candles["mts"])
+        if added and stored["mts"] and candles["mts"][0] <= stored["mts"][-1]:
+            merged = {column: array(_typecode(column), stored[column])
+                      for column in CANDLE_COLUMNS}
+            del stored
+            known = set(merged["mts"])
+            rows = [row for row in zip(*(candles[column] for column in CANDLE_COLUMNS))
+                    if row[0] not in known]
+            added = len(rows)
+            rows.extend(zip(*(merged[column] for column in CANDLE_COLUMNS)))
+            rows.sort()
+            for index, column in enumerate(CANDLE_COLUMNS):
+                values = array(_typecode(column), (row[index] for row in rows))
+                temp_path = os.path.join(path, column + ".bin.tmp")
+                with open(temp_path, "wb") as column_file:
+                    values.tofile(column_file)
+                os.replace(temp_path, os.path.join(path, column + ".bin"))
+        elif added:
+            del stored
+            for column in CANDLE_COLUMNS:
+                with open(os.path.join(path, column + ".bin"), "ab") as column_file:
+                    column_file.truncate(meta["rows"] * array(_typecode(column)).itemsize)
+                    column_file.seek(0, os.SEEK_END)
+                    array(_typecode(column), candles[column]).tofile(column_file)
+        meta["rows"] += added
+        meta["ranges"] = merge_ranges(meta["ranges"] + [list(synced_range)])
+        self._write_meta(path, meta)
+        return added
@@ -0,0 +1,432 @@
+"""Module for downloading historical data that spans many REST pages"""
+import asyncio
+import functools
+import inspect
+import json
+import os
+import sys
+from array import array
+from collections import deque
+
+from .async_restv2 import AsyncClient
+from .scheduler import DEFAULT_FAMILY_LIMITS, RequestScheduler
+
+TIMEFRAME_MS = {
+    "1m": 60000,
+    "5m": 300000,
+    "15m": 900000,
+    "30m": 1800000,
+    "1h": 3600000,
+    "3h": 10800000,
+    "6h": 21600000,
+    "12h": 43200000,
+    "1D": 86400000,
+    "7D": 604800000,
+    "14D": 1209600000,
+    # Months differ in length, overlapping windows are deduplicated by MTS
+    "1M": 2592000000,
+}
+"""Length of a candle in milliseconds, per candle timeframe"""
+
+CANDLE_COLUMNS = ("mts", "open", "close", "high", "low", "volume")
+"""Candle fields in the order bitfinex sends them"""
+
+CANDLES_LIMIT = 10000
+"""Maximum number of candles per candles request"""
+
+TRADE_COLUMNS = {"id": "q", "mts": "q", "amount": "d", "price": "d"}
+"""Public trade fields and array typecodes on trading pairs (e.g. tBTCUSD)"""
+
+FUNDING_TRADE_COLUMNS = {"id": "q", "mts": "q", "amount": "d", "rate": "d", "period": "q"}
+"""Public trade fields and array typecodes on funding currencies (e.g. fUSD)"""
+
+TRADES_LIMIT = 10000
+"""Maximum number of trades per trades request"""
+
+TRADES_WINDOW = 3600000
+"""Default length in milliseconds of the time windows trades are fetched in"""
+
+
+class IncompleteHistoryError(Exception):
+    """Raised when more rows share one millisecond than an endpoint returns
+    per request, so paging by time cannot get past them."""
+    pass
+
+
+HISTORY_SCHEDULER = RequestScheduler({
+    family: None for family in DEFAULT_FAMILY_LIMITS if family != "history"
+})
+"""Paces the downloads of clients without a ``scheduler``, with the default
+"history" family limit. Shared by all such downloads, like the ip limit."""
+
+
+async def call_client(client, method, *args, **kwargs):
+    """Call a REST client method and return the response. Methods of
+    ``AsyncClient`` and coroutine functions are called on the event loop and
+    their awaitable responses awaited, sync clients are run in the default
+    executor so the event loop is not blocked."""
+    if isinstance(client, AsyncClient) or inspect.iscoroutinefunction(method):
+        response = method(*args, **kwargs)
+    else:
+        response = await asyncio.get_event_loop().run_in_executor(
+            None, functools.partial(method, *args, **kwargs)
+        )
+    if inspect.isawaitable(response):
+        response = await response
+    return response
+
+
+def history_scheduler(client):
+    """Returns the scheduler the history requests of ``client`` wait for
+    before they are sent, or None when the client paces them itself with
+    its own ``scheduler``."""
+    return HISTORY_SCHEDULER if getattr(client, "scheduler", None) is None else None
+
+
+def new_candle_columns():
+    """Returns empty candle columns, {"mts": array("q"), "open":
+    array("d"), ...}."""
+    return {
+        column: array("q" if column == "mts" else "d")
+        for column in CANDLE_COLUMNS
+    }
+
+
+def time_windows(start, end, length):
+    """Split [start, end] (millisecond timestamps) into windows of
+    ``length`` milliseconds. Returns a list of inclusive (start, end) pairs."""
+    return [(window_start, min(window_start + length - 1, end))
+            for window_start in range(start, end + 1, length)]
+
+
+def candle_windows(timeframe, start, end, limit=CANDLES_LIMIT):
+    """Split [start, end] (millisecond timestamps) into windows of at most
+    ``limit`` candles. Returns a list of (start, end) pairs."""
+    return time_windows(start, end, TIMEFRAME_MS[timeframe] * limit)
+
+
+def trade_columns(symbol):
+    """Returns the {column: typecode} of the public trades of a symbol."""
+    return FUNDING_TRADE_COLUMNS if symbol.startswith("f") else TRADE_COLUMNS
+
+
+async def _in_order(fetch, windows, concurrency):
+    """Run ``fetch(start, end)`` for every window with up to ``concurrency``
+    windows in flight, and yield the results in window order."""
+    assert concurrency > 0, "concurrency must be positive"
+    windows = iter(windows)
+    tasks = deque()
+
+    def schedule():
+        while len(tasks) < concurrency:
+            window = next(windows, None)
+            if window is None:
+                return
+            tasks.append(asyncio.ensure_future(fetch(*window)))
+
+    try:
+        schedule()
+        while tasks:
+            rows = await tasks.popleft()
+            schedule()
+            yield rows
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _fetch_candle_window(client, timeframe, symbol, start, end, limit, scheduler):
+    """Returns every candle in [start, end], following pages while another
+    candle can start before ``end``, e.g. when the server returns fewer
+    candles per request than ``limit``."""
+    rows = []
+    while start <= end:
+        if scheduler is not None:
+            await scheduler.acquire_async(f"v2/candles/trade:{timeframe}:{symbol}/hist")
+        page = await call_client(client, client.candles, timeframe, symbol, "hist",
+                                 start=start, end=end, limit=limit, sort=1)
+        rows.extend(page)
+        if not page or page[-1][0] < start or page[-1][0] + TIMEFRAME_MS[timeframe] > end:
+            break
+        start = page[-1][0] + 1
+    return rows
+
+
+async def download_candles(client, timeframe, symbol, start, end, limit=CANDLES_LIMIT,
+                           concurrency=4):
+    """Download all candles between two timestamps.
+
+    The range is split into windows of ``limit`` candles, up to
+    ``concurrency`` windows are fetched at once, and the candles are yielded
+    in time order as column arrays, one chunk per window. Candles repeated at
+    window or page edges are dropped by MTS.
+
+    Requests are paced by the client's ``scheduler``, or by
+    ``HISTORY_SCHEDULER`` when it has none, so they stay within the "history"
+    family rate limit.
+
+    Parameters
+    ----------
+    client : AsyncClient or Client
+        The REST v2 client. Sync clients are run in the default executor.
+
+    timeframe : str
+        Candle timeframe, one of ``TIMEFRAME_MS``, e.g. 1m.
+
+    symbol : str
+        The trading pair, e.g. tBTCUSD.
+
+    start : int
+        First millisecond timestamp, inclusive.
+
+    end : int
+        Last millisecond timestamp, inclusive.
+
+    limit : int
+        Candles per request. Default: 10000
+
+    concurrency : int
+        Windows fetched at the same time. Default: 4
+
+    Yields
+    ------
+    dict
+        {"mts": array("q"), "open": array("d"), "close": ..., "high": ...,
+        "low": ..., "volume": ...}
+
+    Example
+    -------
+     ::
+
+        async for columns in download_candles(client, "1m", "tBTCUSD", start, end):
+            print(len(columns["mts"]), max(columns["high"]))
+    """
+    scheduler = history_scheduler(client)
+
+    def fetch(window_start, window_end):
+        return _fetch_candle_window(client, timeframe, symbol, window_start, window_end, limit,
+                                    scheduler)
+
+    last_mts = None
+    async for rows in _in_order(fetch, candle_windows(timeframe, start, end, limit),
+                                concurrency):
+        columns = new_candle_columns()
+        appends = [columns[column].append for column in CANDLE_COLUMNS]
+        for row in rows:
+            if last_mts is not None and row[0] <= last_mts:
+                continue
+            last_mts = row[0]
+            for append, value in zip(appends, row):
+                append(value)
+        if columns["mts"]:
+            yield columns
+
+
+async def _fetch_trade_window(client, symbol, start, end, limit, scheduler):
+    """Returns every trade in [start, end] oldest first. Trades sharing the
+    cursor MTS are fetched again by the next page and deduplicated later.
+    A full page within one millisecond is fetched again with a larger
+    limit, up to ``TRADES_LIMIT``."""
+    rows = []
+    page_limit = limit
+    while start <= end:
+        if scheduler is not None:
+            await scheduler.acquire_async(f"v2/trades/{symbol}/hist")
+        page = await call_client(client, client.trades, symbol,
+                                 start=start, end=end, limit=page_limit, sort=1)
+        rows.extend(page)
+        if len(page) < page_limit:
+            break
+        last_mts = page[-1][1]
+        if last_mts > start:
+            start, page_limit = last_mts, limit
+        elif page_limit < TRADES_LIMIT:
+            page_limit = min(page_limit * 4, TRADES_LIMIT)
+        else:
+            raise IncompleteHistoryError(
+                "More than {} {} trades at {}".format(TRADES_LIMIT, symbol, start)
+            )
+    return rows
+
+
+async def download_trades(client, symbol, start, end, window=TRADES_WINDOW,
+                          limit=TRADES_LIMIT, concurrency=4):
+    """Download all public trades between two timestamps.
+
+    The range is split into time windows of ``window`` milliseconds, up to
+    ``concurrency`` windows are fetched at once and each window is paged
+    oldest first with the ``start`` cursor set to the MTS of the last trade.
+    Trades are yielded in time order as column arrays, one chunk per window,
+    and trades returned twice at page edges are dropped by trade id. Only the
+    ids of the last MTS are kept for that, so memory stays bounded by a
+    window no matter how long the range is. Requests are paced like the ones
+    of ``download_candles``.
+
+    Parameters
+    ----------
+    client : AsyncClient or Client
+        The REST v2 client. Sync clients are run in the default executor.
+
+    symbol : str
+        The trading pair or funding currency, e.g. tBTCUSD or fUSD.
+
+    start : int
+        First millisecond timestamp, inclusive.
+
+    end : int
+        Last millisecond timestamp, inclusive.
+
+    window : int
+        Milliseconds per window. Smaller windows spread busy markets over
+        more concurrent requests. Default: one hour
+
+    limit : int
+        Trades per request. Default: 10000
+
+    concurrency : int
+        Windows fetched at the same time. Default: 4
+
+    Yields
+    ------
+    dict
+        {"id": array("q"), "mts": array("q"), "amount": array("d"),
+        "price": array("d")}, with "rate" and "period" instead of "price" on
+        funding currencies.
+
+    Example
+    -------
+     ::
+
+        async for columns in download_trades(client, "tBTCUSD", start, end):
+            print(len(columns["id"]), sum(columns["amount"]))
+    """
+    typecodes = trade_columns(symbol)
+    limit = min(limit, TRADES_LIMIT)
+
+    scheduler = history_scheduler(client)
+
+    def fetch(window_start, window_end):
+        return _fetch_trade_window(client, symbol, window_start, window_end, limit, scheduler)
+
+    last_mts, last_ids = None, set()
+    async for rows in _in_order(fetch, time_windows(start, end, window), concurrency):
+        columns = {column: array(typecode) for column, typecode in typecodes.items()}
+        appends = [columns[column].append for column in typecodes]
+        for row in rows:
+            trade_id, mts = row[0], row[1]
+            if last_mts is not None and mts <= last_mts:
+                if mts < last_mts or trade_id in last_ids:
+                    continue
+                last_ids.add(trade_id)
+            else:
+                last_mts, last_ids = mts, {trade_id}
+            for append, value in zip(appends, row):
+                append(value)
+        if columns["id"]:
+            yield columns
+
+
+class ColumnWriter:
+    """Appends column arrays to a directory with one raw file per column.
+
+    ``columns.json`` holds the column names, array typecodes, byte order and
+    number of rows. It is removed when writing starts and only written by
+    ``close``, which the context manager skips when an exception is raised,
+    so an interrupted write does not read back as complete. A column file
+    can be read back with ``array.fromfile`` or memory mapped, see
+    ``read_columns``.
+
+    Parameters
+    ----------
+    path : str
+        The directory, created if it does not exist.
+
+    typecodes : dict
+        {column: array typecode}, e.g. ``TRADE_COLUMNS``.
+
+    Example
+    -------
+     ::
+
+        with ColumnWriter("trades/tBTCUSD", TRADE_COLUMNS) as writer:
+            writer.write(columns)
+    """
+
+    def __init__(self, path, typecodes):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.typecodes = dict(typecodes)
+        self.rows = 0
+        try:
+            os.remove(os.path.join(path, "columns.json"))
+        except FileNotFoundError:
+            pass
+        self._files = {
+            column: open(os.path.join(path, column + ".bin"), "wb")
+            for column in self.typecodes
+        }
+
+    def write(self, columns):
+        """Append a chunk of {column: array}, all of the same length."""
+        lengths = {len(columns[column]) for column in self.typecodes}
+        assert len(lengths) == 1, "columns must have the same length"
+        for column, typecode in self.typecodes.items():
+            values = columns[column]
+            if not isinstance(values, array) or values.typecode != typecode:
+                values = array(typecode, values)
+            values.tofile(self._files[column])
+        self.rows += lengths.pop()
+
+    def close(self, complete=True):
+        """Close the column files and write ``columns.json``, unless
+        ``complete`` is False."""
+        for column_file in self._files.values():
+            column_file.close()
+        if not complete:
+            return
+        with open(os.path.join(self.path, "columns.json"), "w") as meta_file:
+            json.dump({
+                "columns": list(self.typecodes.items()),
+                "byteorder": sys.byteorder,
+                "rows": self.rows,
+            }, meta_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(complete=exc_type is None)
+
+
+def read_columns(path):
+    """Read a directory written by ``ColumnWriter``. Returns {column:
+    array}."""
+    with open(os.path.join(path, "columns.json")) as meta_file:
+        meta = json.load(meta_file)
+    columns = {}
+    for column, typecode in meta["columns"]:
+        values = array(typecode)
+        with open(os.path.join(path, column + ".bin"), "rb") as column_file:
+            values.fromfile(column_file, meta["rows"])
+        if meta["byteorder"] != sys.byteorder:
+            values.byteswap()
+        columns[column] = values
+    return columns
+
+
+async def save_trades(client, symbol, path, start, end, **kwargs):
+    """Download public trades with ``download_trades`` and write them to
+    ``path`` with a ``ColumnWriter`` as they arrive. Returns the number of
+    trades written.
+
+    Example
+    -------
+     ::
+
+        await save_trades(client, "tBTCUSD", "trades/tBTCUSD", start, end)
+        trades = read_columns("trades/tBTCUSD")
+    """
+    with ColumnWriter(path, trade_columns(symbol)) as writer:
+        async for columns in download_trades(client, symbol, start, end, **kwargs):
+            writer.write(columns)
+    return writer.rows
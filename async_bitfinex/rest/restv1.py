@@ -7,8 +7,10 @@ from json.decoder import JSONDecodeError
 import base64
 import hmac
 import hashlib
-import requests
 from .. import utils
+from .cache import DEFAULT_CACHE_SIZE, cached, create_cache
+from .session import DEFAULT_POOL_SIZE, DEFAULT_RETRIES, create_session
+from .singleflight import SingleFlight, request_key
 
 PROTOCOL = "https"
 HOST = "api.bitfinex.com"
@@ -50,6 +52,39 @@ class Client:
     nonce_multiplier : Optional float
         Multiply nonce by this number
 
+    session : Optional requests.Session
+        Session used for all requests. Default: a pooled session from
+        ``session.create_session(pool_size, retries)``
+
+    pool_size : Optional int
+        Number of connections kept alive. Default: 10
+
+    retries : Optional int
+        Maximum number of retries per request. Default: 3
+
+    timeout : Optional float
+        Request timeout in seconds. Default: 5.0
+
+    cache : Optional bool or TTLCache
+        True to cache public endpoint responses, or a ``cache.TTLCache`` to
+        share between clients. Default: None (no caching)
+
+    cache_ttls : Optional dict
+        {method name: seconds} overriding ``cache.DEFAULT_TTLS``. Also
+        enables the cache when given.
+
+    cache_size : Optional int
+        Maximum number of cached responses. Default: 1024
+
+    single_flight : Optional bool
+        Share one request and response between concurrent calls with the
+        same path and parameters. Default: True
+
+    scheduler : Optional RequestScheduler
+        Paces requests with per endpoint family rate limits and priorities,
+        see ``scheduler.RequestScheduler``. Can be shared between clients.
+        Default: None (no pacing)
+
     Examples
     --------
      ::
@@ -57,15 +92,25 @@ class Client:
         bfx_client = Client(key,secret)
 
         bfx_client = Client(key,secret,2.0)
+
+        bfx_client = Client(key, secret, pool_size=20, retries=0, timeout=2.0)
     """
 
-    def __init__(self, key=None, secret=None, nonce_multiplier=1.0):
+    def __init__(self, key=None, secret=None, nonce_multiplier=1.0, session=None,
+                 pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, timeout=TIMEOUT,
+                 cache=None, cache_ttls=None, cache_size=DEFAULT_CACHE_SIZE,
+                 single_flight=True, scheduler=None):
         assert isinstance(nonce_multiplier, float), "nonce_multiplier must be decimal"
         self.url = "%s://%s/%s" % (PROTOCOL, HOST, VERSION)
         self.base_url = "%s://%s/" % (PROTOCOL, HOST)
         self.key = key
         self.secret = secret
         self.nonce_multiplier = nonce_multiplier
+        self.session = session or create_session(pool_size, retries)
+        self.timeout = timeout
+        self.cache, self.cache_ttls = create_cache(cache, cache_ttls, cache_size)
+        self.single_flight = SingleFlight() if single_flight else None
+        self.scheduler = scheduler
 
     def server(self):
         return u"{0:s}://{1:s}/{2:s}".format(PROTOCOL, HOST, VERSION)
@@ -107,20 +152,30 @@ class Client:
         }
 
     def _get(self, url):
-        response = requests.get(url, timeout=TIMEOUT)
+        if self.single_flight is None:
+            return self._send_get(url)
+        return self.single_flight.do(request_key(url), lambda: self._send_get(url))
+
+    def _send_get(self, url):
+        if self.scheduler is not None:
+            self.scheduler.acquire(url[len(self.url) + 1:])
+        response = self.session.get(url, timeout=self.timeout)
         if response.status_code == 200:
             return response.json()
         else:
             try:
                 content = response.json()
             except JSONDecodeError:
-                content = response.text()
+                content = response.text
             raise BitfinexException(response.status_code, response.reason, content)
 
     def _post(self, endoint, payload, verify=True):
+        if self.scheduler is not None:
+            self.scheduler.acquire(endoint, family="auth")
         url = self.url_for(path=endoint)
         signed_payload = self._sign_payload(payload)
-        response = requests.post(url, headers=signed_payload, verify=verify)
+        response = self.session.post(url, headers=signed_payload, verify=verify,
+                                     timeout=self.timeout)
         if response.status_code == 200:
             return response.json()
         elif response.status_code >= 400:
@@ -129,7 +184,7 @@ class Client:
             try:
                 content = response.json()
             except JSONDecodeError:
-                content = response.text()
+                content = response.text
             raise BitfinexException(response.status_code, response.reason, content)
 
     def _build_parameters(self, parameters):
@@ -1170,6 +1225,7 @@ class Client:
         response = self._post("/history/movements", payload=payload, verify=True)
         return response
 
+    @cached
     def symbols(self):
         """
         .. _symbols:
@@ -1200,6 +1256,7 @@ class Client:
         """
         return self._get(self.url_for(PATH_SYMBOLS))
 
+    @cached
     def symbols_details(self):
         """`Bitfinex symbols details reference
         <https://docs.bitfinex.com/v1/reference#rest-public-symbol-details>`_
@@ -1248,6 +1305,7 @@ class Client:
         """
         return self._get(self.url_for("symbols_details"))
 
+    @cached
     def ticker(self, symbol):
         """`Bitfinex ticker reference
         <https://docs.bitfinex.com/v1/reference#rest-public-ticker>`_
@@ -1315,6 +1373,7 @@ class Client:
 
         return self._get(self.url_for(PATH_TODAY, (symbol)))
 
+    @cached
     def stats(self, symbol):
         """`Bitfinex stats reference
         <https://docs.bitfinex.com/v1/reference#rest-public-stats>`_
@@ -7,8 +7,10 @@ import json
 from json.decoder import JSONDecodeError
 import hmac
 import hashlib
-import requests
 from .. import utils
+from .cache import DEFAULT_CACHE_SIZE, cached, create_cache
+from .session import DEFAULT_POOL_SIZE, DEFAULT_RETRIES, create_session
+from .singleflight import SingleFlight, request_key
 
 PROTOCOL = "https"
 HOST = "api-pub.bitfinex.com"
@@ -45,6 +47,49 @@ class Client:
     nonce_multiplier : Optional float
         Multiply nonce by this number
 
+    account_cache : Optional WssClient
+        An authenticated websocket client. When its wallet, position or
+        margin info tables are fresh, ``wallets_balance``,
+        ``active_positions`` and ``margin_info`` answer from them instead of
+        calling the REST api.
+
+    account_cache_max_age : Optional float
+        Seconds since the last auth channel message for the account_cache
+        to count as fresh. Default: 30.0
+
+    session : Optional requests.Session
+        Session used for all requests. Default: a pooled session from
+        ``session.create_session(pool_size, retries)``
+
+    pool_size : Optional int
+        Number of connections kept alive. Default: 10
+
+    retries : Optional int
+        Maximum number of retries per request. Default: 3
+
+    timeout : Optional float
+        Request timeout in seconds. Default: 5.0
+
+    cache : Optional bool or TTLCache
+        True to cache public endpoint responses, or a ``cache.TTLCache`` to
+        share between clients. Default: None (no caching)
+
+    cache_ttls : Optional dict
+        {method name: seconds} overriding ``cache.DEFAULT_TTLS``. Also
+        enables the cache when given.
+
+    cache_size : Optional int
+        Maximum number of cached responses. Default: 1024
+
+    single_flight : Optional bool
+        Share one request and response between concurrent calls with the
+        same path and parameters. Default: True
+
+    scheduler : Optional RequestScheduler
+        Paces requests with per endpoint family rate limits and priorities,
+        see ``scheduler.RequestScheduler``. Can be shared between clients.
+        Default: None (no pacing)
+
     Examples
     --------
      ::
@@ -52,9 +97,18 @@ class Client:
         bfx_client = Client(key,secret)
 
         bfx_client = Client(key,secret,2.0)
+
+        bfx_client = Client(key, secret, account_cache=my_wss_client)
+
+        bfx_client = Client(cache_ttls={"tickers": 0.5})
+        bfx_client.cache.metrics()
     """
 
-    def __init__(self, key=None, secret=None, nonce_multiplier=1.0):
+    def __init__(self, key=None, secret=None, nonce_multiplier=1.0,
+                 account_cache=None, account_cache_max_age=30.0, session=None,
+                 pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, timeout=TIMEOUT,
+                 cache=None, cache_ttls=None, cache_size=DEFAULT_CACHE_SIZE,
+                 single_flight=True, scheduler=None):
         """
         Object initialisation takes 2 mandatory arguments key and secret and a optional one
         nonce_multiplier
@@ -65,6 +119,23 @@ class Client:
         self.key = key
         self.secret = secret
         self.nonce_multiplier = nonce_multiplier
+        self.account_cache = account_cache
+        self.account_cache_max_age = account_cache_max_age
+        self.session = session if session is not None else self._create_session(pool_size, retries)
+        self.timeout = timeout
+        self.cache, self.cache_ttls = create_cache(cache, cache_ttls, cache_size)
+        self.single_flight = self._create_single_flight() if single_flight else None
+        self.scheduler = scheduler
+
+    @staticmethod
+    def _create_session(pool_size, retries):
+        """Returns the default session used for requests"""
+        return create_session(pool_size, retries)
+
+    @staticmethod
+    def _create_single_flight():
+        """Returns the single flight group shared by get requests"""
+        return SingleFlight()
 
     def _nonce(self):
         """Returns a nonce used in authentication.
@@ -92,41 +163,75 @@ class Client:
         """
         Send post request to bitfinex
         """
+        return json.loads(self._post_raw(path, payload, verify))
+
+    def _post_raw(self, path, payload, verify=False):
+        """
+        Send post request to bitfinex and return the unparsed response body
+        """
+        if self.scheduler is not None:
+            self.scheduler.acquire(path)
         nonce = self._nonce()
         headers = self._headers(path, nonce, payload)
-        response = requests.post(self.base_url + path, headers=headers, data=payload, verify=verify)
+        response = self.session.post(self.base_url + path, headers=headers, data=payload,
+                                     verify=verify, timeout=self.timeout)
 
         if response.status_code == 200:
-            return response.json()
+            return response.text
         else:
             try:
                 content = response.json()
             except JSONDecodeError:
-                content = response.text()
+                content = response.text
             raise BitfinexException(response.status_code, response.reason, content)
 
     def _get(self, path, **params):
+        """
+        Send get request to bitfinex. Concurrent requests with the same path
+        and parameters share one response when single_flight is enabled.
+        """
+        if self.single_flight is None:
+            return self._send_get(path, params)
+        return self.single_flight.do(request_key(path, params),
+                                     lambda: self._send_get(path, params))
+
+    def _send_get(self, path, params):
         """
         Send get request to bitfinex
         """
+        if self.scheduler is not None:
+            self.scheduler.acquire(path)
         url = self.base_url + path
-        response = requests.get(url, timeout=TIMEOUT, params=params)
+        response = self.session.get(url, timeout=self.timeout, params=params)
         if response.status_code == 200:
             return response.json()
         else:
             try:
                 content = response.json()
             except JSONDecodeError:
-                content = response.text()
+                content = response.text
             raise BitfinexException(response.status_code, response.reason, content)
 
 
+    def _fresh_account_table(self, table_name, *args):
+        """
+        Returns a table (wallets, positions or margin) from the account_cache
+        if it is fresh enough to answer instead of the REST api, else None.
+        """
+        if self.account_cache is None:
+            return None
+        table = getattr(self.account_cache, table_name)
+        if table.is_fresh(self.account_cache_max_age, *args):
+            return table
+        return None
+
     def _create_url_parameters(self, **kwargs):
         if kwargs:
             params = ['{}={}'.format(key,value) for key,value in kwargs.items()]
             return "?"+"&".join(params)
 
     # REST PUBLIC ENDPOINTS
+    @cached
     def platform_status(self):
         """
         .. _platform_status:
@@ -156,6 +261,7 @@ class Client:
         response = self._get(path)
         return response
 
+    @cached
     def tickers(self, symbol_list):
         """`Bitfinex tickers reference
         <https://bitfinex.readme.io/v2/reference#rest-public-tickers>`_
@@ -246,6 +352,7 @@ class Client:
         response = self._get(path)
         return response
 
+    @cached
     def ticker(self, symbol):
         """`Bitfinex ticker reference
         <https://bitfinex.readme.io/v2/reference#rest-public-ticker>`_
@@ -363,6 +470,7 @@ class Client:
         response = self._get(path)
         return response
 
+    @cached
     def books(self, symbol, precision="P0"):
         """`Bitfinex books reference
         <https://bitfinex.readme.io/v2/reference#rest-public-books>`_
@@ -415,6 +523,7 @@ class Client:
         response = self._get(path)
         return response
 
+    @cached
     def stats(self, **kwargs):
         """`Bitfinex stats reference
         <https://bitfinex.readme.io/v2/reference#rest-public-stats>`_
@@ -687,11 +796,39 @@ class Client:
         return response
 
     # REST AUTHENTICATED ENDPOINTS
+    def post_raw(self, path, body=None):
+        """Send an authenticated request to any v2 endpoint and return the
+        unparsed response body, e.g. to decode large history responses row
+        by row.
+
+        Parameters
+        ----------
+        path : str
+            The endpoint path, e.g. v2/auth/r/ledgers/BTC/hist
+
+        body : dict
+            The request parameters. Default: none
+
+        Returns
+        -------
+        str
+            The response body, a JSON document.
+
+        Example
+        -------
+         ::
+
+            bfx_client.post_raw("v2/auth/r/ledgers/BTC/hist", {"limit": 500})
+
+        """
+        raw_body = json.dumps(body or {})
+        return self._post_raw(path, raw_body, verify=True)
+
     def wallets_balance(self):
         """`Bitfinex wallets balance reference
         <https://bitfinex.readme.io/v2/reference#rest-auth-wallets>`_
 
-        Get account wallets
+        Get account wallets. Answered from the account_cache when it is fresh.
 
         Returns
         -------
@@ -717,6 +854,9 @@ class Client:
             bfx_client.wallets_balance()
 
         """
+        wallets = self._fresh_account_table("wallets")
+        if wallets is not None:
+            return wallets.as_list()
 
         body = {}
         raw_body = json.dumps(body)
@@ -977,7 +1117,7 @@ class Client:
         """`Bitfinex positions reference
         <https://bitfinex.readme.io/v2/reference#rest-auth-positions>`_
 
-        Get active positions
+        Get active positions. Answered from the account_cache when it is fresh.
 
         Returns
         -------
@@ -1008,6 +1148,10 @@ class Client:
             bfx_client.active_positions()
 
         """
+        positions = self._fresh_account_table("positions")
+        if positions is not None:
+            return positions.as_list()
+
         body = {}
         raw_body = json.dumps(body)
         path = "v2/auth/r/positions"
@@ -1447,7 +1591,8 @@ class Client:
         """`Bitfinex margin info reference
         <https://bitfinex.readme.io/v2/reference#rest-auth-info-margin>`_
 
-        Get account margin info
+        Get account margin info. Answered from the account_cache when it
+        is fresh.
 
         Parameters
         ----------
@@ -1494,6 +1639,10 @@ class Client:
             bfx_client.margin_info('tIOTUSD')
 
         """
+        margin = self._fresh_account_table("margin", tradepair)
+        if margin is not None:
+            return margin.as_list(tradepair)
+
         body = {}
         raw_body = json.dumps(body)
         path = "v2/auth/r/info/margin/{}".format(tradepair)
@@ -1542,7 +1691,7 @@ class Client:
         response = self._post(path, raw_body, verify=True)
         return response
 
-    def movements(self, currency=""):
+    def movements(self, currency="", **kwargs):
         """`Bitfinex movements reference
         <https://bitfinex.readme.io/v2/reference#movements>`_
 
@@ -1553,6 +1702,15 @@ class Client:
         Currency : str
             Currency (BTC, ...)
 
+        start : Optional int
+            Millisecond start time
+
+        end : Optional int
+            Millisecond end time
+
+        limit : Optional int
+            Number of records
+
         Returns
         -------
         list
@@ -1594,8 +1752,10 @@ class Client:
 
             bfx_client.movements("BTC")
 
+            bfx_client.movements("BTC", start=1546300800000, limit=100)
+
         """
-        body = {}
+        body = kwargs
         raw_body = json.dumps(body)
         add_currency = "{}/".format(currency.upper()) if currency else ""
         path = "v2/auth/r/movements/{}hist".format(add_currency)
@@ -1802,7 +1962,7 @@ class Client:
         response = self._post(path, raw_body, verify=True)
         return response
 
-    def ledgers(self, currency=""):
+    def ledgers(self, currency="", **kwargs):
         """`Bitfinex ledgers reference
         <https://bitfinex.readme.io/v2/reference#ledgers>`_
 
@@ -1813,6 +1973,15 @@ class Client:
         Currency : str
             Currency (BTC, ...)
 
+        start : Optional int
+            Millisecond start time
+
+        end : Optional int
+            Millisecond end time
+
+        limit : Optional int
+            Number of records
+
         Returns
         -------
         list
@@ -1839,8 +2008,10 @@ class Client:
 
             bfx_client.ledgers('IOT')
 
+            bfx_client.ledgers('IOT', end=1546300800000, limit=500)
+
         """
-        body = {}
+        body = kwargs
         raw_body = json.dumps(body)
         add_currency = "{}/".format(currency.upper()) if currency else ""
         path = "v2/auth/r/ledgers/{}hist".format(add_currency)
@@ -0,0 +1,242 @@
+"""Module for pacing REST requests with per endpoint family rate limits and
+priorities"""
+import asyncio
+import heapq
+import itertools
+import re
+import threading
+import time
+
+from .. import utils
+
+PRIORITY_ORDERS = 0
+PRIORITY_ACCOUNT = 1
+PRIORITY_MARKET = 2
+PRIORITY_HISTORY = 3
+
+DEFAULT_RULES = (
+    # Order related auth calls (v2 and v1)
+    (r"auth/w/order|auth/r/orders$|auth/r/order/|^order/|^orders$", "auth", PRIORITY_ORDERS),
+    # Historical account data
+    (r"auth/r/.*hist|auth/r/ledgers|auth/r/movements|^history|^mytrades|^offers/hist", "auth",
+     PRIORITY_HISTORY),
+    # Other auth calls (v2 and v1)
+    (r"auth/|^(balances|positions|account_infos|margin_infos|summary|key_info|offers"
+     r"|credits|offer/|position/|withdraw|transfer|deposit/)", "auth", PRIORITY_ACCOUNT),
+    # Historical market data
+    (r"candles/.*/hist|trades/.*/hist|^trades/|^lends/|v2/stats1/.*/hist", "history",
+     PRIORITY_HISTORY),
+    (r"tickers", "tickers", PRIORITY_MARKET),
+    (r"", "public", PRIORITY_MARKET),
+)
+"""(path regex, family, priority), the first rule matching a request path
+wins. Paths are relative to the host without a leading slash, e.g.
+v2/auth/r/wallets or v1 paths like order/new."""
+
+DEFAULT_FAMILY_LIMITS = {
+    # Bitfinex allows 10 to 90 requests per minute depending on the endpoint
+    # and blocks the ip for a minute when it is exceeded. The defaults stay
+    # under the limits including the burst.
+    "auth": (80, 10),
+    "public": (80, 10),
+    "tickers": (25, 5),
+    "history": (25, 5),
+}
+"""Token bucket settings per family, {family: (requests per minute, burst)}"""
+
+MIN_POLL = 0.001
+
+
+class _Waiter:
+
+    __slots__ = ("event", "future", "loop", "enqueued", "cancelled")
+
+    def __init__(self, future=None, loop=None):
+        self.event = threading.Event() if future is None else None
+        self.future = future
+        self.loop = loop
+        self.enqueued = time.monotonic()
+        self.cancelled = False
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self.loop:
+            _set_result(self.future)
+        else:
+            self.loop.call_soon_threadsafe(_set_result, self.future)
+
+
+def _set_result(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RequestScheduler:
+    """Paces REST requests with a token bucket per endpoint family and
+    serves waiting requests by priority, then in arrival order.
+
+    Requests are classified by path with ``rules``. Order related auth calls
+    (``PRIORITY_ORDERS``) go before other account calls, market data and
+    historical data pulls (``PRIORITY_HISTORY``) waiting in the same family.
+    The scheduler can be shared by several clients, and used both from
+    threads (``acquire``) and coroutines (``acquire_async``).
+
+    Parameters
+    ----------
+    family_limits : dict
+        {family: (requests per minute, burst)} merged with
+        ``DEFAULT_FAMILY_LIMITS``. Set a value to None to remove a limit.
+
+    rules : tuple
+        (path regex, family, priority) rules. Default: ``DEFAULT_RULES``
+
+    Example
+    -------
+     ::
+
+        scheduler = RequestScheduler({"history": (10, 1)})
+        bfx_client = ClientV2(key, secret, scheduler=scheduler)
+        async_client = AsyncClientV2(key, secret, scheduler=scheduler)
+        scheduler.stats()["history"]["queued"]
+    """
+
+    def __init__(self, family_limits=None, rules=DEFAULT_RULES):
+        limits = dict(DEFAULT_FAMILY_LIMITS)
+        limits.update(family_limits or {})
+        self.buckets = {
+            family: utils.TokenBucket(limit[0] / 60.0, limit[1])
+            for family, limit in limits.items() if limit
+        }
+        self.rules = [(re.compile(pattern), family, priority)
+                      for pattern, family, priority in rules]
+        self._lock = threading.Lock()
+        self._queues = {family: [] for family in self.buckets}
+        self._sequence = itertools.count()
+        self._stats = {
+            family: {
+                "queued": 0,
+                "max_queued": 0,
+                "granted": 0,
+                "delayed": 0,
+                "cancelled": 0,
+                "total_wait": 0.0,
+                "max_wait": 0.0,
+                "granted_by_priority": {},
+            }
+            for family in self.buckets
+        }
+
+    def classify(self, path):
+        """Returns the (family, priority) of a request path. A leading slash,
+        as in the v1 endpoints (/order/new), is ignored."""
+        path = path.lstrip("/")
+        for pattern, family, priority in self.rules:
+            if pattern.search(path):
+                return family, priority
+        return None, PRIORITY_MARKET
+
+    def _enqueue(self, path, priority, family, waiter):
+        rule_family, rule_priority = self.classify(path)
+        family = family or rule_family
+        priority = rule_priority if priority is None else priority
+        if family not in self.buckets:
+            return None, 0.0
+        with self._lock:
+            heapq.heappush(self._queues[family], (priority, next(self._sequence), waiter))
+            stats = self._stats[family]
+            stats["queued"] += 1
+            stats["max_queued"] = max(stats["max_queued"], stats["queued"])
+            delay = self._dispatch(family)
+        return family, delay
+
+    def _dispatch(self, family):
+        """Wake waiting requests while there are tokens. Returns seconds until
+        the next token, or 0 if nothing is waiting. Called with the lock."""
+        queue, bucket, stats = self._queues[family], self.buckets[family], self._stats[family]
+        while queue:
+            priority, _, waiter = queue[0]
+            if waiter.cancelled:
+                heapq.heappop(queue)
+                continue
+            if not bucket.try_consume():
+                return max(bucket.delay(), MIN_POLL)
+            heapq.heappop(queue)
+            waited = time.monotonic() - waiter.enqueued
+            stats["queued"] -= 1
+            stats["granted"] += 1
+            by_priority = stats["granted_by_priority"]
+            by_priority[priority] = by_priority.get(priority, 0) + 1
+            if waited > MIN_POLL:
+                stats["delayed"] += 1
+                stats["total_wait"] += waited
+                stats["max_wait"] = max(stats["max_wait"], waited)
+            waiter.wake()
+        return 0.0
+
+    def acquire(self, path, priority=None, family=None):
+        """Block the calling thread until a request to ``path`` may be sent.
+
+        Parameters
+        ----------
+        path : str
+            The request path, e.g. v2/auth/w/order/submit.
+
+        priority : int
+            Overrides the priority from the rules, lower goes first.
+
+        family : str
+            Overrides the family from the rules.
+        """
+        waiter = _Waiter()
+        family, delay = self._enqueue(path, priority, family, waiter)
+        if family is None:
+            return
+        while not waiter.event.wait(delay):
+            with self._lock:
+                delay = self._dispatch(family) or MIN_POLL
+
+    async def acquire_async(self, path, priority=None, family=None):
+        """Wait until a request to ``path`` may be sent, see ``acquire``."""
+        loop = asyncio.get_event_loop()
+        waiter = _Waiter(loop.create_future(), loop)
+        family, delay = self._enqueue(path, priority, family, waiter)
+        if family is None:
+            return
+        try:
+            while not waiter.future.done():
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), delay)
+                except asyncio.TimeoutError:
+                    with self._lock:
+                        delay = self._dispatch(family) or MIN_POLL
+        except asyncio.CancelledError:
+            with self._lock:
+                if not waiter.future.done():
+                    waiter.cancelled = True
+                    self._stats[family]["queued"] -= 1
+                    self._stats[family]["cancelled"] += 1
+            raise
+
+    def stats(self):
+        """Queue statistics for each family.
+
+        Returns
+        -------
+        dict
+            {family: {"queued", "max_queued", "granted", "delayed",
+            "cancelled", "total_wait", "max_wait", "granted_by_priority",
+            "tokens"}}
+        """
+        with self._lock:
+            return {
+                family: dict(stats,
+                             granted_by_priority=dict(stats["granted_by_priority"]),
+                             tokens=self.buckets[family].tokens)
+                for family, stats in self._stats.items()
+            }
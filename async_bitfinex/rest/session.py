@@ -0,0 +1,44 @@
+"""Module for the pooled HTTP sessions used by the sync REST clients"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, backoff_factor=0.2):
+    """Returns a ``requests.Session`` keeping up to ``pool_size`` connections
+    alive, so calls after the first skip the TCP and TLS handshake.
+
+    Failed connection attempts are retried for every request, since nothing
+    has been sent yet. Read errors and 502/503/504 responses are only retried
+    for GET requests. Authenticated POST requests are signed with a nonce
+    and may not be idempotent, so they are never sent twice.
+
+    Parameters
+    ----------
+    pool_size : int
+        Number of connections kept alive per host.
+
+    retries : int
+        Maximum number of retries per request. 0 disables retries.
+
+    backoff_factor : float
+        Sleep between retries, ``backoff_factor * 2 ** (retry - 1)`` seconds.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -0,0 +1,93 @@
+"""Module for sharing one REST request between concurrent identical calls"""
+import asyncio
+import threading
+
+
+def request_key(path, params=None):
+    """Returns a hashable key for a request path and its parameters"""
+    return (path, tuple(sorted((key, str(value)) for key, value in (params or {}).items())))
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs a function once for all threads calling ``do`` with the same key
+    while it is running. Every caller gets the same result (or exception).
+
+    Attributes
+    ----------
+    calls : int
+        Number of times a function was run.
+    shared : int
+        Number of calls that waited for a running function instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, function):
+        """Returns ``function()``, or the result of the call already running
+        for ``key``."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function()
+            return call.result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """Runs a coroutine once for all coroutines calling ``do`` with the same
+    key while it is running. Every caller gets the same result (or
+    exception). Cancelling one caller does not cancel the shared request.
+
+    Attributes
+    ----------
+    calls : int
+        Number of times a coroutine was run.
+    shared : int
+        Number of calls that waited for a running coroutine instead.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key, coroutine_function):
+        """Returns ``await coroutine_function()``, or the result of the call
+        already running for ``key``."""
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(coroutine_function())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            self.calls += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
@@ -0,0 +1,96 @@
+"""Module for batching single symbol ticker requests into tickers calls"""
+import asyncio
+
+from .history import call_client
+
+
+class TickerBatcher:
+    """Collects ``ticker`` requests over a short window and sends one
+    ``tickers`` call for all requested symbols, then hands each caller the
+    ticker of its symbol, in the same format as ``ticker`` (without the
+    symbol column).
+
+    Requests for a symbol that is already waiting share its future. Works
+    with ``AsyncClient``, and with the sync ``Client`` by running the
+    ``tickers`` call in the default executor.
+
+    Parameters
+    ----------
+    client : AsyncClient or Client
+        The REST v2 client used to send tickers calls.
+
+    window : float
+        Seconds to collect requests before sending them. Default: 0.005
+
+    batch_size : int
+        Maximum symbols per tickers call. Default: 100
+
+    Example
+    -------
+     ::
+
+        batcher = TickerBatcher(AsyncClientV2())
+        btc, eth = await asyncio.gather(
+            batcher.ticker("tBTCUSD"), batcher.ticker("tETHUSD")
+        )
+    """
+
+    def __init__(self, client, window=0.005, batch_size=100):
+        self.client = client
+        self.window = window
+        self.batch_size = batch_size
+        self._pending = {}
+        self._flush_handle = None
+        self.requests = 0
+        self.batches = 0
+
+    def ticker(self, symbol):
+        """Queue a ticker request for the next batch.
+
+        Parameters
+        ----------
+        symbol : str
+            The symbol you want information about, e.g. tBTCUSD or fUSD.
+
+        Returns
+        -------
+        Future
+            Resolves to the ticker of the symbol. Fails with KeyError if the
+            symbol is not in the response.
+        """
+        self.requests += 1
+        future = self._pending.get(symbol)
+        if future is None:
+            future = self._pending[symbol] = asyncio.get_event_loop().create_future()
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_event_loop().call_later(self.window, self.flush)
+        return future
+
+    def flush(self):
+        """Send all queued requests now."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        symbols = list(pending)
+        for start in range(0, len(symbols), self.batch_size):
+            batch = {symbol: pending[symbol] for symbol in symbols[start:start + self.batch_size]}
+            asyncio.ensure_future(self._send(batch))
+
+    async def _send(self, batch):
+        self.batches += 1
+        try:
+            response = await call_client(self.client, self.client.tickers, list(batch))
+        except Exception as error:  # pylint: disable=W0703
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(error)
+            return
+        tickers = {row[0]: row[1:] for row in response}
+        for symbol, future in batch.items():
+            if future.done():
+                continue
+            if symbol in tickers:
+                future.set_result(tickers[symbol])
+            else:
+                future.set_exception(KeyError(symbol))
@@ -1,19 +1,84 @@
 """Module for rest and websocket utilities"""
 import re
+import threading
 import time
 from datetime import datetime
 
+class CidGenerator:
+    """Generates unique, increasing client order ids.
+
+    A cid is the current timestamp * 10 thousand (i.e. in units of 100
+    microseconds), so it can be converted back with ``cid_to_date``. The
+    wall clock is read once and then advanced with a monotonic clock, so cids
+    never go backwards. If two cids would land on the same value the later
+    one is bumped, which makes every cid unique within the generator.
+
+    To keep cids unique across processes, give each process its own
+    ``worker_id`` and the same number of ``workers``. Each worker then only
+    uses cids where ``cid % workers == worker_id``.
+
+    Parameters
+    ----------
+    worker_id : int
+        Id of this worker, from 0 to ``workers - 1``. Default: 0
+
+    workers : int
+        Total number of workers sharing the cid space. Default: 1
+
+    Example
+    -------
+     ::
+
+        cid_generator = CidGenerator(worker_id=2, workers=4)
+        cid = cid_generator()
+    """
+
+    def __init__(self, worker_id=0, workers=1):
+        assert 0 <= worker_id < workers, "worker_id must be in range(workers)"
+        self.worker_id = worker_id
+        self.workers = workers
+        self._wall_start = time.time_ns() // 100000
+        self._monotonic_start = time.monotonic_ns()
+        self._last = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        ticks = self._wall_start + (time.monotonic_ns() - self._monotonic_start) // 100000
+        cid = ticks - ticks % self.workers + self.worker_id
+        with self._lock:
+            if cid <= self._last:
+                cid = self._last + self.workers
+            self._last = cid
+        return cid
+
+_cid_generator = CidGenerator()
+
+def set_cid_worker(worker_id, workers):
+    """Set the worker id used by ``create_cid``. Use a different worker_id in
+    each process that creates orders on the same account to make sure cids
+    are unique across the processes.
+
+    Parameters
+    ----------
+    worker_id : int
+        Id of this worker, from 0 to ``workers - 1``.
+
+    workers : int
+        Total number of workers.
+    """
+    global _cid_generator  # pylint: disable=W0603
+    _cid_generator = CidGenerator(worker_id, workers)
+
 def create_cid():
-    """Create a new Client order id. Based on timestamp multiplied to 10k to
-    make it improbable that two actions are assigned the same cid.
+    """Create a new Client order id. Based on timestamp multiplied to 10k.
+    Cids are unique and increasing within the process (see ``CidGenerator``).
 
     Returns
     -------
     int
         A integer number equal to the current timestamp * 10 thousend.
     """
-    now = datetime.utcnow()
-    return int(float(now.strftime("%s.%f"))*10000)
+    return _cid_generator()
 
 def cid_to_date(cid):
     """Converts a cid to date string YYYY-MM-DD
@@ -69,3 +134,78 @@ def order_symbol(symbol, capital=True):
         return "f{}".format(_symbol)
 
     return symbol
+
+
+class TokenBucket:
+    """Token bucket used to pace requests sent to bitfinex.
+
+    Tokens are refilled continuously at ``rate`` tokens per second, up to
+    ``capacity``. Reservations are allowed to take the bucket into debt, so
+    callers that reserve tokens in turn are given increasing wait times and
+    are released in the order they reserved.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added to the bucket per second.
+
+    capacity : float
+        Maximum number of tokens held by the bucket, i.e. the allowed burst.
+        Defaults to ``rate``.
+
+    clock : func
+        Function returning monotonic time in seconds. Default: ``time.monotonic``
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        assert rate > 0, "rate must be positive"
+        self.rate = float(rate)
+        self.capacity = float(rate if capacity is None else capacity)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    @property
+    def tokens(self):
+        """Tokens currently available. Negative while the bucket is in debt."""
+        self._refill()
+        return self._tokens
+
+    def delay(self, tokens=1):
+        """Seconds until ``tokens`` can be taken without going into debt."""
+        self._refill()
+        missing = tokens - self._tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def try_consume(self, tokens=1):
+        """Take ``tokens`` if they are available right now.
+
+        Returns
+        -------
+        bool
+            True if the tokens were taken, False otherwise.
+        """
+        if self.delay(tokens) > 0:
+            return False
+        self._tokens -= tokens
+        return True
+
+    def reserve(self, tokens=1):
+        """Take ``tokens`` even if the bucket goes into debt.
+
+        Returns
+        -------
+        float
+            Seconds the caller has to wait before acting on the reservation.
+        """
+        wait = self.delay(tokens)
+        self._tokens -= tokens
+        return wait
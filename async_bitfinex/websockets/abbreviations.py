@@ -1,6 +1,7 @@
 """Module for websocket utilities"""
+from types import MappingProxyType
 
-ERROR_CODES = {
+ERROR_CODES = MappingProxyType({
     10000: "Unknown error",
     10001: "Generic error",
     10008: "Concurrency error",
@@ -20,12 +21,12 @@ ERROR_CODES = {
     20060: "Websocket server resyncing... please reconnect later",
     20061: "Websocket server resync complete. please reconnect",
     5000: "Info message",
-}
+})
 
 
 # Abbreviation Glossary
 # https://bitfinex.readme.io/v2/docs/abbreviations-glossary#section-abbreviation-glossary
-NOTIFICATION_CODES = {
+NOTIFICATION_CODES = MappingProxyType({
     "bu": "balance update",
     "ps": "position snapshot",
     "pn": "new position",
@@ -65,12 +66,57 @@ NOTIFICATION_CODES = {
     "hfls": "historical funding loan snapshot",
     "hfts": "historical funding trade snapshot",
     "uac": "user custom price alert",
-}
+    "on-req": "order new request",
+    "ou-req": "order update request",
+    "ox_multi-req": "order multi-op request",
+    "fiu": "funding information update",
+})
+
+NOTIFICATION_DESCRIPTIONS = MappingProxyType({
+    description: code for code, description in NOTIFICATION_CODES.items()
+})
+"""Reverse of NOTIFICATION_CODES, {description: code}"""
 
 
 def get_notification_code(description):
-    index = list(NOTIFICATION_CODES.values()).index(description)
-    return list(NOTIFICATION_CODES.keys())[index]
+    """Returns the abbreviation for a notification description,
+    e.g. "on" for "order new"."""
+    try:
+        return NOTIFICATION_DESCRIPTIONS[description]
+    except KeyError:
+        raise ValueError(f"Unknown notification description: {description}")
+
+
+# Input codes sent over the auth channel
+ORDER_NEW = NOTIFICATION_DESCRIPTIONS["order new"]
+ORDER_UPDATE = NOTIFICATION_DESCRIPTIONS["order update"]
+ORDER_CANCEL = NOTIFICATION_DESCRIPTIONS["order cancel"]
+ORDER_MULTI_OP = NOTIFICATION_DESCRIPTIONS["order multi-op"]
+
+# Request notification codes
+ORDER_NEW_REQUEST = NOTIFICATION_DESCRIPTIONS["order new request"]
+ORDER_UPDATE_REQUEST = NOTIFICATION_DESCRIPTIONS["order update request"]
+ORDER_CANCEL_REQUEST = NOTIFICATION_DESCRIPTIONS["order cancel request"]
+ORDER_MULTI_CANCEL_REQUEST = NOTIFICATION_DESCRIPTIONS["multiple orders cancel request"]
+ORDER_MULTI_OP_REQUEST = NOTIFICATION_DESCRIPTIONS["order multi-op request"]
+
+# Message types grouped by what they describe. Shared by the futures handler
+# and the auth channel dispatcher.
+ORDER_MESSAGES = frozenset(("os", "on", "ou", "oc"))
+POSITION_MESSAGES = frozenset(("ps", "pn", "pu", "pc"))
+WALLET_MESSAGES = frozenset(("ws", "wu"))
+MARGIN_MESSAGES = frozenset(("mis", "miu"))
+TRADE_MESSAGES = frozenset(("te", "tu"))
+STATE_MESSAGES = (ORDER_MESSAGES | POSITION_MESSAGES | WALLET_MESSAGES
+                  | MARGIN_MESSAGES | TRADE_MESSAGES)
+"""Message types kept in the account state tables"""
+CALC_RESULT_MESSAGES = frozenset(("miu", "fiu", "pu", "wu"))
+"""Message types answering a calc request"""
+REQUEST_NOTIFICATIONS = frozenset((
+    ORDER_NEW_REQUEST, ORDER_UPDATE_REQUEST, ORDER_CANCEL_REQUEST,
+    ORDER_MULTI_CANCEL_REQUEST, ORDER_MULTI_OP_REQUEST
+))
+"""Notifications (n) answering an order input"""
 
 
 ORDER_TYPES = [
@@ -89,3 +135,8 @@ ORDER_TYPES = [
     "IOC",
     "EXCHANGE IOC",
 ]
+
+MARKET_ORDER_TYPES = frozenset((
+    "MARKET", "EXCHANGE MARKET", "IOC", "EXCHANGE IOC"
+))
+"""Order types that are closed (oc) instead of opened (on) once placed"""
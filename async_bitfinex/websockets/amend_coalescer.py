@@ -0,0 +1,182 @@
+"""Module for coalescing rapid order updates sent over the bitfinex auth
+channel"""
+from decimal import Decimal
+
+from .futures_handler import TimedFuture
+from .rate_limiter import RateLimitExceeded
+
+
+def merge_order_updates(pending, update):
+    """Merge an order update into a pending one. Later values win, except
+    that deltas are added together, and a delta after an amount changes the
+    amount.
+
+    Parameters
+    ----------
+    pending : dict
+        Order settings not yet sent, or None.
+
+    update : dict
+        New order settings for the same order.
+
+    Returns
+    -------
+    dict
+        The merged order settings.
+    """
+    merged = dict(pending or {})
+    for key, value in update.items():
+        if key == "delta" and "amount" in merged:
+            merged["amount"] = str(Decimal(str(merged["amount"])) + Decimal(str(value)))
+        elif key == "delta" and "delta" in merged:
+            merged["delta"] = str(Decimal(str(merged["delta"])) + Decimal(str(value)))
+        elif key == "amount":
+            merged.pop("delta", None)
+            merged["amount"] = value
+        else:
+            merged[key] = value
+    return merged
+
+
+def _failed(future):
+    return future.cancelled() or future.exception() is not None
+
+
+def _chain(source, target):
+    """Copy the outcome of one future to another once it is done."""
+    def copy_outcome(future):
+        if target.done():
+            return
+        if future.cancelled():
+            target.cancel()
+        elif future.exception() is not None:
+            target.set_exception(future.exception())
+        else:
+            target.set_result(future.result())
+    source.add_done_callback(copy_outcome)
+
+
+class AmendCoalescer:
+    """Coalesces updates for the same order while an earlier update is in
+    flight.
+
+    The first update for an order is sent at once. Updates arriving before
+    it has been confirmed (or rejected) are merged, and only the merged
+    state is sent when the earlier update is done. Every caller gets its own
+    futures, which resolve with the outcome of the update that carried its
+    settings, so a rejected update fails its callers and no caller is left
+    waiting on a replaced future.
+
+    Parameters
+    ----------
+    client : WssClient
+        The authenticated client. Updates are sent with
+        ``client._send_update_order``.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._amends = {}
+
+    def __contains__(self, order_id):
+        return order_id in self._amends
+
+    def submit(self, order_settings, timeout=None):
+        """Send or queue an order update.
+
+        Parameters
+        ----------
+        order_settings : dict
+            Order update settings including the order id, see
+            ``WssClient.update_order``.
+
+        timeout : int
+            Seconds before future objects are timed out.
+
+        Returns
+        -------
+        dict
+            A handle with "request_future", "confirm_future" and "id".
+        """
+        order_id = order_settings["id"]
+        request_future = TimedFuture(timeout)
+        request_future.future_id = f"ou-req_{order_id}"
+        confirm_future = TimedFuture(timeout)
+        confirm_future.future_id = f"ou_{order_id}"
+        amend = self._amends.get(order_id)
+        if amend is None:
+            amend = self._new_amend(timeout)
+            self._send(order_id, amend, order_settings)
+            self._amends[order_id] = amend
+            amend["sending"].append((request_future, confirm_future))
+        else:
+            amend["pending"] = merge_order_updates(amend["pending"], order_settings)
+            amend["timeout"] = timeout
+            amend["queued"].append((request_future, confirm_future))
+        return {
+            "request_future": request_future,
+            "confirm_future": confirm_future,
+            "id": order_id
+        }
+
+    def track(self, order_id, sent, timeout=None):
+        """Register an update sent elsewhere, e.g. in an ox_multi input, as
+        in flight, so later updates of the order are coalesced behind it.
+
+        Parameters
+        ----------
+        order_id : int
+            The order id.
+
+        sent : dict
+            The handle of the sent update, with "request_future" and
+            "confirm_future".
+
+        timeout : int
+            Seconds before future objects of queued updates are timed out.
+        """
+        assert order_id not in self._amends, "an update of the order is already in flight"
+        amend = self._new_amend(timeout)
+        self._amends[order_id] = amend
+        self._watch(order_id, amend, sent)
+
+    @staticmethod
+    def _new_amend(timeout):
+        # sending: waiters of the update in flight, queued: waiters of pending
+        return {"pending": None, "sending": [], "queued": [], "sent": None,
+                "timeout": timeout}
+
+    def _send(self, order_id, amend, order_settings):
+        sent = self.client._send_update_order(order_settings, timeout=amend["timeout"])
+        self._watch(order_id, amend, sent)
+
+    def _watch(self, order_id, amend, sent):
+        amend["sent"] = sent
+
+        def request_done(future):
+            if _failed(future) or future.result().get("status") != "SUCCESS":
+                self._done(order_id, sent)
+
+        sent["request_future"].add_done_callback(request_done)
+        sent["confirm_future"].add_done_callback(lambda _: self._done(order_id, sent))
+
+    def _done(self, order_id, sent):
+        amend = self._amends.get(order_id)
+        if amend is None or amend["sent"] is not sent:
+            return
+        for request_future, confirm_future in amend["sending"]:
+            _chain(sent["request_future"], request_future)
+            _chain(sent["confirm_future"], confirm_future)
+        amend["sending"], amend["queued"] = amend["queued"], []
+        if amend["pending"] is None:
+            del self._amends[order_id]
+            return
+        pending, amend["pending"] = amend["pending"], None
+        try:
+            self._send(order_id, amend, dict(pending, id=order_id))
+        except RateLimitExceeded as error:
+            del self._amends[order_id]
+            for request_future, confirm_future in amend["sending"]:
+                for future in (request_future, confirm_future):
+                    if not future.done():
+                        future.set_exception(error)
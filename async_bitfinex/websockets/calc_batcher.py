@@ -0,0 +1,89 @@
+"""Module for batching calc requests sent over the bitfinex auth channel"""
+import asyncio
+
+from .futures_handler import TimedFuture
+from .rate_limiter import CALC_BATCH_LIMIT
+
+
+class CalcBatcher:
+    """Collects calc requests over a short window, removes duplicates and
+    sends them in as few calc inputs as the server allows.
+
+    Each requested calculation gets a future that resolves with the data of
+    the matching margin (miu), funding (fiu), position (pu) or wallet (wu)
+    message. Calculations that are already pending share the same future.
+    Batches are sent through ``WssClient.calc`` and are therefore paced by
+    the client rate limiter (8 calc inputs per second by default).
+
+    Parameters
+    ----------
+    client : WssClient
+        The authenticated client used to send calc inputs.
+
+    window : float
+        Seconds to collect requests before sending them. Default: 0.05
+
+    batch_size : int
+        Maximum calculations per calc input. Default: 30
+    """
+
+    def __init__(self, client, window=0.05, batch_size=CALC_BATCH_LIMIT):
+        assert batch_size <= CALC_BATCH_LIMIT, \
+            f"Websocket server allows up to {CALC_BATCH_LIMIT} calculations per batch"
+        self.client = client
+        self.window = window
+        self.batch_size = batch_size
+        self._pending = []
+        self._flush_handle = None
+
+    def request(self, calculations, timeout=None):
+        """Queue calculations for the next batch.
+
+        Parameters
+        ----------
+        calculations : list
+            Calculation names, e.g. ["margin_sym_tBTCUSD", "wallet_exchange_USD"]
+
+        timeout : int
+            Seconds before the futures time out.
+
+        Returns
+        -------
+        list
+            A future for each calculation, in the order they were given.
+        """
+        futures = []
+        for name in calculations:
+            future_id = f"calc_{name}"
+            future = self.client.futures.get(future_id)
+            if future is None or future.done():
+                future = TimedFuture(timeout)
+                future.future_id = future_id
+                self.client.futures[future_id] = future
+                self._pending.append(name)
+            futures.append(future)
+
+        if self._pending and self._flush_handle is None:
+            self._flush_handle = asyncio.get_event_loop().call_later(
+                self.window, self.flush
+            )
+        return futures
+
+    def flush(self):
+        """Send all queued calculations now."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            # Runs in a call_later callback, so a failed send (e.g.
+            # RateLimitExceeded, or KeyError without an auth connection)
+            # fails the futures of the batch instead of escaping
+            try:
+                self.client.calc(*[[name] for name in batch])
+            except Exception as error:  # pylint: disable=broad-except
+                for name in batch:
+                    future = self.client.futures.get(f"calc_{name}")
+                    if future is not None and not future.done():
+                        future.set_exception(error)
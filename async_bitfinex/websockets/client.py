@@ -1,9 +1,14 @@
 """Websocket Client for Bitfinex V2 API."""
 import asyncio
+import builtins
+import functools
 import hashlib
 import hmac
+import itertools
 # coding=utf-8
 import json
+import logging
+import time
 from copy import deepcopy
 
 import websockets
@@ -11,25 +16,34 @@ from websockets.protocol import State
 
 from .. import utils
 from . import abbreviations
-from .futures_handler import CLIENT_HANDLERS, FuturesHandler
+from .amend_coalescer import AmendCoalescer
+from .calc_batcher import CalcBatcher
+from .futures_handler import (CLIENT_HANDLERS, FuturesHandler, MultiOpHandle, OrderHandle,
+                              TimedFuture)
+from .ladder import diff_ladder
+from .latency import LatencyTracker
+from .order_encoder import OrderEncoder, order_symbol
+from .pnl import PnLEngine
+from .rate_limiter import CALC_BATCH_LIMIT, AuthRateLimiter, RateLimitExceeded
+from .state import (ORDER_AMOUNT, ORDER_CID, ORDER_ID, ORDER_MTS_CREATE, ORDER_PRICE,
+                    ORDER_SYMBOL, ORDER_TYPE, FillTable, MarginInfoTable, OrderTable,
+                    PositionTable, WalletTable)
 
 STREAM_URL = 'wss://api.bitfinex.com/ws/2'
 
-class DummyState:
-    state = State.CONNECTING
+logger = logging.getLogger(__name__)
 
-class TimedFuture(asyncio.Future):
-
-    def __init__(self, timeout=None):
-        super().__init__()
-        if timeout:
-            asyncio.ensure_future(self.trigger_timeout(timeout))
+MULTI_OP_LIMIT = 75
+"""Maximum number of operations the server accepts in one ox_multi input"""
 
-    async def trigger_timeout(self, timeout):
-        await asyncio.sleep(timeout)
-        if not self.done():
-            self.set_exception(TimeoutError)
+UPDATE_ORDER_FIELDS = frozenset((
+    "price", "amount", "delta", "price_aux_limit", "price_trailing", "tif",
+    "flags", "lev"
+))
+"""Fields that mark a multi-op operation dict as an order update (ou)"""
 
+class DummyState:
+    state = State.CONNECTING
 
 class WssClient():
     """Websocket client for bitfinex.
@@ -42,6 +56,44 @@ class WssClient():
     secret : str
         Your API secret
 
+    rate_limits : dict
+        Token bucket settings for inputs sent over the auth connection,
+        {input_type: (rate per second, burst)}. e.g. ``{"on": (50, 100)}``.
+        ``calc`` is limited to 8 per second by default. Queue depth and wait
+        time metrics are available from ``client.rate_limiter.metrics()``.
+
+    rate_limit_fail_fast : bool
+        Raise ``RateLimitExceeded`` instead of queueing inputs that would go
+        over the limit. Default: False
+
+    Attributes
+    ----------
+    orders : OrderTable
+        Live orders kept up to date from the auth channel, indexed by id,
+        cid, gid and symbol.
+
+    wallets : WalletTable
+        Wallets kept up to date from the auth channel.
+
+    positions : PositionTable
+        Active positions kept up to date from the auth channel.
+
+    margin : MarginInfoTable
+        Margin info kept up to date from the auth channel.
+
+    fills : FillTable
+        Filled amount, average fill price and fees per order, from the te and
+        tu messages on the auth channel.
+
+    pnl : PnLEngine
+        Realised and unrealised PnL per symbol, from fills and the position
+        snapshot. Marks are set with ``pnl.update_mark`` or
+        ``pnl.ticker_callback``.
+
+    latency : LatencyTracker
+        Latency histograms of new orders, updates and cancels, per symbol and
+        order type.
+
 
     .. Hint::
 
@@ -51,7 +103,8 @@ class WssClient():
 
     """
 
-    def __init__(self, key=None, secret=None, nonce_multiplier=1.0, loop=None):  # client
+    def __init__(self, key=None, secret=None, nonce_multiplier=1.0, loop=None,
+                 rate_limits=None, rate_limit_fail_fast=False):  # client
         super().__init__()
         self.key = key
         self.secret = secret
@@ -59,10 +112,58 @@ class WssClient():
         self._channels = {}
         self.nonce_multiplier = nonce_multiplier
         self.futures = FuturesHandler(CLIENT_HANDLERS)
+        self._frame_ids = itertools.count()
+        self.rate_limiter = AuthRateLimiter(rate_limits, fail_fast=rate_limit_fail_fast)
+        self.calc_batcher = CalcBatcher(self)
+        self.amend_coalescer = AmendCoalescer(self)
+        self.latency = LatencyTracker()
+        self.order_encoder = OrderEncoder()
+        self.orders = OrderTable()
+        self.wallets = WalletTable()
+        self.positions = PositionTable()
+        self.margin = MarginInfoTable()
+        self.fills = FillTable()
+        self.orders.add_listener(self._link_order_fills)
+        self.pnl = PnLEngine()
+        self.positions.add_listener(self.pnl.on_position)
+        self.fills.add_listener(self.pnl.on_trade)
+        self._state_tables = (self.orders, self.wallets, self.positions, self.margin,
+                              self.fills)
+        self._state_handlers = {}
+        for table in self._state_tables:
+            self._state_handlers.update(table.message_handlers)
         self.disable_ping_timeout = False
         if loop:
             asyncio.set_event_loop(loop)
 
+    def _update_state(self, message):
+        """Update the account state tables (e.g. ``self.orders``) from an
+        auth channel message. A message the tables fail on is logged and
+        skipped, so it does not stop the connection."""
+        now = time.monotonic()
+        for table in self._state_tables:
+            table.seen(now)
+        if (isinstance(message, list) and message[0] == 0
+                and message[1] in abbreviations.STATE_MESSAGES):
+            handler = self._state_handlers.get(message[1])
+            if handler is None:
+                return
+            try:
+                handler(message[2])
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to update state from %r", message)
+
+    def _link_order_fills(self, event, order):
+        """Order table listener linking order ids to cids in the fill table
+        and settling the fills of closed orders"""
+        if event == "snapshot":
+            for snapshot_order in order:
+                self.fills.link(snapshot_order[ORDER_ID], snapshot_order[ORDER_CID])
+        elif event == "new":
+            self.fills.link(order[ORDER_ID], order[ORDER_CID])
+        elif event == "close":
+            self.fills.close(order)
+
     @property
     def channels(self):
         return deepcopy(self._channels)
@@ -96,6 +197,45 @@ class WssClient():
         )
         
 
+    def _send_auth(self, payload, input_type, timings=None):
+        """Schedule a payload to be sent over the auth connection, paced by
+        the rate limiter. Raises ``KeyError`` when there is no auth
+        connection and ``RateLimitExceeded`` when the limiter fails fast, so
+        call it before registering any futures for the input.
+
+        Parameters
+        ----------
+        payload : bytes
+            The encoded input message.
+
+        input_type : str
+            The input type used to pick the token bucket, e.g. "on".
+
+        timings : OrderTimings
+            Latency timings from ``self.latency.start``, timestamped when the
+            payload has been sent.
+        """
+        if "auth" not in self.connections:
+            raise KeyError("auth")
+        delay = self.rate_limiter.reserve(input_type)
+        return asyncio.get_event_loop().create_task(
+            self._paced_send("auth", payload, input_type, delay, timings)
+        )
+
+    async def _paced_send(self, connection_name, payload, input_type, delay, timings=None):
+        await self.rate_limiter.wait(input_type, delay)
+        await self.connections[connection_name].send(payload)
+        if timings is not None:
+            self.latency.sent(timings)
+
+    def _order_latency_key(self, order_id=None, order_cid=None):
+        """Returns the (symbol, order type) of a live order, used to key the
+        latency histograms of cancels and updates."""
+        order = self.orders.get(order_id) if order_id else self.orders.get_by_cid(order_cid)
+        if order is None:
+            return None, None
+        return order[ORDER_SYMBOL], order[ORDER_TYPE]
+
     def unsubscribe(self, connection_name, channel_id, timeout=None):
         if connection_name in self.connections:
             future_id = f"unsubscribe_{channel_id}"
@@ -146,6 +286,10 @@ class WssClient():
                 elif isinstance(message, dict) and message["event"] == "unsubscribed":
                     del self._channels[message["chanId"]]
 
+                # Keep account state up to date before futures are resolved
+                if connection_name == "auth":
+                    self._update_state(message)
+
                 # Check for Future objects
                 self.futures(message)
 
@@ -643,8 +787,8 @@ class WssClient():
 
         tif : datetime string
 
-        set_cid : bool
-            wheter or not to set a cid.
+        cid : int
+            Client order id. Created with ``utils.create_cid()`` if not given.
 
         Returns
         -------
@@ -681,10 +825,10 @@ class WssClient():
             )
 
         """
-        client_order_id = kwargs.get("cid", utils.create_cid())
+        client_order_id = kwargs.get("cid") or utils.create_cid()
         order_op = {
             'type': order_type,
-            'symbol': utils.order_symbol(symbol),
+            'symbol': order_symbol(symbol),
             'amount': amount,
             'price': price,
             'hidden': kwargs.get("hidden", 0),
@@ -704,7 +848,6 @@ class WssClient():
         if kwargs.get("tif"):
             order_op['tif'] = kwargs.get("tif")
 
-        client_order_id = utils.create_cid()
         order_op['cid'] = client_order_id
 
         return order_op
@@ -712,7 +855,7 @@ class WssClient():
     def _create_new_order_future(self, cid, order_type, timeout=None):
         """Create future objects for new orders"""
         confirm_future_id = None
-        if order_type in ("MARKET", "EXCHANGE MARKET", "IOC", "EXCHANGE IOC"):
+        if order_type in abbreviations.MARKET_ORDER_TYPES:
             confirm_future_id = f"oc_{cid}"
             self.futures[confirm_future_id] = TimedFuture(timeout)
         else:
@@ -725,6 +868,28 @@ class WssClient():
         self.futures[request_future_id].future_id = request_future_id
         return (self.futures[request_future_id], self.futures[confirm_future_id])
 
+    def _create_cancel_order_future(self, order_key, timeout=None):
+        """Create future objects for order cancels, keyed by id or cid"""
+        request_future_id = f"oc-req_{order_key}"
+        confirm_future_id = f"oc_{order_key}"
+        self.futures[request_future_id] = TimedFuture(timeout)
+        self.futures[request_future_id].future_id = request_future_id
+
+        self.futures[confirm_future_id] = TimedFuture(timeout)
+        self.futures[confirm_future_id].future_id = confirm_future_id
+        return (self.futures[request_future_id], self.futures[confirm_future_id])
+
+    def _create_update_order_future(self, order_id, timeout=None):
+        """Create future objects for order updates"""
+        request_future_id = f"ou-req_{order_id}"
+        confirm_future_id = f"ou_{order_id}"
+        self.futures[request_future_id] = TimedFuture(timeout)
+        self.futures[request_future_id].future_id = request_future_id
+
+        self.futures[confirm_future_id] = TimedFuture(timeout)
+        self.futures[confirm_future_id].future_id = confirm_future_id
+        return (self.futures[request_future_id], self.futures[confirm_future_id])
+
     def new_order(self, order_type, symbol, amount, price, **kwargs):
         """
         Create new order.
@@ -765,14 +930,20 @@ class WssClient():
 
         tif : datetime string
 
+        cid : int
+            Client order id. Created with ``utils.create_cid()`` if not given.
+
         timeout : int
             Seconds before future objects are timed out.
 
         Returns
         -------
-        int
-            Order client id (cid). The CID is also a mts date stamp of when the
-            order was created.
+        OrderHandle
+            A dict with the "request_future", "confirm_future" and client
+            order id ("cid") of the order. The CID is also a mts date stamp of
+            when the order was created. ``handle.filled(amount)`` returns a
+            Future resolving to the ``OrderFill`` once ``amount`` (the whole
+            order by default) has been filled.
 
 
         Example
@@ -785,42 +956,326 @@ class WssClient():
             my_client.authenticate()
 
 
-            order_client_id = my_client.new_order(
+            handle = my_client.new_order(
                 order_type="LIMIT",
                 symbol="BTCUSD",
                 amount=0.004,
                 price=1000.0
             )
+            fill = await handle.filled()
+            print(fill.filled, fill.price, fill.fees)
 
         """
-        operation = self.new_order_op(
-            order_type=order_type,
-            symbol=symbol,
-            amount=amount,
-            price=price,
-            **kwargs
+        cid = kwargs.pop("cid", None) or utils.create_cid()
+        payload = self.order_encoder.encode(
+            order_type, symbol, amount, price, cid, **kwargs
         )
-        data = [
-            0,
-            abbreviations.get_notification_code('order new'),
-            None,
-            operation
-        ]
-        payload = json.dumps(data, ensure_ascii=False).encode('utf8')
+        timings = self.latency.start("on", order_symbol(symbol), order_type)
+        self._send_auth(payload, "on", timings)
         # Create a future method for handling responses
         request_future, confirm_future = self._create_new_order_future(
-            cid=operation["cid"],
+            cid=cid,
             order_type=order_type,
             timeout=kwargs.get("timeout")
         )
-        asyncio.get_event_loop().create_task(self.connections["auth"].send(payload))
+        self.latency.track(timings, request_future, confirm_future)
+        return OrderHandle(
+            self.fills,
+            amount,
+            request_future=request_future,
+            confirm_future=confirm_future,
+            cid=cid
+        )
+
+    @staticmethod
+    def _multi_op_operation(operation):
+        """Returns a multi-op operation as a [code, dict] pair. Accepts pairs
+        or plain dicts, where the code is inferred from the dict keys."""
+        if not isinstance(operation, dict):
+            code, operation = operation
+            return [code, operation]
+        if "type" in operation:
+            return [abbreviations.ORDER_NEW, operation]
+        if "id" in operation and UPDATE_ORDER_FIELDS.intersection(operation):
+            return [abbreviations.ORDER_UPDATE, operation]
+        if any(isinstance(operation.get(key), list) for key in ("id", "cid", "gid")) \
+                or "all" in operation:
+            return ["oc_multi", operation]
+        return [abbreviations.ORDER_CANCEL, operation]
+
+    def _create_frame_future(self, input_type, registered, timeout=None):
+        """Create the future of a sent ox_multi or oc_multi input, resolved
+        by its notification. When bitfinex rejects the whole input, the
+        futures of its operations, collected in ``registered``, fail with the
+        same error."""
+        future_id = f"{input_type}-req_frame_{next(self._frame_ids)}"
+        self.futures[future_id] = TimedFuture(timeout)
+        self.futures[future_id].future_id = future_id
+        self.futures[future_id].add_done_callback(
+            functools.partial(self._reject_frame, registered)
+        )
+        return self.futures[future_id]
+
+    def _reject_frame(self, registered, frame_future):
+        if frame_future.cancelled() or frame_future.exception() is None:
+            return
+        for future in registered:
+            if self.futures.get(future.future_id) is future:
+                del self.futures[future.future_id]
+            if not future.done():
+                future.set_exception(frame_future.exception())
+
+    def _create_multi_op_handle(self, code, operation, timeout=None, registered=None,
+                                request_future_id=None):
+        """Create future objects for one multi-op operation and return a
+        handle like the ones returned by new_order, cancel_order and
+        update_order. The futures created are appended to ``registered``.
+        An oc_multi operation cancelling by gid or all gets a request future
+        keyed ``request_future_id``: the frame id of its ox_multi input and
+        its index in the input."""
+        registered = [] if registered is None else registered
+        if code == abbreviations.ORDER_NEW:
+            request_future, confirm_future = self._create_new_order_future(
+                operation["cid"], operation["type"], timeout=timeout
+            )
+            registered += [request_future, confirm_future]
+            return {
+                "request_future": request_future,
+                "confirm_future": confirm_future,
+                "cid": operation["cid"]
+            }
+        elif code == abbreviations.ORDER_UPDATE:
+            request_future, confirm_future = self._create_update_order_future(
+                operation["id"], timeout=timeout
+            )
+            registered += [request_future, confirm_future]
+            return {
+                "request_future": request_future,
+                "confirm_future": confirm_future,
+                "id": operation["id"]
+            }
+        elif code == abbreviations.ORDER_CANCEL:
+            order_key = operation.get("id") or operation.get("cid")
+            request_future, confirm_future = self._create_cancel_order_future(
+                order_key, timeout=timeout
+            )
+            registered += [request_future, confirm_future]
+            return {
+                "request_future": request_future,
+                "confirm_future": confirm_future,
+                "id": operation.get("id"),
+                "cid": operation.get("cid"),
+                "cid_date": operation.get("cid_date")
+            }
+        # oc_multi: one confirm future for each order cancelled by id or cid
+        order_keys = list(operation.get("id", []))
+        order_keys += [cid for cid, _ in operation.get("cid", [])]
+        # Cancels by gid or all wait for the oc_multi-req notification and for
+        # the live orders they match in the order table
+        request_future_ids = []
+        for gid in operation.get("gid", []):
+            order_keys += [order[ORDER_ID] for order in self.orders.by_gid(gid)]
+        if operation.get("all"):
+            order_keys += [order[ORDER_ID] for order in self.orders]
+        if operation.get("gid") or operation.get("all"):
+            request_future_ids.append(request_future_id)
+        request_futures, confirm_futures = [], []
+        for future_ids, futures in ((request_future_ids, request_futures),
+                                    ([f"oc_{key}" for key in order_keys], confirm_futures)):
+            for future_id in future_ids:
+                self.futures[future_id] = TimedFuture(timeout)
+                self.futures[future_id].future_id = future_id
+                futures.append(self.futures[future_id])
+        registered += request_futures + confirm_futures
         return {
-            "request_future": request_future,
-            "confirm_future": confirm_future,
-            "cid": operation['cid']
+            "request_future": asyncio.gather(*request_futures) if request_futures else None,
+            "confirm_future": asyncio.gather(*request_futures, *confirm_futures),
+            "id": operation.get("id"),
+            "cid": operation.get("cid"),
+            "gid": operation.get("gid")
         }
 
-    async def multi_order(self, operations):
+    def multi_op(self, operations, timeout=None):
+        """Send any number of new, cancel, update and multi cancel operations.
+
+        Operations are split into ox_multi inputs of up to 75 operations
+        (``MULTI_OP_LIMIT``), and request and confirm futures are created for
+        every operation once its input is sent. When bitfinex rejects a whole
+        input, the futures of its operations fail with the error.
+
+        Parameters
+        ----------
+        operations : list
+            Operations as [code, dict] pairs, e.g. ``["oc", {"id": 1234}]``
+            with code one of "on", "oc", "ou" or "oc_multi", or as plain
+            dicts. Dicts created with ``new_order_op`` are sent as new
+            orders, dicts with an id and fields to change as updates, dicts
+            with lists of ids, cids or gids as multi cancels and anything
+            else as cancels. Read more here:
+            https://bitfinex.readme.io/v2/reference#ws-input-order-multi-op
+
+        timeout : int
+            Seconds before future objects are timed out.
+
+        Returns
+        -------
+        MultiOpHandle
+            Aggregate handle. ``await handle`` (or ``handle.confirm_future``)
+            resolves when every operation is confirmed, and ``handle.handles``
+            holds the per operation handles in the order they were given.
+
+        Raises
+        ------
+        KeyError
+            When there is no auth connection.
+
+        RateLimitExceeded
+            When an input is rate limited and the limiter fails fast.
+
+            Either error has a ``handle`` attribute, the ``MultiOpHandle`` of
+            the operations in the inputs sent before it. The other operations,
+            including updates queued behind an update in flight, are not sent.
+
+        Example
+        -------
+         ::
+
+            # You should only need to create and authenticate a client once.
+            # Then simply reuse it later
+            my_client = WssClient(key, secret)
+            my_client.authenticate()
+
+            handle = my_client.multi_op([
+                ["oc", {"id": 1234}],
+                my_client.new_order_op(
+                    order_type="LIMIT",
+                    symbol="BTCUSD",
+                    amount="0.004",
+                    price="1000.0"
+                ),
+                {"id": 1235, "price": "1001.0"},
+            ], timeout=10)
+
+            confirmations = await handle
+        """
+        operations = [self._multi_op_operation(operation) for operation in operations]
+        for code, operation in operations:
+            if code == abbreviations.ORDER_NEW and not operation.get("cid"):
+                operation["cid"] = utils.create_cid()
+
+        # Updates of orders with an update in flight, or updated earlier in
+        # this call, go through the amend coalescer once the ox_multi inputs
+        # are sent, so their futures are not replaced.
+        handles = [None] * len(operations)
+        coalesced, sent_operations, updated = [], [], set()
+        for position, (code, operation) in enumerate(operations):
+            if code == abbreviations.ORDER_UPDATE:
+                if operation["id"] in self.amend_coalescer or operation["id"] in updated:
+                    coalesced.append(position)
+                    continue
+                updated.add(operation["id"])
+            sent_operations.append((position, code, operation))
+
+        send_tasks = []
+        for start in range(0, len(sent_operations), MULTI_OP_LIMIT):
+            chunk = sent_operations[start:start + MULTI_OP_LIMIT]
+            data = [
+                0,
+                abbreviations.ORDER_MULTI_OP,
+                None,
+                [[code, operation] for _, code, operation in chunk]
+            ]
+            payload = json.dumps(data, ensure_ascii=False).encode('utf8')
+            # Futures are only registered for inputs that are sent, so an
+            # input failing to send leaves no futures or amends behind
+            try:
+                send_tasks.append(self._send_auth(payload, "ox_multi"))
+            except (KeyError, RateLimitExceeded) as error:
+                error.handle = MultiOpHandle(
+                    [handle for handle in handles if handle is not None], send_tasks
+                )
+                raise
+            registered = []
+            frame_future = self._create_frame_future(abbreviations.ORDER_MULTI_OP, registered,
+                                                     timeout=timeout)
+            for index, (position, code, operation) in enumerate(chunk):
+                handles[position] = self._create_multi_op_handle(
+                    code, operation, timeout=timeout, registered=registered,
+                    request_future_id=f"{frame_future.future_id}_{index}"
+                )
+                if code == abbreviations.ORDER_UPDATE:
+                    self.amend_coalescer.track(operation["id"], handles[position],
+                                               timeout=timeout)
+        for position in coalesced:
+            handles[position] = self.amend_coalescer.submit(operations[position][1],
+                                                            timeout=timeout)
+        return MultiOpHandle(handles, send_tasks)
+
+    def set_ladder(self, symbol, levels, order_type="EXCHANGE LIMIT", gid=None,
+                   timeout=None, **kwargs):
+        """Move the live orders for a symbol to a desired set of price levels
+        with the fewest order operations, sent with ``multi_op``.
+
+        Live orders are read from ``self.orders``. Only orders of the given
+        order_type (and gid, if given) are managed; other orders on the
+        symbol are left alone. Orders matching a level are kept, orders that
+        can be moved are updated (ou), and the rest are cancelled (oc_multi)
+        or created (on). See ``ladder.diff_ladder``.
+
+        Parameters
+        ----------
+        symbol : str
+            The currency symbol. e.g. BTCUSD
+
+        levels : list
+            Desired (price, amount) levels. Positive amounts buy, negative
+            amounts sell.
+
+        order_type : str
+            Order type of the ladder orders. Default: "EXCHANGE LIMIT"
+
+        gid : int
+            Group id of the ladder orders. New orders are created in it.
+
+        timeout : int
+            Seconds before future objects are timed out.
+
+        **kwargs
+            Other order settings for new orders (e.g. flags), see
+            ``new_order_op``.
+
+        Returns
+        -------
+        MultiOpHandle
+            Aggregate handle of the operations sent. Empty if the orders
+            already match the levels.
+
+        Example
+        -------
+         ::
+
+            handle = my_client.set_ladder("BTCUSD", [
+                ("9990.0", "0.01"), ("9980.0", "0.02"),
+                ("10010.0", "-0.01"), ("10020.0", "-0.02"),
+            ], gid=1)
+            await handle
+        """
+        symbol = order_symbol(symbol)
+        live_orders = self.orders.by_gid(gid) if gid is not None else self.orders.by_symbol(symbol)
+        live_orders = [
+            order for order in live_orders
+            if order[ORDER_SYMBOL] == symbol and order[ORDER_TYPE] == order_type
+        ]
+        def ladder_order_op(price, amount):
+            order_op = self.new_order_op(order_type, symbol, amount, price, **kwargs)
+            if gid is not None:
+                order_op["gid"] = gid
+            return order_op
+
+        operations = diff_ladder(levels, live_orders, ladder_order_op)
+        return self.multi_op(operations, timeout=timeout)
+
+    async def multi_order(self, operations, timeout=None):
         """Multi order operation.
 
         Parameters
@@ -829,7 +1284,12 @@ class WssClient():
             a list of operations. Read more here:
             https://bitfinex.readme.io/v2/reference#ws-input-order-multi-op
             Hint. you can use the self.new_order_op() for easy new order
-            operation creation.
+            operation creation. See ``multi_op`` for the accepted formats and
+            for futures tracking each operation.
+
+        timeout : int
+            Seconds before the future objects of the operations are timed
+            out.
 
         Returns
         -------
@@ -868,15 +1328,124 @@ class WssClient():
                 new_order_operation
             ])
         """
-        data = [
-            0,
-            abbreviations.get_notification_code('order multi-op'),
-            None,
-            operations
+        handle = self.multi_op(operations, timeout=timeout)
+        await asyncio.gather(*handle.send_tasks)
+        return [operation_handle.get("cid") for operation_handle in handle.handles]
+
+    def cancel_orders(self, symbol=None, gid=None, side=None, price_range=None,
+                      older_than=None, predicate=None, timeout=None,
+                      batch_size=MULTI_OP_LIMIT, all=False):  # pylint: disable=redefined-builtin
+        """Cancel all live orders matching the given filters with oc_multi
+        inputs.
+
+        Orders are selected from ``self.orders``. All filters given must
+        match. Cancelling every live order takes ``all=True`` instead of
+        filters, and a call with neither raises AssertionError.
+
+        Parameters
+        ----------
+        symbol : str
+            Only cancel orders for this symbol. e.g. BTCUSD
+
+        gid : int
+            Only cancel orders in this group.
+
+        side : str
+            Only cancel "buy" or "sell" orders.
+
+        price_range : tuple
+            Only cancel orders with (low <= price <= high).
+
+        older_than : float
+            Only cancel orders created more than this many seconds ago.
+
+        predicate : func
+            Only cancel orders for which ``predicate(order)`` is True.
+
+        timeout : int
+            Seconds before future objects are timed out.
+
+        batch_size : int
+            Maximum order ids per oc_multi input. Default: 75
+
+        all : bool
+            Cancel every live order. Cannot be combined with filters.
+
+        Returns
+        -------
+        MultiOpHandle
+            Aggregate handle with one handle per oc_multi input. ``await
+            handle`` resolves when every cancel has been confirmed.
+
+        Raises
+        ------
+        KeyError
+            When there is no auth connection.
+
+        RateLimitExceeded
+            When an input is rate limited and the limiter fails fast.
+
+            Either error has a ``handle`` attribute, the ``MultiOpHandle`` of
+            the inputs sent before it. The orders of the other inputs are not
+            cancelled.
+
+        Example
+        -------
+         ::
+
+            # Cancel all buy orders on BTCUSD older than a minute
+            await my_client.cancel_orders(
+                symbol="BTCUSD", side="buy", older_than=60, timeout=10
+            )
+        """
+        assert side in (None, "buy", "sell"), "side must be 'buy' or 'sell'"
+        filtered = any(value is not None for value in
+                       (symbol, gid, side, price_range, older_than, predicate))
+        assert filtered != bool(all), "give filters, or all=True to cancel every order"
+        if gid is not None:
+            orders = self.orders.by_gid(gid)
+        elif symbol is not None:
+            orders = self.orders.by_symbol(order_symbol(symbol))
+        else:
+            orders = list(self.orders)
+
+        filters = []
+        if symbol is not None:
+            symbol = order_symbol(symbol)
+            filters.append(lambda order: order[ORDER_SYMBOL] == symbol)
+        if side is not None:
+            buy = side == "buy"
+            filters.append(lambda order: (order[ORDER_AMOUNT] > 0) == buy)
+        if price_range is not None:
+            low, high = price_range
+            filters.append(lambda order: low <= order[ORDER_PRICE] <= high)
+        if older_than is not None:
+            created_before = (time.time() - older_than) * 1000
+            filters.append(lambda order: order[ORDER_MTS_CREATE] <= created_before)
+        if predicate is not None:
+            filters.append(predicate)
+        order_ids = [
+            order[ORDER_ID] for order in orders
+            if builtins.all(order_filter(order) for order_filter in filters)
         ]
-        payload = json.dumps(data, ensure_ascii=False).encode('utf8')
-        await self.connections["auth"].send(payload)
-        return [order[1].get("cid", None) for order in operations]
+
+        handles, send_tasks = [], []
+        for start in range(0, len(order_ids), batch_size):
+            batch = order_ids[start:start + batch_size]
+            data = [0, "oc_multi", None, {"id": batch}]
+            payload = json.dumps(data, ensure_ascii=False).encode('utf8')
+            try:
+                send_tasks.append(self._send_auth(payload, "oc_multi"))
+            except (KeyError, RateLimitExceeded) as error:
+                error.handle = MultiOpHandle(handles, send_tasks)
+                raise
+            registered = []
+            request_future = self._create_frame_future("oc_multi", registered, timeout=timeout)
+            handle = self._create_multi_op_handle("oc_multi", {"id": batch}, timeout=timeout,
+                                                  registered=registered)
+            handle["request_future"] = request_future
+            handles.append(handle)
+        return MultiOpHandle(handles, send_tasks)
 
     def cancel_order(self, order_id=None, order_cid=None, order_date=None, timeout=None):
         """Cancel order using either the id (order_id) or the client id (order_cid).
@@ -928,24 +1497,20 @@ class WssClient():
 
         data = [
             0,
-            abbreviations.get_notification_code('order cancel'),
+            abbreviations.ORDER_CANCEL,
             None,
             cancel_message
         ]
-        request_future_id = f"oc-req_{order_id or order_cid}"
-        confirm_future_id = f"oc_{order_id or order_cid}"
         payload = json.dumps(data, ensure_ascii=False).encode('utf8')
-
-        self.futures[request_future_id] = TimedFuture(timeout)
-        self.futures[request_future_id].future_id = request_future_id
-
-        self.futures[confirm_future_id] = TimedFuture(timeout)
-        self.futures[confirm_future_id].future_id = confirm_future_id
-
-        asyncio.get_event_loop().create_task(self.connections["auth"].send(payload))
+        timings = self.latency.start("oc", *self._order_latency_key(order_id, order_cid))
+        self._send_auth(payload, "oc", timings)
+        request_future, confirm_future = self._create_cancel_order_future(
+            order_id or order_cid, timeout=timeout
+        )
+        self.latency.track(timings, request_future, confirm_future)
         return {
-            "request_future": self.futures[request_future_id],
-            "confirm_future": self.futures[confirm_future_id],
+            "request_future": request_future,
+            "confirm_future": confirm_future,
             "id": order_id,
             "cid": order_cid,
             "cid_date": order_date
@@ -979,27 +1544,38 @@ class WssClient():
 
         tif : datetime string
             Time-In-Force: datetime for automatic order cancellation (ie. 2020-01-01 10:45:23)
+
+        timeout : int
+            Seconds before future objects are timed out.
+
+        While an update for the same order id is in flight, later updates
+        are merged (deltas are added up) and only the latest state is sent
+        once the earlier update is confirmed or rejected. Every call gets its
+        own futures, which resolve with the outcome of the update that
+        carried its settings: the update sent for the call, or the merged
+        update its settings were folded into. So a call whose update was
+        rejected fails even when a later merged update succeeds.
         """
+        return self.amend_coalescer.submit(order_settings, timeout=timeout)
+
+    def _send_update_order(self, order_settings, timeout=None):
+        """Send one ou frame and create its futures, see ``update_order``."""
         data = [
             0,
-            abbreviations.get_notification_code('order update'),
+            abbreviations.ORDER_UPDATE,
             None,
             order_settings
         ]
         payload = json.dumps(data, ensure_ascii=False).encode('utf8')
-
-        request_future_id = f"ou-req_{order_settings['id']}"
-        confirm_future_id = f"ou_{order_settings['id']}"
-        self.futures[request_future_id] = TimedFuture(timeout)
-        self.futures[request_future_id].future_id = request_future_id
-
-        self.futures[confirm_future_id] = TimedFuture(timeout)
-        self.futures[confirm_future_id].future_id = confirm_future_id
-
-        asyncio.get_event_loop().create_task(self.connections["auth"].send(payload))
+        timings = self.latency.start("ou", *self._order_latency_key(order_settings['id']))
+        self._send_auth(payload, "ou", timings)
+        request_future, confirm_future = self._create_update_order_future(
+            order_settings['id'], timeout=timeout
+        )
+        self.latency.track(timings, request_future, confirm_future)
         return {
-            "request_future": self.futures[request_future_id],
-            "confirm_future": self.futures[confirm_future_id],
+            "request_future": request_future,
+            "confirm_future": confirm_future,
             "id": order_settings['id']
         }
 
@@ -1030,6 +1606,11 @@ class WssClient():
             Data is returned over the auth channel. See the abbreviation
             glossary: https://docs.bitfinex.com/v2/docs/abbreviations-glossary
 
+        Raises
+        ------
+        ValueError
+            If more than 30 calculations are given in total.
+
         Examples
         --------
          ::
@@ -1051,10 +1632,14 @@ class WssClient():
             Websocket server allows up to 30 calculations per batch.
             If the client sends too many concurrent requests (or tries to spam) requests,
             it will receive an error and potentially a disconnection.
-            The Websocket server performs a maximum of 8 calculations per second per client.
+            The Websocket server performs a maximum of 8 calculations per second per client,
+            so calc inputs are queued by the client rate limiter to stay below that.
 
         """
-
+        count = sum(len(calculation) for calculation in calculations)
+        if count > CALC_BATCH_LIMIT:
+            raise ValueError(f"Websocket server allows up to {CALC_BATCH_LIMIT} calculations "
+                             f"per batch, got {count}")
         data = [
             0,
             'calc',
@@ -1062,4 +1647,48 @@ class WssClient():
             calculations
         ]
         payload = json.dumps(data, ensure_ascii=False).encode('utf8')
-        asyncio.get_event_loop().create_task(self.connections["auth"].send(payload))
+        self._send_auth(payload, "calc")
+
+    def request_calc(self, *calculations, timeout=None):
+        """Request calculations and wait for their results.
+
+        Calculations requested within a short window (see ``calc_batcher``)
+        are collected, deduplicated and sent in batches of up to 30, at no
+        more than 8 calc inputs per second. Use this instead of ``calc`` when
+        many parts of a program request calculations.
+
+        Parameters
+        ----------
+        *calculations : str
+            Calculation names. Must be one of the following:
+
+                - margin_base
+                - margin_sym_SYMBOL (e.g. margin_sym_tBTCUSD)
+                - funding_sym_SYMBOL
+                - position_SYMBOL
+                - wallet_WALLET-TYPE_CURRENCY
+
+        timeout : int
+            Seconds before future objects are timed out.
+
+        Returns
+        -------
+        Future
+            Resolves to a list with the data of the miu, fiu, pu or wu message
+            answering each calculation, in the order they were given.
+
+        Examples
+        --------
+         ::
+
+            margin, wallet = await my_client.request_calc(
+                "margin_sym_tBTCUSD",
+                "wallet_exchange_USD",
+                timeout=5
+            )
+
+        """
+        futures = self.calc_batcher.request(calculations, timeout=timeout)
+        # Futures are shared by callers requesting the same calculation, so
+        # protect them from being cancelled together with this gather.
+        return asyncio.gather(*[asyncio.shield(future) for future in futures])
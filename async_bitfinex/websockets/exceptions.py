@@ -0,0 +1,83 @@
+"""Module for the exceptions set on futures when bitfinex rejects an input,
+a subscription or the authentication"""
+from .abbreviations import ERROR_CODES
+
+ERROR_STATUSES = frozenset(("ERROR", "FAILURE"))
+"""Notification statuses that mean the request was rejected"""
+
+
+class BitfinexError(Exception):
+    """Base class for errors reported by bitfinex.
+
+    Parameters
+    ----------
+    code : int
+        The error code, see ``abbreviations.ERROR_CODES``.
+
+    message : str
+        The message text sent by bitfinex.
+
+    response : list or dict
+        The unaltered message that reported the error.
+    """
+
+    def __init__(self, code, message=None, response=None):
+        self.code = code
+        self.description = ERROR_CODES.get(code, ERROR_CODES[10000])
+        self.message = message or self.description
+        self.response = response
+        super().__init__(f"{self.message} (code {code}: {self.description})")
+
+
+class RequestError(BitfinexError):
+    """An input (e.g. on, ou, oc or oc_multi) was rejected with an ERROR or
+    FAILURE notification. Both the request and confirm futures of the input
+    fail with this error.
+    """
+
+    def __init__(self, code, message=None, response=None, status="ERROR"):
+        super().__init__(code, message, response)
+        self.status = status
+
+    @classmethod
+    def from_notification(cls, notification):
+        """Create the error from a notification array,
+        [MTS, TYPE, MSG_ID, null, DATA, CODE, STATUS, TEXT]. Bitfinex
+        rarely sends a code with order errors, so "Generic error" (10001)
+        is used when it is missing."""
+        code = notification[5] if notification[5] is not None else 10001
+        return cls(code, notification[7], notification, status=notification[6])
+
+
+class SubscriptionError(BitfinexError):
+    """A subscribe or unsubscribe request failed, e.g. 10301 already
+    subscribed."""
+
+
+class AuthenticationError(BitfinexError):
+    """The auth request failed, e.g. 10100 failed authentication."""
+
+
+class ServerUnavailableError(BitfinexError):
+    """The websocket server is stopping (20051) or resyncing (20060), so
+    pending requests will not be answered. Reconnect and try again."""
+
+
+class OrderClosedError(Exception):
+    """An order was closed (canceled or executed) before the amount awaited
+    with ``FillTable.wait_filled`` was filled.
+
+    Parameters
+    ----------
+    order : list
+        The order array of the oc message, with its final status.
+
+    fill : OrderFill
+        The fills of the order, or None if nothing was filled.
+    """
+
+    def __init__(self, order, fill=None):
+        self.order = order
+        self.fill = fill
+        filled = fill.filled if fill is not None else 0.0
+        super().__init__(f"Order {order[0]} closed after filling {filled}: {order[13]}")
@@ -1,9 +1,62 @@
 """Module for logic related to intercepting input responses over the bitfinex
 auth channel"""
 import asyncio
+import time
 from asyncio import CancelledError, InvalidStateError
 from collections.abc import MutableMapping
 
+from . import abbreviations
+from .exceptions import (ERROR_STATUSES, AuthenticationError, RequestError,
+                         ServerUnavailableError, SubscriptionError)
+
+
+class TimedFuture(asyncio.Future):
+    """Future that fails with TimeoutError after ``timeout`` seconds.
+    ``resolved_at`` holds the ``time.perf_counter_ns`` timestamp of the
+    result or exception."""
+
+    resolved_at = None
+
+    def __init__(self, timeout=None):
+        super().__init__()
+        if timeout:
+            asyncio.ensure_future(self.trigger_timeout(timeout))
+
+    def set_result(self, result):
+        self.resolved_at = time.perf_counter_ns()
+        super().set_result(result)
+
+    def set_exception(self, exception):
+        self.resolved_at = time.perf_counter_ns()
+        super().set_exception(exception)
+
+    async def trigger_timeout(self, timeout):
+        await asyncio.sleep(timeout)
+        if not self.done():
+            self.set_exception(TimeoutError)
+
+
+def reject_futures(futures, future_ids, error):
+    """Fail the pending futures with the given ids with an error.
+
+    Parameters
+    ----------
+    futures : dict
+        A dict of intercept_id's and future objects.
+        dict{intercept_id, future_object}
+    future_ids : list
+        The intercept_id's of the futures to fail. Missing ids are ignored.
+    error : Exception
+        The exception set on the futures.
+    """
+    for future_id in future_ids:
+        future = futures.get(future_id)
+        if future is None:
+            continue
+        if not future.done():
+            future.set_exception(error)
+        del futures[future_id]
+
 
 def pong_handler(message, futures):
     """Intercepts ping messages (pong) and check for
@@ -36,6 +89,11 @@ def order_new_request(message, futures):
     """
     order_cid = message[4][2]
     future_id = f"on-req_{order_cid}"
+    if message[6] in ERROR_STATUSES:
+        # Market orders are confirmed by oc instead of on
+        reject_futures(futures, [future_id, f"on_{order_cid}", f"oc_{order_cid}"],
+                       RequestError.from_notification(message))
+        return
     futures[future_id].set_result({
         "status": message[6], # Error/Sucess
         "id": message[4][0],
@@ -59,6 +117,10 @@ def order_update_request(message, futures):
     """
     order_id = message[4][0]
     future_id = f"ou-req_{order_id}"
+    if message[6] in ERROR_STATUSES:
+        reject_futures(futures, [future_id, f"ou_{order_id}"],
+                       RequestError.from_notification(message))
+        return
     futures[future_id].set_result({
         "status": message[6], # Error/Sucess
         "id": message[4][0],
@@ -80,15 +142,24 @@ def order_cancel_request(message, futures):
         A dict of intercept_id's and future objects.
         dict{intercept_id, future_object}
     """
-    order_id = message[2][0] # uses id, if no cid given
-    order_cid = message[2][2]
-    future_id = f"oc_{order_id}"
-    future_id_cid = f"oc_{order_cid}"
+    order_id = message[4][0] # uses id, if no cid given
+    order_cid = message[4][2]
+    future_id = f"oc-req_{order_id}"
+    future_id_cid = f"oc-req_{order_cid}"
+    if message[6] in ERROR_STATUSES:
+        reject_futures(
+            futures,
+            [future_id, future_id_cid, f"oc_{order_id}", f"oc_{order_cid}"],
+            RequestError.from_notification(message)
+        )
+        return
     # print("Cancel requst started!")
     if future_id in futures.keys():
         future = futures[future_id]
     elif future_id_cid in futures.keys():
         future = futures[future_id_cid]
+    else:
+        return
     # print("requst future", future)
     future.set_result({
         "status": message[6], # Error/Sucess
@@ -103,6 +174,123 @@ def order_cancel_request(message, futures):
         del futures[future_id_cid]
 
 
+def oldest_frame_id(futures, input_type):
+    """Returns the id of the oldest pending future of an ox_multi or oc_multi
+    input, or None. Their notifications carry no id of the input, but are
+    sent in the order the inputs were received.
+
+    Parameters
+    ----------
+    futures : dict
+        A dict of intercept_id's and future objects.
+        dict{intercept_id, future_object}
+    input_type : str
+        The input code, "ox_multi" or "oc_multi".
+    """
+    prefix = f"{input_type}-req_frame_"
+    return next((future_id for future_id in futures if future_id.startswith(prefix)), None)
+
+
+def resolve_frame(message, futures, frame_id):
+    """Resolve the future of an ox_multi or oc_multi input with its
+    notification, or fail it when the whole input was rejected.
+
+    Parameters
+    ----------
+    message : str
+        The notification of the input.
+    futures : dict
+        A dict of intercept_id's and future objects.
+        dict{intercept_id, future_object}
+    frame_id : str
+        The intercept_id of the input future, see ``oldest_frame_id``.
+    """
+    if frame_id is None:
+        return
+    if message[6] in ERROR_STATUSES:
+        reject_futures(futures, [frame_id], RequestError.from_notification(message))
+        return
+    futures[frame_id].set_result({
+        "status": message[6], # Error/Sucess
+        "response": message[4],
+        "comment": message[7]
+    })
+    del futures[frame_id]
+
+
+def multi_cancel_notification(message, futures, future_id):
+    """Handles the oc_multi-req notification of a multi-op operation and
+    check for Future objets of the operation and the cancelled orders.
+
+    Parameters
+    ----------
+    message : str
+        The oc_multi-req notification.
+    futures : dict
+        A dict of intercept_id's and future objects.
+        dict{intercept_id, future_object}
+    future_id : str
+        The intercept_id of the operation's request future, the frame id of
+        its ox_multi input and its index in the input.
+    """
+    if message[6] in ERROR_STATUSES:
+        reject_futures(futures, [future_id] + [f"oc_{order[0]}" for order in message[4] or []],
+                       RequestError.from_notification(message))
+        return
+    if future_id in futures:
+        futures[future_id].set_result({
+            "status": message[6], # Error/Sucess
+            "response": message[4],
+            "comment": message[7]
+        })
+        del futures[future_id]
+
+
+def order_multi_cancel_request(message, futures):
+    """Intercepts multiple orders cancel request info messages (oc_multi-req)
+    of oc_multi inputs and resolves the future of the oldest one sent.
+
+    Parameters
+    ----------
+    message : str
+        The unaltered response message returned by bitfinex.
+    futures : dict
+        A dict of intercept_id's and future objects.
+        dict{intercept_id, future_object}
+    """
+    frame_id = oldest_frame_id(futures, "oc_multi")
+    if message[6] in ERROR_STATUSES:
+        reject_futures(futures, [f"oc_{order[0]}" for order in message[4] or []],
+                       RequestError.from_notification(message))
+    resolve_frame(message, futures, frame_id)
+
+
+def order_multi_op_request(message, futures):
+    """Intercepts order multi-op request info messages (ox_multi-req),
+    handles the request notification of each operation in it and resolves
+    the future of the oldest ox_multi input sent. The notifications are in
+    the order of the operations in the input.
+
+    Parameters
+    ----------
+    message : str
+        The unaltered response message returned by bitfinex.
+    futures : dict
+        A dict of intercept_id's and future objects.
+        dict{intercept_id, future_object}
+    """
+    frame_id = oldest_frame_id(futures, abbreviations.ORDER_MULTI_OP)
+    for index, notification in enumerate(message[4] or []):
+        try:
+            if notification[1] == abbreviations.ORDER_MULTI_CANCEL_REQUEST:
+                multi_cancel_notification(notification, futures, f"{frame_id}_{index}")
+            elif notification[1] in abbreviations.REQUEST_NOTIFICATIONS:
+                CLIENT_HANDLERS[notification[1]](notification, futures)
+        except (KeyError, TypeError, IndexError):
+            pass
+    resolve_frame(message, futures, frame_id)
+
+
 def order_new_success(message, futures):
     """Intercepts order new (on) messages and check for Future objets with
     a matching cid.
@@ -175,6 +363,8 @@ def order_cancel_success(message, futures):
         future = futures[future_id]
     elif future_id_cid in futures.keys():
         future = futures[future_id_cid]
+    else:
+        return
     # print("future", future)
     if message[2][13] == "IOC CANCELED":
         future.set_result({
@@ -210,18 +400,20 @@ def subscription_confirmations(message, futures):
         A dict of intercept_id's and future objects.
         dict{intercept_id, future_object}
     """
+    future_id = subscription_future_id(message)
+    futures[future_id].set_result(message)
+    del futures[future_id]
+
+def subscription_future_id(message):
+    """Returns the intercept_id of the subscribe future matching a subscribed
+    (or subscribe error) message, or None."""
     if message["channel"] in ("trades", "ticker"):
-        future_id = f"{message['channel']}_{message['symbol']}"
-        futures[future_id].set_result(message)
-        del futures[future_id]
+        return f"{message['channel']}_{message['symbol']}"
     elif message["channel"] == "book":
-        future_id = f"book_{message['symbol']}_{message['prec']}_{message['len']}"
-        futures[future_id].set_result(message)
-        del futures[future_id]
+        return f"book_{message['symbol']}_{message['prec']}_{message['len']}"
     elif message["channel"] == "candles":
-        future_id = f"candles_{message['key']}"
-        futures[future_id].set_result(message)
-        del futures[future_id]
+        return f"candles_{message['key']}"
+    return None
 
 def unsubscribe_confirmations(message, futures):
     """Intercepts unsubscribe messages and check for
@@ -251,6 +443,11 @@ def auth_confirmation(message, futures):
         A dict of intercept_id's and future objects.
         dict{intercept_id, future_object}
     """
+    if message.get("status") != "OK":
+        reject_futures(futures, ["auth"], AuthenticationError(
+            message.get("code", 10100), message.get("msg"), message
+        ))
+        return
     future = futures["auth"]
     future.set_result(message)
     del futures["auth"]
@@ -267,26 +464,132 @@ def error_handler(message, futures):
         A dict of intercept_id's and future objects.
         dict{intercept_id, future_object}
     """
-    if "unsubscribe" in message["msg"]:
-        unsubscribe_confirmations(message, futures)
-    elif "subscribe" in message["msg"]:
-        subscription_confirmations(message, futures)
+    code, text = message.get("code", 10000), message.get("msg", "")
+    if 10100 <= code < 10200:
+        reject_futures(futures, ["auth"], AuthenticationError(code, text, message))
+    elif "unsubscribe" in text or code == 10400:
+        reject_futures(futures, [f"unsubscribe_{message.get('chanId')}"],
+                       SubscriptionError(code, text, message))
+    elif "subscribe" in text or code in (10300, 10301):
+        reject_futures(futures, [subscription_future_id(message)],
+                       SubscriptionError(code, text, message))
+
+def info_handler(message, futures):
+    """Intercepts info messages. When the server is stopping (20051) or
+    resyncing (20060) every pending Future object is failed, since none of
+    them will be answered.
+
+    Parameters
+    ----------
+    message : str
+        The unaltered response message returned by bitfinex.
+    futures : dict
+        A dict of intercept_id's and future objects.
+        dict{intercept_id, future_object}
+    """
+    code = message.get("code")
+    if code in (20051, 20060):
+        reject_futures(futures, list(futures),
+                       ServerUnavailableError(code, message.get("msg"), message))
+
+def calc_name(message):
+    """Returns the calc input name (e.g. margin_sym_tBTCUSD) that a
+    calculation result message answers.
+
+    Parameters
+    ----------
+    message : list
+        A miu, fiu, pu or wu message returned over the auth channel.
+    """
+    message_type, data = message[1], message[2]
+    if message_type == "miu" and data[0] == "base":
+        return "margin_base"
+    elif message_type == "miu":
+        return f"margin_sym_{data[1]}"
+    elif message_type == "fiu":
+        return f"funding_sym_{data[1]}"
+    elif message_type == "pu":
+        return f"position_{data[0]}"
+    return f"wallet_{data[0]}_{data[1]}"
+
+def calc_result(message, futures):
+    """Intercepts calculation results (miu, fiu, pu and wu) and check for
+    Future objets created by a matching calc request.
+
+    Parameters
+    ----------
+    message : str
+        The unaltered response message returned by bitfinex.
+    futures : dict
+        A dict of intercept_id's and future objects.
+        dict{intercept_id, future_object}
+    """
+    future_id = f"calc_{calc_name(message)}"
+    future = futures.pop(future_id)
+    # The request may have timed out before a late result arrives
+    if not future.done():
+        future.set_result(message[2])
 
 CLIENT_HANDLERS = {
     "subscribed": subscription_confirmations,
     "unsubscribed": unsubscribe_confirmations,
     "auth": auth_confirmation,
-    "error": subscription_confirmations,
-    "on-req": order_new_request,
-    "ou-req": order_update_request,
-    "oc-req": order_cancel_request,
+    "error": error_handler,
+    "info": info_handler,
+    abbreviations.ORDER_NEW_REQUEST: order_new_request,
+    abbreviations.ORDER_UPDATE_REQUEST: order_update_request,
+    abbreviations.ORDER_CANCEL_REQUEST: order_cancel_request,
+    abbreviations.ORDER_MULTI_CANCEL_REQUEST: order_multi_cancel_request,
+    abbreviations.ORDER_MULTI_OP_REQUEST: order_multi_op_request,
     "pong": pong_handler,
-    "on": order_new_success,
-    "ou": order_update_success,
-    "oc": order_cancel_success,
+    abbreviations.ORDER_NEW: order_new_success,
+    abbreviations.ORDER_UPDATE: order_update_success,
+    abbreviations.ORDER_CANCEL: order_cancel_success,
+    **dict.fromkeys(abbreviations.CALC_RESULT_MESSAGES, calc_result),
     # **(message_handlers if message_handlers else {})
 }
 
+class MultiOpHandle:
+    """Aggregate handle for the operations sent with ``WssClient.multi_op``.
+
+    Awaiting the handle waits for ``confirm_future``.
+
+    Parameters
+    ----------
+    handles : list
+        A handle dict for each operation, with "request_future" and
+        "confirm_future" like the ones returned by new_order.
+    send_tasks : list
+        The tasks sending the ox_multi inputs.
+
+    Attributes
+    ----------
+    request_future : Future
+        Resolves to a list of the request responses when every operation
+        with a request future has been acknowledged.
+    confirm_future : Future
+        Resolves to a list of the confirmations, in the order the operations
+        were given, when every operation has been confirmed.
+    """
+
+    def __init__(self, handles, send_tasks=()):
+        self.handles = handles
+        self.send_tasks = list(send_tasks)
+        self.request_future = asyncio.gather(*[
+            handle["request_future"] for handle in handles
+            if handle.get("request_future") is not None
+        ])
+        self.confirm_future = asyncio.gather(*[
+            handle["confirm_future"] for handle in handles
+        ])
+
+    def __await__(self):
+        return self.confirm_future.__await__()
+
+    def __len__(self):
+        return len(self.handles)
+
+
 class FuturesHandler(MutableMapping):
     """Handles Future objects and sets results when matching
     responses are found.
@@ -341,7 +644,7 @@ class FuturesHandler(MutableMapping):
         try:
             message_type, message = self._get_message_type(message)
             return self._message_handlers[message_type](message, self.futures)
-        except (KeyError, TypeError):
+        except (KeyError, TypeError, InvalidStateError):
             pass
 
     def __getitem__(self, future_key):
@@ -371,3 +674,33 @@ class FuturesHandler(MutableMapping):
         else:
             message_type = message["event"]
         return message_type, message
+
+
+class OrderHandle(dict):
+    """Handle returned by ``WssClient.new_order``. A dict with the
+    "request_future", "confirm_future" and "cid" of the order, which can also
+    wait for fills.
+
+    Parameters
+    ----------
+    fills : FillTable
+        The client's fill table.
+    amount : decimal string
+        The order amount, waited for by ``filled()``.
+    """
+
+    def __init__(self, fills, amount, **handle):
+        super().__init__(**handle)
+        self.fills = fills
+        self.amount = amount
+
+    @property
+    def fill(self):
+        """The ``OrderFill`` of the order so far, or None before any fill."""
+        return self.fills.get_by_cid(self["cid"])
+
+    def filled(self, amount=None):
+        """Returns a Future resolving to the ``OrderFill`` once the given
+        absolute amount (the whole order by default) has been filled, e.g.
+        ``await handle.filled("0.5")``."""
+        return self.fills.wait_filled(self["cid"], self.amount if amount is None else amount)
@@ -0,0 +1,92 @@
+"""Module for turning a desired quote ladder into the order operations that
+move the live orders to it"""
+import math
+
+from . import abbreviations
+from .state import ORDER_AMOUNT, ORDER_ID, ORDER_PRICE
+
+
+def _same(value, other):
+    return math.isclose(value, other, rel_tol=1e-9, abs_tol=1e-12)
+
+
+def diff_ladder(levels, orders, new_order_op):
+    """Compare desired price levels with live orders and return the smallest
+    set of operations that turns the orders into the levels.
+
+    Levels and orders are matched per side (sign of the amount):
+
+        1. Orders equal to a level are left alone.
+        2. Orders at the price of a level get an amount update (ou).
+        3. Remaining orders are moved to the remaining levels, pairing both
+           in price order, with a price (and amount) update (ou).
+        4. Orders left over are cancelled in one oc_multi operation and
+           levels left over get new orders (on).
+
+    Parameters
+    ----------
+    levels : list
+        Desired (price, amount) levels. Positive amounts buy, negative sell.
+        Values can be decimal strings or numbers and are sent as given.
+
+    orders : list
+        Live order arrays, e.g. from ``WssClient.orders.by_symbol``.
+
+    new_order_op : func
+        Called with (price, amount) to create the operation for a new order.
+
+    Returns
+    -------
+    list
+        Operations as [code, dict] pairs, cancels first, for
+        ``WssClient.multi_op``.
+    """
+    wanted = {True: [], False: []}
+    for price, amount in levels:
+        wanted[float(amount) > 0].append((float(price), float(amount), price, amount))
+    live = {True: [], False: []}
+    for order in orders:
+        live[order[ORDER_AMOUNT] > 0].append(order)
+
+    cancels, updates, news = [], [], []
+    for side in (True, False):
+        side_levels, side_orders = wanted[side], live[side]
+
+        # Orders already equal to a level, then orders at the price of a level
+        for same_amount in (True, False):
+            unmatched = []
+            for level in side_levels:
+                price, amount, _, raw_amount = level
+                for order in side_orders:
+                    if not _same(order[ORDER_PRICE], price):
+                        continue
+                    if same_amount and not _same(order[ORDER_AMOUNT], amount):
+                        continue
+                    side_orders.remove(order)
+                    if not same_amount:
+                        updates.append([abbreviations.ORDER_UPDATE, {
+                            "id": order[ORDER_ID], "amount": raw_amount
+                        }])
+                    break
+                else:
+                    unmatched.append(level)
+            side_levels = unmatched
+
+        # Move the remaining orders to the remaining levels
+        side_levels.sort(key=lambda level: level[0])
+        side_orders.sort(key=lambda order: order[ORDER_PRICE])
+        for (_, amount, raw_price, raw_amount), order in zip(side_levels, side_orders):
+            update = {"id": order[ORDER_ID], "price": raw_price}
+            if not _same(order[ORDER_AMOUNT], amount):
+                update["amount"] = raw_amount
+            updates.append([abbreviations.ORDER_UPDATE, update])
+
+        moved = min(len(side_levels), len(side_orders))
+        cancels.extend(order[ORDER_ID] for order in side_orders[moved:])
+        news.extend(
+            [abbreviations.ORDER_NEW, new_order_op(raw_price, raw_amount)]
+            for _, _, raw_price, raw_amount in side_levels[moved:]
+        )
+
+    operations = [["oc_multi", {"id": cancels}]] if cancels else []
+    return operations + updates + news
@@ -0,0 +1,158 @@
+"""Module for measuring the round trip time of orders sent over the bitfinex
+auth channel"""
+import math
+import time
+from collections import defaultdict
+
+STAGES = ("send", "ack", "confirm")
+"""Latency stages: enqueue to wire send, wire send to request notification
+(on-req, ou-req, oc-req) and wire send to confirmation (on, ou, oc)"""
+
+
+class LatencyHistogram:
+    """Histogram of latencies in nanoseconds with logarithmic buckets.
+
+    Every power of two is split into ``SUB_BUCKETS`` buckets, so percentiles
+    are accurate to within about 20% at any scale, while adding a value only
+    costs a ``math.frexp`` call.
+    """
+
+    SUB_BUCKETS = 4
+
+    def __init__(self):
+        self.counts = [0] * (66 * self.SUB_BUCKETS)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """Add a latency in nanoseconds."""
+        value = max(int(value), 1)
+        mantissa, exponent = math.frexp(value)
+        self.counts[exponent * self.SUB_BUCKETS
+                    + int((mantissa - 0.5) * 2 * self.SUB_BUCKETS)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def bucket_bounds(self, index):
+        """Returns the (low, high) nanosecond bounds of a bucket."""
+        exponent, sub_bucket = divmod(index, self.SUB_BUCKETS)
+        low = math.ldexp(0.5 + sub_bucket / (2 * self.SUB_BUCKETS), exponent)
+        high = math.ldexp(0.5 + (sub_bucket + 1) / (2 * self.SUB_BUCKETS), exponent)
+        return low, high
+
+    def percentile(self, percent):
+        """Returns the upper bound of the bucket holding the given percentile
+        (0-100), capped at the largest value seen, or None if empty."""
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * percent / 100) or 1
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(self.bucket_bounds(index)[1], self.max)
+        return self.max
+
+    def summary(self):
+        """Returns count, mean, min, max, p50, p90 and p99 in milliseconds."""
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": self.total / self.count / 1e6,
+            "min": self.min / 1e6,
+            "max": self.max / 1e6,
+            "p50": self.percentile(50) / 1e6,
+            "p90": self.percentile(90) / 1e6,
+            "p99": self.percentile(99) / 1e6,
+        }
+
+
+class OrderTimings:
+    """Timestamps (``time.perf_counter_ns``) of one order action."""
+
+    __slots__ = ("action", "symbol", "order_type", "enqueued", "sent")
+
+    def __init__(self, action, symbol, order_type, enqueued):
+        self.action = action
+        self.symbol = symbol
+        self.order_type = order_type
+        self.enqueued = enqueued
+        self.sent = None
+
+
+class LatencyTracker:
+    """Latency histograms of order actions, keyed by
+    (action, symbol, order type, stage).
+
+    Actions are timestamped when queued (``start``) and when written to the
+    connection (``sent``). The request and confirm futures already created
+    for the action record when their response arrived (``resolved_at``), so
+    ``track`` only adds a done callback to each. Rejected, cancelled or timed
+    out futures are not counted.
+
+    Example
+    -------
+     ::
+
+        my_client.new_order("LIMIT", "BTCUSD", "0.1", "1000")
+        ...
+        for (action, symbol, order_type, stage), summary in my_client.latency.report().items():
+            print(action, symbol, order_type, stage, summary["p50"], summary["p99"])
+
+    Attributes
+    ----------
+    enabled : bool
+        Set to False to stop tracking.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = defaultdict(LatencyHistogram)
+
+    def start(self, action, symbol=None, order_type=None):
+        """Timestamp an order action (on, ou or oc) as queued. Returns the
+        timings to pass to ``sent`` and ``track``, or None if disabled."""
+        if not self.enabled:
+            return None
+        return OrderTimings(action, symbol, order_type, time.perf_counter_ns())
+
+    def sent(self, timings):
+        """Timestamp an order action as written to the connection."""
+        timings.sent = time.perf_counter_ns()
+        self._add(timings, "send", timings.sent - timings.enqueued)
+
+    def track(self, timings, request_future, confirm_future):
+        """Record the ack and confirm latencies when the futures resolve."""
+        if timings is None:
+            return
+        request_future.add_done_callback(lambda future: self._resolved(timings, "ack", future))
+        confirm_future.add_done_callback(lambda future: self._resolved(timings, "confirm", future))
+
+    def _resolved(self, timings, stage, future):
+        if timings.sent is None or future.cancelled() or future.exception() is not None:
+            return
+        resolved_at = getattr(future, "resolved_at", None) or time.perf_counter_ns()
+        self._add(timings, stage, resolved_at - timings.sent)
+
+    def _add(self, timings, stage, value):
+        self.histograms[(timings.action, timings.symbol, timings.order_type, stage)].add(value)
+
+    def histogram(self, action, symbol, order_type, stage):
+        """Returns the histogram for an action, symbol, order type and stage,
+        e.g. ("on", "tBTCUSD", "EXCHANGE LIMIT", "confirm"), or None."""
+        return self.histograms.get((action, symbol, order_type, stage))
+
+    def report(self):
+        """Returns {(action, symbol, order type, stage): summary} for every
+        histogram, see ``LatencyHistogram.summary``."""
+        return {key: histogram.summary() for key, histogram in self.histograms.items()}
+
+    def reset(self):
+        self.histograms.clear()
@@ -0,0 +1,113 @@
+"""Module for encoding new order inputs straight to websocket payloads"""
+from functools import lru_cache
+from json import dumps
+from json.encoder import encode_basestring
+
+from .. import utils
+from . import abbreviations
+
+OPTIONAL_ORDER_FIELDS = ("price_trailing", "price_aux_limit", "price_oco_stop", "tif")
+"""Order fields only sent when they are given, in the order they are sent"""
+
+order_symbol = lru_cache(maxsize=1024)(utils.order_symbol)
+"""Cached version of ``utils.order_symbol``"""
+
+
+@lru_cache(maxsize=1024)
+def _encoded_symbol(symbol):
+    return encode_basestring(order_symbol(symbol)).encode('utf8')
+
+
+def encode_value(value):
+    """Encode a single order value as json bytes.
+
+    Strings and finite numbers are encoded directly, anything else falls back
+    to ``json.dumps``. Strings are not ascii escaped, which matches
+    ``json.dumps(value, ensure_ascii=False)``.
+    """
+    cls = value.__class__
+    if cls is str:
+        return encode_basestring(value).encode('utf8')
+    elif cls is int or (cls is float and value - value == 0):
+        return repr(value).encode('ascii')
+    return dumps(value, ensure_ascii=False).encode('utf8')
+
+
+class OrderEncoder:
+    """Turns new orders into ``on`` input payloads without building
+    intermediate dicts.
+
+    A byte template is prebuilt for each order type the first time it is used,
+    and symbol normalisation is cached, so encoding an order only formats the
+    values into the template. The payload is equal to json encoding the
+    operation returned by ``WssClient.new_order_op``.
+
+    Example
+    -------
+     ::
+
+        encoder = OrderEncoder()
+        payload = encoder.encode("EXCHANGE LIMIT", "BTCUSD", "0.004", "1000.0",
+                                 cid=utils.create_cid())
+    """
+
+    def __init__(self):
+        self._templates = {}
+
+    def _template(self, order_type):
+        template = self._templates.get(order_type)
+        if template is None:
+            template = b"".join([
+                b'[0,', encode_value(abbreviations.ORDER_NEW), b',null,{"type":',
+                encode_value(order_type).replace(b'%', b'%%'),
+                b',"symbol":%b,"amount":%b,"price":%b,"hidden":%b,"flags":%d,'
+                b'"meta":{"aff_code":"b2UR2iQr"}%b,"cid":%d}]'
+            ])
+            self._templates[order_type] = template
+        return template
+
+    def encode(self, order_type, symbol, amount, price, cid, **kwargs):
+        """Encode a new order input.
+
+        Parameters
+        ----------
+        order_type : str
+            Order type, e.g. "EXCHANGE LIMIT".
+
+        symbol : str
+            The currency symbol to be traded. e.g. BTCUSD
+
+        amount : decimal str
+            The amount to be traided.
+
+        price : decimal str
+            The price to buy at.
+
+        cid : int
+            Client order id.
+
+        **kwargs
+            hidden, flags, price_trailing, price_aux_limit, price_oco_stop and
+            tif, as for ``WssClient.new_order_op``. Other keyword arguments are
+            ignored.
+
+        Returns
+        -------
+        bytes
+            The utf8 encoded input payload.
+        """
+        optional = b""
+        if kwargs:
+            optional = b"".join([
+                b',"%b":%b' % (field.encode('ascii'), encode_value(kwargs[field]))
+                for field in OPTIONAL_ORDER_FIELDS if kwargs.get(field)
+            ])
+        return self._template(order_type) % (
+            _encoded_symbol(symbol),
+            encode_value(amount),
+            encode_value(price),
+            encode_value(kwargs.get("hidden", 0)),
+            sum(kwargs.get("flags", ())),
+            optional,
+            cid
+        )
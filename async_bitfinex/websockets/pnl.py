@@ -0,0 +1,197 @@
+"""Module for incremental profit and loss of positions built from fills on
+the bitfinex auth channel"""
+import math
+from array import array
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, see extras_require in setup.py
+    numpy = None
+
+from .state import (POSITION_AMOUNT, POSITION_BASE_PRICE, POSITION_SYMBOL, TRADE_EXEC_AMOUNT,
+                    TRADE_EXEC_PRICE, TRADE_FEE, TRADE_FEE_CURRENCY, TRADE_SYMBOL)
+
+
+def quote_currency(symbol):
+    """Returns the quote currency of a trading pair, e.g. USD for tBTCUSD
+    or TESTUSD for tTESTBTC:TESTUSD."""
+    pair = symbol[1:] if symbol[0] in "tf" else symbol
+    return pair.split(":")[1] if ":" in pair else pair[-3:]
+
+
+class PnLEngine:
+    """Realised and unrealised profit and loss per symbol, using average
+    cost.
+
+    Every symbol is a row in ``array('d')`` columns (amount, base price,
+    realised, fees and mark), so fills and mark updates are O(1) and the
+    portfolio totals are computed over whole columns, with numpy when it is
+    installed. Totals are kept per quote currency, since PnL in USD and in
+    BTC cannot be added up. Fees are only counted when they are charged in
+    the quote currency of the symbol.
+
+    Fills come from the ``FillTable`` "trade" and "fee" events, and the
+    engine is seeded from the position snapshot. Marks are set with
+    ``update_mark`` or from a ticker subscription with ``ticker_callback``.
+
+    Example
+    -------
+     ::
+
+        my_client.subscribe_to_ticker(
+            "BTCUSD", callback=my_client.pnl.ticker_callback("tBTCUSD")
+        )
+        ...
+        print(my_client.pnl.unrealised("tBTCUSD"), my_client.pnl.total()["USD"])
+    """
+
+    COLUMNS = ("amount", "base_price", "realised", "fees", "mark")
+
+    def __init__(self):
+        self.symbols = []
+        self._rows = {}
+        for column in self.COLUMNS:
+            setattr(self, column, array("d"))
+        # The quote currencies, and the index in them of each row's quote
+        self.quotes = []
+        self._quote_index = {}
+        self.quote = array("q")
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._rows
+
+    def _row(self, symbol):
+        row = self._rows.get(symbol)
+        if row is None:
+            row = self._rows[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            for column in ("amount", "base_price", "realised", "fees"):
+                getattr(self, column).append(0.0)
+            self.mark.append(math.nan)
+            quote = quote_currency(symbol)
+            if quote not in self._quote_index:
+                self._quote_index[quote] = len(self.quotes)
+                self.quotes.append(quote)
+            self.quote.append(self._quote_index[quote])
+        return row
+
+    def _by_quote(self, values):
+        """Sums per row ``values`` (a numpy array or an iterable) into
+        {quote currency: total}."""
+        if numpy is not None and self.symbols:
+            totals = numpy.bincount(numpy.frombuffer(self.quote, dtype=numpy.int64),
+                                    weights=values, minlength=len(self.quotes))
+            return dict(zip(self.quotes, totals.tolist()))
+        totals = [[] for _ in self.quotes]
+        for quote, value in zip(self.quote, values):
+            totals[quote].append(value)
+        return {quote: math.fsum(rows) for quote, rows in zip(self.quotes, totals)}
+
+    def seed(self, positions):
+        """Set amounts and base prices from position arrays, e.g. the ps
+        snapshot. Realised PnL and fees are kept."""
+        for position in positions:
+            row = self._row(position[POSITION_SYMBOL])
+            self.amount[row] = position[POSITION_AMOUNT]
+            self.base_price[row] = position[POSITION_BASE_PRICE]
+
+    def fill(self, symbol, amount, price, fee=0.0):
+        """Add an execution of ``amount`` (negative to sell) at ``price``.
+
+        Fills in the direction of the position move the base price to the
+        average cost, fills against it realise PnL at the base price, and a
+        fill that flips the position opens the remainder at ``price``. A fill
+        of 0 on a flat position only adds the fee.
+        """
+        row = self._row(symbol)
+        position = self.amount[row]
+        base_price = self.base_price[row]
+        if position == 0 or (position > 0) == (amount > 0):
+            total = position + amount
+            if total:
+                self.base_price[row] = (position * base_price + amount * price) / total
+        else:
+            closed = math.copysign(min(abs(amount), abs(position)), position)
+            self.realised[row] += closed * (price - base_price)
+            total = position + amount
+            if total == 0 or (total > 0) != (position > 0):
+                self.base_price[row] = price if total else 0.0
+        self.amount[row] = total
+        self.fees[row] += fee
+
+    def add_fee(self, symbol, fee):
+        """Add a fee (negative when charged) in the quote currency."""
+        self.fees[self._row(symbol)] += fee
+
+    def update_mark(self, symbol, price):
+        """Set the price used for the unrealised PnL of a symbol."""
+        self.mark[self._row(symbol)] = price
+
+    def update_ticker(self, symbol, ticker):
+        """Set the mark to the bid/ask mid of a ticker array,
+        [BID, BID_SIZE, ASK, ASK_SIZE, ...]."""
+        self.update_mark(symbol, (ticker[0] + ticker[2]) / 2)
+
+    def ticker_callback(self, symbol):
+        """Returns a callback for ``WssClient.subscribe_to_ticker`` that
+        keeps the mark of ``symbol`` at the bid/ask mid."""
+        def callback(message):
+            if isinstance(message, list) and isinstance(message[1], list):
+                self.update_ticker(symbol, message[1])
+        return callback
+
+    def unrealised(self, symbol=None):
+        """Returns the unrealised PnL of a symbol, or {quote currency: PnL}
+        of all symbols with a mark if no symbol is given."""
+        if symbol is not None:
+            row = self._rows.get(symbol)
+            if row is None or math.isnan(self.mark[row]):
+                return 0.0
+            return self.amount[row] * (self.mark[row] - self.base_price[row])
+        if numpy is not None and self.symbols:
+            amount, base_price, mark = (numpy.frombuffer(column, dtype=numpy.float64)
+                                        for column in (self.amount, self.base_price, self.mark))
+            return self._by_quote(numpy.nan_to_num(amount * (mark - base_price)))
+        return self._by_quote(
+            0.0 if math.isnan(mark) else amount * (mark - base_price)
+            for amount, base_price, mark in zip(self.amount, self.base_price, self.mark)
+        )
+
+    def realised_total(self):
+        """Returns {quote currency: realised PnL including fees} of all
+        symbols."""
+        if numpy is not None and self.symbols:
+            return self._by_quote(numpy.frombuffer(self.realised, dtype=numpy.float64)
+                                  + numpy.frombuffer(self.fees, dtype=numpy.float64))
+        return self._by_quote(realised + fees for realised, fees in zip(self.realised, self.fees))
+
+    def total(self):
+        """Returns {quote currency: realised (including fees) plus unrealised
+        PnL} of all symbols."""
+        unrealised = self.unrealised()
+        return {quote: realised + unrealised[quote]
+                for quote, realised in self.realised_total().items()}
+
+    def as_dict(self, symbol):
+        """Returns the row of a symbol as a dict, or None."""
+        row = self._rows.get(symbol)
+        if row is None:
+            return None
+        values = {column: getattr(self, column)[row] for column in self.COLUMNS}
+        values["unrealised"] = self.unrealised(symbol)
+        return values
+
+    def on_position(self, event, positions):
+        """``PositionTable`` listener seeding the engine from snapshots."""
+        if event == "snapshot":
+            self.seed(positions)
+
+    def on_trade(self, event, trade):
+        """``FillTable`` listener adding trades and fees."""
+        if event == "trade":
+            self.fill(trade[TRADE_SYMBOL], trade[TRADE_EXEC_AMOUNT], trade[TRADE_EXEC_PRICE])
+        elif event == "fee" and trade[TRADE_FEE_CURRENCY] == quote_currency(trade[TRADE_SYMBOL]):
+            self.add_fee(trade[TRADE_SYMBOL], trade[TRADE_FEE])
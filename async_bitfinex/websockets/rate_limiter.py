@@ -0,0 +1,143 @@
+"""Module for pacing inputs sent over the bitfinex auth channel"""
+import asyncio
+
+from .. import utils
+
+CALC_BATCH_LIMIT = 30
+"""Maximum number of calculations the websocket server accepts per calc input"""
+
+DEFAULT_RATE_LIMITS = {
+    # The websocket server performs a maximum of 8 calculations per second
+    # per client. docs: https://docs.bitfinex.com/v2/reference#ws-input-calc
+    "calc": (8, 8),
+}
+"""Default token bucket settings, {input_type: (rate per second, burst)}"""
+
+
+class RateLimitExceeded(Exception):
+    """Raised when an input would exceed its rate limit and the limiter is
+    set to fail fast.
+
+    Parameters
+    ----------
+    input_type : str
+        The input type that was limited, e.g. "on" or "calc".
+
+    retry_after : float
+        Seconds until the input would have been allowed.
+    """
+
+    def __init__(self, input_type, retry_after):
+        super().__init__(input_type, retry_after)
+        self.input_type = input_type
+        self.retry_after = retry_after
+
+
+class AuthRateLimiter:
+    """Token buckets for each input type sent over the auth connection.
+
+    Inputs that would go over the limit are queued until the bucket allows
+    them, or rejected with ``RateLimitExceeded`` if ``fail_fast`` is set.
+    Input types without a configured bucket are sent without pacing.
+
+    Parameters
+    ----------
+    rate_limits : dict
+        Token bucket settings per input type, {input_type: (rate, burst)}.
+        Merged with ``DEFAULT_RATE_LIMITS``. Set a value to None to remove a
+        default limit.
+
+    fail_fast : bool
+        Raise ``RateLimitExceeded`` instead of queueing. Default: False
+
+    Example
+    -------
+     ::
+
+        limiter = AuthRateLimiter({"on": (50, 100), "oc": (50, 100)})
+        limiter.metrics()["calc"]["queued"]
+    """
+
+    def __init__(self, rate_limits=None, fail_fast=False):
+        limits = dict(DEFAULT_RATE_LIMITS)
+        limits.update(rate_limits or {})
+        self.fail_fast = fail_fast
+        self.buckets = {
+            input_type: utils.TokenBucket(*limit)
+            for input_type, limit in limits.items() if limit
+        }
+        self._metrics = {
+            input_type: {
+                "queued": 0,
+                "max_queued": 0,
+                "sent": 0,
+                "delayed": 0,
+                "rejected": 0,
+                "total_wait": 0.0,
+                "max_wait": 0.0,
+            }
+            for input_type in self.buckets
+        }
+
+    def reserve(self, input_type, tokens=1):
+        """Reserve capacity for an input.
+
+        Parameters
+        ----------
+        input_type : str
+            The input type, e.g. "on", "oc", "ou", "ox_multi" or "calc".
+
+        tokens : int
+            Number of tokens the input costs. Default: 1
+
+        Returns
+        -------
+        float
+            Seconds to wait before sending the input.
+
+        Raises
+        ------
+        RateLimitExceeded
+            If the limiter fails fast and the bucket is empty.
+        """
+        bucket = self.buckets.get(input_type)
+        if bucket is None:
+            return 0.0
+        if self.fail_fast:
+            if not bucket.try_consume(tokens):
+                self._metrics[input_type]["rejected"] += 1
+                raise RateLimitExceeded(input_type, bucket.delay(tokens))
+            return 0.0
+        return bucket.reserve(tokens)
+
+    async def wait(self, input_type, delay):
+        """Wait for a reservation made with ``reserve`` while keeping track
+        of queue depth and wait time."""
+        metrics = self._metrics.get(input_type)
+        if metrics is None:
+            return
+        if delay > 0:
+            metrics["delayed"] += 1
+            metrics["queued"] += 1
+            metrics["max_queued"] = max(metrics["max_queued"], metrics["queued"])
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                metrics["queued"] -= 1
+            metrics["total_wait"] += delay
+            metrics["max_wait"] = max(metrics["max_wait"], delay)
+        metrics["sent"] += 1
+
+    def metrics(self):
+        """Queue depth and wait time metrics for each rate limited input type.
+
+        Returns
+        -------
+        dict
+            {input_type: {"queued", "max_queued", "sent", "delayed",
+            "rejected", "total_wait", "max_wait"}}
+        """
+        return {
+            input_type: dict(metrics)
+            for input_type, metrics in self._metrics.items()
+        }
@@ -0,0 +1,612 @@
+"""Module for account state kept up to date from bitfinex auth channel
+messages"""
+import asyncio
+import math
+import time
+from collections import defaultdict, deque
+from copy import deepcopy
+
+from .exceptions import OrderClosedError
+
+# Order fields. docs: https://docs.bitfinex.com/v2/reference#ws-auth-orders
+ORDER_ID = 0
+ORDER_GID = 1
+ORDER_CID = 2
+ORDER_SYMBOL = 3
+ORDER_MTS_CREATE = 4
+ORDER_MTS_UPDATE = 5
+ORDER_AMOUNT = 6
+ORDER_AMOUNT_ORIG = 7
+ORDER_TYPE = 8
+ORDER_STATUS = 13
+ORDER_PRICE = 16
+ORDER_PRICE_AVG = 17
+
+# Wallet fields. docs: https://docs.bitfinex.com/v2/reference#ws-auth-wallets
+WALLET_TYPE = 0
+WALLET_CURRENCY = 1
+WALLET_BALANCE = 2
+WALLET_UNSETTLED_INTEREST = 3
+WALLET_BALANCE_AVAILABLE = 4
+
+# Position fields. docs: https://docs.bitfinex.com/v2/reference#ws-auth-position
+POSITION_SYMBOL = 0
+POSITION_STATUS = 1
+POSITION_AMOUNT = 2
+POSITION_BASE_PRICE = 3
+POSITION_PL = 6
+
+# Trade fields. docs: https://docs.bitfinex.com/v2/reference#ws-auth-trades
+TRADE_ID = 0
+TRADE_SYMBOL = 1
+TRADE_MTS_CREATE = 2
+TRADE_ORDER_ID = 3
+TRADE_EXEC_AMOUNT = 4
+TRADE_EXEC_PRICE = 5
+TRADE_ORDER_TYPE = 6
+TRADE_ORDER_PRICE = 7
+TRADE_MAKER = 8
+TRADE_FEE = 9
+TRADE_FEE_CURRENCY = 10
+TRADE_CID = 11
+
+
+class StateTable:
+    """Base class for tables built from auth channel messages.
+
+    Subclasses map the message types they handle to methods in
+    ``message_handlers``. Listeners added with ``add_listener`` are called
+    with ``(event, item)`` for every change.
+    """
+
+    def __init__(self):
+        self.snapshot_received = False
+        self.last_update = None
+        self.last_seen = None
+        self._listeners = []
+
+    @property
+    def message_handlers(self):
+        """A decision table of {message_type: handler}. Handlers are called
+        with the data part of the message (message[2])."""
+        return {}
+
+    def add_listener(self, callback):
+        """Add a function called with ``(event, item)`` on every change."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self._listeners.remove(callback)
+
+    def seen(self, now=None):
+        """Mark the connection feeding the table as alive. Called for every
+        auth channel message, including heartbeats."""
+        self.last_seen = time.monotonic() if now is None else now
+
+    def is_fresh(self, max_age):
+        """Whether the table can be trusted instead of asking the REST api.
+
+        A table is fresh once its snapshot has been received and the auth
+        channel has delivered a message (bitfinex sends heartbeats every 15
+        seconds) within the last ``max_age`` seconds.
+        """
+        return (
+            self.snapshot_received
+            and self.last_seen is not None
+            and time.monotonic() - self.last_seen <= max_age
+        )
+
+    def _changed(self, event, item):
+        self.last_update = self.last_seen = time.monotonic()
+        for listener in self._listeners:
+            listener(event, item)
+
+
+class OrderTable(StateTable):
+    """Live orders built from the os, on, ou and oc messages on the auth
+    channel. Orders are stored as the arrays bitfinex sends and are indexed by
+    id, cid, gid and symbol.
+
+    Change events are "snapshot" (with the list of orders), "new", "update"
+    and "close" (with the order array).
+
+    Example
+    -------
+     ::
+
+        my_client = WssClient(key, secret)
+        my_client.authenticate(print)
+
+        my_client.orders.add_listener(lambda event, order: print(event, order))
+
+        for order in my_client.orders.by_symbol("tBTCUSD"):
+            print(order[ORDER_ID], order[ORDER_PRICE], order[ORDER_AMOUNT])
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._orders = {}
+        self._cids = {}
+        self._gids = defaultdict(set)
+        self._symbols = defaultdict(set)
+
+    @property
+    def message_handlers(self):
+        return {
+            "os": self.snapshot,
+            "on": self.upsert,
+            "ou": self.upsert,
+            "oc": self.remove,
+        }
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __iter__(self):
+        return iter(list(self._orders.values()))
+
+    def __contains__(self, order_id):
+        return order_id in self._orders
+
+    def _index(self, order):
+        order_id = order[ORDER_ID]
+        self._orders[order_id] = order
+        if order[ORDER_CID] is not None:
+            self._cids[order[ORDER_CID]] = order_id
+        if order[ORDER_GID] is not None:
+            self._gids[order[ORDER_GID]].add(order_id)
+        self._symbols[order[ORDER_SYMBOL]].add(order_id)
+
+    def _unindex(self, order):
+        order_id = order[ORDER_ID]
+        del self._orders[order_id]
+        if self._cids.get(order[ORDER_CID]) == order_id:
+            del self._cids[order[ORDER_CID]]
+        for index, key in ((self._gids, order[ORDER_GID]),
+                           (self._symbols, order[ORDER_SYMBOL])):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(order_id)
+                if not ids:
+                    del index[key]
+
+    def snapshot(self, orders):
+        """Replace all orders with an order snapshot (os)."""
+        self._orders.clear()
+        self._cids.clear()
+        self._gids.clear()
+        self._symbols.clear()
+        for order in orders:
+            self._index(order)
+        self.snapshot_received = True
+        self._changed("snapshot", list(orders))
+
+    def upsert(self, order):
+        """Add a new order (on) or update an existing order (ou)."""
+        previous = self._orders.get(order[ORDER_ID])
+        if previous is not None:
+            self._unindex(previous)
+        self._index(order)
+        self._changed("new" if previous is None else "update", order)
+
+    def remove(self, order):
+        """Remove a closed order (oc), i.e. canceled or fully executed."""
+        if order[ORDER_ID] in self._orders:
+            self._unindex(self._orders[order[ORDER_ID]])
+        self._changed("close", order)
+
+    def get(self, order_id):
+        """Returns the order with the given id, or None."""
+        return self._orders.get(order_id)
+
+    def get_by_cid(self, cid):
+        """Returns the order with the given client order id, or None."""
+        order_id = self._cids.get(cid)
+        return None if order_id is None else self._orders[order_id]
+
+    def by_gid(self, gid):
+        """Returns a list of the orders in the given group."""
+        return [self._orders[order_id] for order_id in self._gids.get(gid, ())]
+
+    def by_symbol(self, symbol):
+        """Returns a list of the orders for the given symbol, e.g. tBTCUSD."""
+        return [self._orders[order_id] for order_id in self._symbols.get(symbol, ())]
+
+
+class WalletTable(StateTable):
+    """Wallets built from the ws and wu messages on the auth channel, keyed
+    by (wallet type, currency). Wallets are stored as the arrays bitfinex
+    sends, which have the same layout as ``ClientV2.wallets_balance``.
+
+    Change events are "snapshot" (with the list of wallets) and "update"
+    (with the wallet array).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._wallets = {}
+
+    @property
+    def message_handlers(self):
+        return {
+            "ws": self.snapshot,
+            "wu": self.update,
+        }
+
+    def __len__(self):
+        return len(self._wallets)
+
+    def __iter__(self):
+        return iter(list(self._wallets.values()))
+
+    def snapshot(self, wallets):
+        """Replace all wallets with a wallet snapshot (ws)."""
+        self._wallets = {
+            (wallet[WALLET_TYPE], wallet[WALLET_CURRENCY]): wallet
+            for wallet in wallets
+        }
+        self.snapshot_received = True
+        self._changed("snapshot", list(wallets))
+
+    def update(self, wallet):
+        """Add or update a wallet (wu)."""
+        self._wallets[(wallet[WALLET_TYPE], wallet[WALLET_CURRENCY])] = wallet
+        self._changed("update", wallet)
+
+    def get(self, wallet_type, currency):
+        """Returns the wallet array, e.g. get("exchange", "USD"), or None."""
+        return self._wallets.get((wallet_type, currency))
+
+    def as_list(self):
+        """Returns a copy of all wallets in the format of
+        ``ClientV2.wallets_balance``."""
+        return deepcopy(list(self._wallets.values()))
+
+
+class PositionTable(StateTable):
+    """Active positions built from the ps, pn, pu and pc messages on the auth
+    channel, keyed by symbol. Positions are stored as the arrays bitfinex
+    sends, which have the same layout as ``ClientV2.active_positions``.
+
+    Change events are "snapshot" (with the list of positions), "new",
+    "update" and "close" (with the position array).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._positions = {}
+
+    @property
+    def message_handlers(self):
+        return {
+            "ps": self.snapshot,
+            "pn": self.upsert,
+            "pu": self.upsert,
+            "pc": self.remove,
+        }
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __iter__(self):
+        return iter(list(self._positions.values()))
+
+    def __contains__(self, symbol):
+        return symbol in self._positions
+
+    def snapshot(self, positions):
+        """Replace all positions with a position snapshot (ps)."""
+        self._positions = {
+            position[POSITION_SYMBOL]: position for position in positions
+        }
+        self.snapshot_received = True
+        self._changed("snapshot", list(positions))
+
+    def upsert(self, position):
+        """Add a new position (pn) or update an existing one (pu)."""
+        previous = self._positions.get(position[POSITION_SYMBOL])
+        self._positions[position[POSITION_SYMBOL]] = position
+        self._changed("new" if previous is None else "update", position)
+
+    def remove(self, position):
+        """Remove a closed position (pc)."""
+        self._positions.pop(position[POSITION_SYMBOL], None)
+        self._changed("close", position)
+
+    def get(self, symbol):
+        """Returns the position array for a symbol, e.g. tBTCUSD, or None."""
+        return self._positions.get(symbol)
+
+    def as_list(self):
+        """Returns a copy of all positions in the format of
+        ``ClientV2.active_positions``."""
+        return deepcopy(list(self._positions.values()))
+
+
+class MarginInfoTable(StateTable):
+    """Margin information built from the miu messages on the auth channel,
+    keyed by "base" or symbol. Entries are stored as bitfinex sends them,
+    which is the same layout as ``ClientV2.margin_info``.
+
+    Bitfinex does not send a margin info snapshot and only sends miu after a
+    calc request, so heartbeats say nothing about it. Freshness is the age
+    of each key's last miu instead. Request missing or old keys with
+    ``WssClient.request_calc``, e.g. ``margin_base`` or
+    ``margin_sym_tBTCUSD``.
+
+    Change events are "update" (with the miu data).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._margin = {}
+        self._received = {}
+
+    @property
+    def message_handlers(self):
+        return {
+            "miu": self.update,
+        }
+
+    def __contains__(self, key):
+        return key in self._margin
+
+    def update(self, info):
+        """Add or update margin info (miu)."""
+        key = "base" if info[0] == "base" else info[1]
+        self._margin[key] = info
+        self._changed("update", info)
+        self._received[key] = self.last_update
+
+    def get(self, key="base"):
+        """Returns the margin info for "base" or a symbol, or None."""
+        return self._margin.get(key)
+
+    def as_list(self, key="base"):
+        """Returns a copy of the margin info for "base" or a symbol in the
+        format of ``ClientV2.margin_info``, or None."""
+        info = self._margin.get(key)
+        return None if info is None else deepcopy(info)
+
+    def is_fresh(self, max_age, key="base"):
+        """Whether the margin info of ``key`` was received within the last
+        ``max_age`` seconds."""
+        received = self._received.get(key)
+        return received is not None and time.monotonic() - received <= max_age
+
+
+class OrderFill:
+    """Running fill totals of one order."""
+
+    __slots__ = ("order_id", "cid", "symbol", "filled", "notional", "fees",
+                 "fee_currency", "trade_ids", "fee_trade_ids")
+
+    def __init__(self, order_id, cid=None, symbol=None):
+        self.order_id = order_id
+        self.cid = cid
+        self.symbol = symbol
+        self.filled = 0.0
+        self.notional = 0.0
+        self.fees = 0.0
+        self.fee_currency = None
+        self.trade_ids = set()
+        self.fee_trade_ids = set()
+
+    @property
+    def price(self):
+        """The volume weighted average fill price, or None before any fill."""
+        return self.notional / self.filled if self.filled else None
+
+    def __repr__(self):
+        return (f"OrderFill(order_id={self.order_id}, cid={self.cid}, "
+                f"filled={self.filled}, price={self.price}, fees={self.fees})")
+
+
+class FillTable(StateTable):
+    """Fills per order built from the te and tu messages on the auth channel.
+
+    Bitfinex sends a te message when a trade executes and a tu message with
+    the fee shortly after. Each trade is counted once, whichever message
+    arrives first, and the fee is added from tu. Updating an order's filled
+    amount, average price and fees is O(1) per execution.
+
+    Change events are "trade" (with the trade array) and "fill" (with the
+    ``OrderFill``) for every new trade, and "fee" (with the tu trade array)
+    when a fee is added.
+
+    Closed orders are passed to ``close``. Once the order's executed amount
+    has arrived, waiters that were not satisfied fail with
+    ``OrderClosedError``. ``retention`` seconds after the close, late fee
+    updates included, the order's fills and cid links are dropped, so the
+    table only grows with the open and recently closed orders.
+
+    Parameters
+    ----------
+    retention : float
+        Seconds a closed order is kept. Default: 60.0
+
+    Example
+    -------
+     ::
+
+        handle = my_client.new_order("EXCHANGE LIMIT", "BTCUSD", "0.1", "1000")
+        fill = await handle.filled()
+        print(fill.filled, fill.price, fill.fees)
+    """
+
+    def __init__(self, retention=60.0):
+        super().__init__()
+        self.retention = retention
+        self._fills = {}
+        self._cids = {}
+        self._order_cids = {}
+        self._waiters = defaultdict(list)
+        self._closed = {}
+        self._evictions = deque()
+
+    @property
+    def message_handlers(self):
+        return {
+            "te": self.execution,
+            "tu": self.execution_update,
+        }
+
+    def __len__(self):
+        return len(self._fills)
+
+    def __iter__(self):
+        return iter(list(self._fills.values()))
+
+    def __contains__(self, order_id):
+        return order_id in self._fills
+
+    def link(self, order_id, cid):
+        """Connect an order id to its client order id, so fills can be
+        looked up and awaited by cid. Trades only carry the cid in newer
+        api versions, so the client links new orders from the order table."""
+        if cid is None:
+            return
+        self._cids[cid] = order_id
+        self._order_cids[order_id] = cid
+        fill = self._fills.get(order_id)
+        if fill is not None and fill.cid is None:
+            fill.cid = cid
+            self._notify_waiters(fill)
+
+    def _fill(self, trade):
+        order_id = trade[TRADE_ORDER_ID]
+        fill = self._fills.get(order_id)
+        if fill is None:
+            cid = trade[TRADE_CID] if len(trade) > TRADE_CID else None
+            if cid is None:
+                cid = self._order_cids.get(order_id)
+            fill = self._fills[order_id] = OrderFill(order_id, cid, trade[TRADE_SYMBOL])
+            if cid is not None:
+                self._cids[cid] = order_id
+                self._order_cids[order_id] = cid
+        return fill
+
+    def _execute(self, fill, trade):
+        if trade[TRADE_ID] in fill.trade_ids:
+            return
+        fill.trade_ids.add(trade[TRADE_ID])
+        amount = trade[TRADE_EXEC_AMOUNT]
+        fill.filled += amount
+        fill.notional += amount * trade[TRADE_EXEC_PRICE]
+        self._changed("trade", trade)
+        self._changed("fill", fill)
+        self._notify_waiters(fill)
+        if fill.order_id in self._closed:
+            self._settle(fill.order_id)
+
+    def execution(self, trade):
+        """Add a trade execution (te) to its order."""
+        self._execute(self._fill(trade), trade)
+
+    def execution_update(self, trade):
+        """Add a trade execution update (tu) to its order, including the
+        fee."""
+        fill = self._fill(trade)
+        self._execute(fill, trade)
+        if trade[TRADE_ID] not in fill.fee_trade_ids and trade[TRADE_FEE] is not None:
+            fill.fee_trade_ids.add(trade[TRADE_ID])
+            fill.fees += trade[TRADE_FEE]
+            fill.fee_currency = trade[TRADE_FEE_CURRENCY]
+            self._changed("fee", trade)
+
+    def close(self, order):
+        """Settle a closed order (oc). Waiters for more than the executed
+        amount fail once the executed amount has been filled, and the order
+        is dropped after ``retention`` seconds."""
+        now = time.monotonic()
+        order_id = order[ORDER_ID]
+        self.link(order_id, order[ORDER_CID])
+        executed = abs(order[ORDER_AMOUNT_ORIG] - order[ORDER_AMOUNT])
+        self._closed[order_id] = [order, executed, False]
+        self._evictions.append((now, order_id))
+        self._settle(order_id)
+        self._evict(now)
+
+    def _settle(self, order_id, force=False):
+        """Fail the unsatisfied waiters of a closed order once its executed
+        amount has been filled, or at once with ``force``."""
+        closed = self._closed[order_id]
+        order, executed, settled = closed
+        fill = self._fills.get(order_id)
+        filled = abs(fill.filled) if fill is not None else 0.0
+        if settled or not (force or filled >= executed
+                           or math.isclose(filled, executed, rel_tol=1e-9)):
+            return
+        closed[2] = True
+        cid = self._order_cids.get(order_id)
+        for _, future in self._waiters.pop(cid, ()):
+            if not future.done():
+                future.set_exception(OrderClosedError(order, fill))
+
+    def _evict(self, now):
+        """Drop the orders closed more than ``retention`` seconds ago."""
+        while self._evictions and now - self._evictions[0][0] >= self.retention:
+            _, order_id = self._evictions.popleft()
+            if order_id not in self._closed:
+                continue
+            self._settle(order_id, force=True)
+            del self._closed[order_id]
+            self._fills.pop(order_id, None)
+            cid = self._order_cids.pop(order_id, None)
+            if self._cids.get(cid) == order_id:
+                del self._cids[cid]
+
+    def get(self, order_id):
+        """Returns the ``OrderFill`` of an order, or None before any fill."""
+        return self._fills.get(order_id)
+
+    def get_by_cid(self, cid):
+        """Returns the ``OrderFill`` of the order with the given client order
+        id, or None before any fill."""
+        order_id = self._cids.get(cid)
+        return None if order_id is None else self._fills.get(order_id)
+
+    def wait_filled(self, cid, amount):
+        """Returns a Future resolving to the ``OrderFill`` once the absolute
+        filled amount of the order reaches the absolute ``amount``. The
+        Future fails with ``OrderClosedError`` if the order is closed, e.g.
+        canceled, with less filled.
+
+        Parameters
+        ----------
+        cid : int
+            The client order id of the order.
+
+        amount : decimal string
+            The amount to wait for, e.g. the order amount.
+        """
+        future = asyncio.get_event_loop().create_future()
+        self._waiters[cid].append((abs(float(amount)), future))
+        fill = self.get_by_cid(cid)
+        if fill is not None:
+            self._notify_waiters(fill)
+        closed = self._closed.get(self._cids.get(cid))
+        if closed is not None and closed[2]:
+            order, _, _ = closed
+            for _, waiter in self._waiters.pop(cid, ()):
+                if not waiter.done():
+                    waiter.set_exception(OrderClosedError(order, fill))
+        return future
+
+    def _notify_waiters(self, fill):
+        waiters = self._waiters.get(fill.cid)
+        if not waiters:
+            return
+        filled = abs(fill.filled)
+        pending = []
+        for amount, future in waiters:
+            if future.done():
+                continue
+            if filled >= amount or math.isclose(filled, amount, rel_tol=1e-9):
+                future.set_result(fill)
+            else:
+                pending.append((amount, future))
+        if pending:
+            self._waiters[fill.cid] = pending
+        else:
+            del self._waiters[fill.cid]
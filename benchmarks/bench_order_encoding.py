@@ -0,0 +1,46 @@
+"""Microbenchmark of new order payload encoding.
+
+Compares building the order dict with ``WssClient.new_order_op`` and json
+encoding it (the previous ``new_order`` path) with ``OrderEncoder``.
+
+Run with ``python benchmarks/bench_order_encoding.py``
+"""
+import json
+import timeit
+
+from async_bitfinex.websockets.client import WssClient
+from async_bitfinex.websockets.order_encoder import OrderEncoder
+
+NUMBER = 100000
+CID = 15392586190929
+
+
+def dict_path():
+    operation = WssClient.new_order_op(
+        order_type="EXCHANGE LIMIT", symbol="BTCUSD", amount="0.004",
+        price="1000.0", cid=CID
+    )
+    return json.dumps([0, "on", None, operation], ensure_ascii=False).encode('utf8')
+
+
+ENCODER = OrderEncoder()
+
+
+def encoder_path():
+    return ENCODER.encode("EXCHANGE LIMIT", "BTCUSD", "0.004", "1000.0", CID)
+
+
+def main():
+    assert json.loads(dict_path()) == json.loads(encoder_path())
+    results = {}
+    for name, function in (("new_order_op + json.dumps", dict_path),
+                           ("OrderEncoder.encode", encoder_path)):
+        seconds = min(timeit.repeat(function, number=NUMBER, repeat=5))
+        results[name] = seconds
+        print(f"{name:<28} {seconds / NUMBER * 1e6:8.3f} us/order")
+    baseline, fast = results.values()
+    print(f"speedup: {baseline / fast:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
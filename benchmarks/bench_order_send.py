@@ -0,0 +1,44 @@
+"""Benchmark of the order send hot path.
+
+Compares the notification code lookup used by ``new_order``,
+``cancel_order``, ``update_order`` and ``multi_order`` before (linear search
+over two lists built on every call) and after (frozen reverse map and
+precomputed input codes), alone and together with building a cancel payload.
+
+Run with ``python benchmarks/bench_order_send.py``
+"""
+import json
+import timeit
+
+from async_bitfinex.websockets import abbreviations
+
+NUMBER = 200000
+
+
+def list_lookup(description):
+    index = list(abbreviations.NOTIFICATION_CODES.values()).index(description)
+    return list(abbreviations.NOTIFICATION_CODES.keys())[index]
+
+
+def cancel_payload(code):
+    return json.dumps([0, code, None, {'id': 1234}], ensure_ascii=False).encode('utf8')
+
+
+CASES = (
+    ("lookup: list index", lambda: list_lookup('order cancel')),
+    ("lookup: get_notification_code", lambda: abbreviations.get_notification_code('order cancel')),
+    ("lookup: ORDER_CANCEL", lambda: abbreviations.ORDER_CANCEL),
+    ("cancel payload: list index", lambda: cancel_payload(list_lookup('order cancel'))),
+    ("cancel payload: ORDER_CANCEL", lambda: cancel_payload(abbreviations.ORDER_CANCEL)),
+)
+
+
+def main():
+    assert list_lookup('order cancel') == abbreviations.ORDER_CANCEL
+    for name, function in CASES:
+        seconds = min(timeit.repeat(function, number=NUMBER, repeat=5))
+        print(f"{name:<32} {seconds / NUMBER * 1e9:8.1f} ns/call")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark of sync REST calls with and without a pooled session.
+
+Serves ``v2/platform/status`` from a local keep-alive HTTP/1.1 stand-in and
+compares calls per second of module level ``requests.get`` (a new
+connection per call, as before) with ``ClientV2.platform_status`` (one
+pooled keep-alive session).
+
+Run with ``python benchmarks/bench_rest_session.py``
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from async_bitfinex import ClientV2
+
+CALLS = 500
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, avoid delayed ACK stalls
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # pylint: disable=C0103
+        body = b"[1]"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        pass
+
+
+def calls_per_second(function):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        function()
+    return CALLS / (time.perf_counter() - start)
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StatusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    client = ClientV2()
+    client.base_url = base_url
+
+    results = {}
+    for name, function in (
+            ("requests.get per call", lambda: requests.get(base_url + "v2/platform/status",
+                                                           timeout=5.0).json()),
+            ("ClientV2 pooled session", client.platform_status)):
+        function()
+        results[name] = calls_per_second(function)
+        print(f"{name:<26} {results[name]:8.0f} calls/s")
+    baseline, pooled = results.values()
+    print(f"speedup: {pooled / baseline:.1f}x")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
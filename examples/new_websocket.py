@@ -1,6 +1,7 @@
 import os
 import asyncio
 from async_bitfinex import WssClient
+from async_bitfinex.websockets.exceptions import RequestError
 
 async def create_order(client):
     await asyncio.sleep(3)
@@ -39,10 +40,11 @@ async def update_order(client, id, price, amount):
         confirm_response = await handles["confirm_future"]
         print("Update Confirm response Received")
         print(confirm_response)
+    except RequestError as error:
+        # Rejected updates fail both futures at once, with the bitfinex code
+        print("Update Order rejected:", error.code, error.message)
     except TimeoutError:
-        # If an order is not active it will not thow an error with any id or cid.
-        # This means that the best/only way to pick up errors is to
-        # catch a TimeoutError
+        # No response arrived in time, e.g. the connection was lost
         print("Update Order timed out.")
 
 async def cancel_order(client, cid):
@@ -60,14 +62,13 @@ async def cancel_order(client, cid):
         cancel_confirm = await handles["confirm_future"]
         print("Cancel Confirm response Received")
         print(cancel_confirm)
+    except RequestError as error:
+        # Rejected cancels fail both futures at once, e.g. when the order was
+        # already canceled, excuted or never existed.
+        print("Cancel Order rejected:", error.code, error.message)
     except TimeoutError:
-        # If an order is not active it will not thow an error with any id or cid.
-        # This means that the best/only way to pick up errors is to
-        # catch a TimeoutError
-        print(
-            "Cancel Order timed out. This can happen if the order was "
-            "already canceled, excuted or never existed."
-        )
+        # No response arrived in time, e.g. the connection was lost
+        print("Cancel Order timed out.")
 
 async def async_print(message):
     """Async print, to ensure syncronous print versions"""
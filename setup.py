@@ -6,6 +6,7 @@ VERSION = '0.4.2'
 DEPENDENCIES = [
     'requests',
     "websockets",
+    "aiohttp",
 ]
 
 setup(
@@ -18,6 +19,10 @@ setup(
     license='MIT',
     packages=find_packages(),
     install_requires=DEPENDENCIES,
+    extras_require={
+        # Vectorised portfolio totals in websockets.pnl
+        "numpy": ["numpy"],
+    },
     # download_url='https://github.com/ohenrik/bitfinex/tarball/%s' % version,
     keywords=['bitfinex', 'bitcoin', 'btc', 'asyncio', 'websockets'],
     classifiers=[],
@@ -0,0 +1,38 @@
+"""Tests for the websocket abbreviation tables"""
+import pytest
+from async_bitfinex.websockets import abbreviations
+from async_bitfinex.websockets.futures_handler import CLIENT_HANDLERS
+from async_bitfinex.websockets.state import (FillTable, MarginInfoTable, OrderTable, PositionTable,
+                                             WalletTable)
+
+# pylint: disable=C0111
+
+
+def test_get_notification_code():
+    assert abbreviations.get_notification_code("order new") == "on"
+    assert abbreviations.get_notification_code("order multi-op") == "ox_multi"
+
+
+def test_get_notification_code_unknown_description():
+    with pytest.raises(ValueError):
+        abbreviations.get_notification_code("not a description")
+
+
+def test_notification_descriptions_reverse_codes():
+    for code, description in abbreviations.NOTIFICATION_CODES.items():
+        assert abbreviations.NOTIFICATION_DESCRIPTIONS[description] == code
+
+
+def test_notification_codes_are_frozen():
+    with pytest.raises(TypeError):
+        abbreviations.NOTIFICATION_CODES["on"] = "changed"
+
+
+def test_state_tables_handle_only_state_messages():
+    for table in (OrderTable(), WalletTable(), PositionTable(), MarginInfoTable(), FillTable()):
+        assert set(table.message_handlers) <= abbreviations.STATE_MESSAGES
+
+
+def test_futures_handler_handles_every_request_notification():
+    assert abbreviations.REQUEST_NOTIFICATIONS <= set(CLIENT_HANDLERS)
+    assert abbreviations.CALC_RESULT_MESSAGES <= set(CLIENT_HANDLERS)
@@ -0,0 +1,92 @@
+"""Tests for streaming the history of an account"""
+import asyncio
+import json
+
+import pytest
+
+from async_bitfinex.rest import ClientV2
+from async_bitfinex.rest.account_history import (HistoricalTrade, IncompleteHistoryError,
+                                                 LedgerEntry, iter_json_rows, make_row,
+                                                 stream_history)
+
+# pylint: disable=C0111
+
+
+class FakeLedgersClient:
+    """Serves ledger entries newest first, two per millisecond, honouring
+    start, end and limit like the ledgers endpoint."""
+
+    def __init__(self, entries=100, mts=lambda entry_id: 1000 + entry_id // 2):
+        self.entries = [[entry_id, "BTC", None, mts(entry_id), None, 0.1, 1.0, None,
+                         "Trading fee", "extra"]
+                        for entry_id in range(entries)]
+        self.requests = []
+
+    async def post_raw(self, path, body=None):
+        body = body or {}
+        self.requests.append((path, body))
+        rows = [entry for entry in reversed(self.entries)
+                if body.get("start", 0) <= entry[3] <= body.get("end", 10 ** 13)]
+        return json.dumps(rows[:body.get("limit", 25)])
+
+
+def collect(client, *args, **kwargs):
+    async def scenario():
+        return [row async for row in stream_history(client, *args, **kwargs)]
+    return asyncio.run(scenario())
+
+
+def test_iter_json_rows():
+    assert list(iter_json_rows(' [[1, "a"],\n [2, {"b": null}] ] ')) == [[1, "a"], [2, {"b": None}]]
+    assert list(iter_json_rows("[]")) == []
+    with pytest.raises(ValueError):
+        list(iter_json_rows('{"error": 1}'))
+
+
+def test_make_row_drops_and_pads_fields():
+    entry = make_row(LedgerEntry, [1, "BTC", None, 1000, None, 0.1, 1.0, None, "fee", "new"])
+    assert (entry.id, entry.mts, entry.description) == (1, 1000, "fee")
+    assert make_row(HistoricalTrade, [1, "tBTCUSD", 1000]).fee_currency is None
+
+
+def test_stream_pages_by_end_cursor_without_duplicates():
+    client = FakeLedgersClient()
+    rows = collect(client, "ledgers", "btc", limit=25)
+    assert [row.id for row in rows] == list(reversed(range(100)))
+    assert all(isinstance(row, LedgerEntry) for row in rows)
+    assert client.requests[0] == ("v2/auth/r/ledgers/BTC/hist", {"limit": 25})
+    # The next page ends at the oldest time of the previous one
+    assert client.requests[1][1] == {"end": 1037, "limit": 25}
+    # The last page is not full, so no empty page is requested
+    assert len(client.requests) == 5
+
+
+def test_full_page_at_one_millisecond_is_requested_with_a_larger_limit():
+    # Entries 40 to 69 share one millisecond, more than a page of 25
+    client = FakeLedgersClient(
+        mts=lambda entry_id: 1000 + (40 if 40 <= entry_id < 70 else entry_id)
+    )
+    rows = collect(client, "ledgers", limit=25)
+    assert [row.id for row in rows] == list(reversed(range(100)))
+    assert [body["limit"] for _, body in client.requests] == [25, 25, 25, 25, 100]
+
+
+def test_too_many_rows_at_one_millisecond_raise():
+    client = FakeLedgersClient(entries=3000, mts=lambda entry_id: 1000)
+    with pytest.raises(IncompleteHistoryError):
+        collect(client, "ledgers", limit=1000)
+
+
+def test_stream_stops_at_start():
+    client = FakeLedgersClient()
+    rows = collect(client, "ledgers", start=1040, end=1044, limit=4)
+    assert [row.id for row in rows] == [89, 88, 87, 86, 85, 84, 83, 82, 81, 80]
+
+
+def test_sync_client_and_ledger_parameters(requests_mock):
+    url = ClientV2().base_url + "v2/auth/r/ledgers/BTC/hist"
+    requests_mock.post(url, text='[[1, "BTC", null, 1000, null, 0.1, 1.0, null, "fee"]]')
+    client = ClientV2("key", "secret")
+    assert client.ledgers("btc", limit=10)[0][3] == 1000
+    assert requests_mock.last_request.json() == {"limit": 10}
+    assert [row.id for row in collect(client, "ledgers", "btc")] == [1]
@@ -0,0 +1,68 @@
+"""Tests for merging coalesced order updates"""
+import asyncio
+
+from async_bitfinex.websockets.amend_coalescer import AmendCoalescer, merge_order_updates
+from async_bitfinex.websockets.exceptions import RequestError
+
+# pylint: disable=C0111
+
+
+class FakeClient:
+    """Records the updates sent and hands out their futures, which the test
+    resolves like the server would."""
+
+    def __init__(self):
+        self.sent = []
+
+    def _send_update_order(self, order_settings, timeout=None):
+        loop = asyncio.get_event_loop()
+        sent = {"request_future": loop.create_future(), "confirm_future": loop.create_future(),
+                "id": order_settings["id"]}
+        self.sent.append((order_settings, sent))
+        return sent
+
+
+def test_later_values_win():
+    assert merge_order_updates({"id": 1, "price": "1"}, {"id": 1, "price": "2"}) == {
+        "id": 1, "price": "2"
+    }
+
+
+def test_deltas_are_summed_exactly():
+    merged = merge_order_updates(None, {"id": 1, "delta": "0.1"})
+    merged = merge_order_updates(merged, {"id": 1, "delta": "0.2"})
+    assert merged["delta"] == "0.3"
+
+
+def test_amount_replaces_delta_and_absorbs_later_deltas():
+    merged = merge_order_updates({"id": 1, "delta": "0.1"}, {"amount": "-2"})
+    assert merged == {"id": 1, "amount": "-2"}
+    assert merge_order_updates(merged, {"delta": "0.5"})["amount"] == "-1.5"
+
+
+def test_superseded_amends_resolve_with_the_update_that_carried_them():
+    async def scenario():
+        client = FakeClient()
+        coalescer = AmendCoalescer(client)
+        first = coalescer.submit({"id": 1, "price": "10"})
+        second = coalescer.submit({"id": 1, "price": "11"})
+        third = coalescer.submit({"id": 1, "delta": "0.5"})
+        rejected = RequestError(10001, "Invalid price", None)
+        client.sent[0][1]["request_future"].set_exception(rejected)
+        client.sent[0][1]["confirm_future"].set_exception(rejected)
+        await asyncio.sleep(0)
+        merged, sent = client.sent[1]
+        sent["request_future"].set_result({"status": "SUCCESS", "id": 1})
+        sent["confirm_future"].set_result({"status": "SUCCESS", "id": 1, "response": merged})
+        outcomes = await asyncio.gather(
+            *(handle[key] for handle in (first, second, third)
+              for key in ("request_future", "confirm_future")),
+            return_exceptions=True
+        )
+        return [settings for settings, _ in client.sent], outcomes, 1 in coalescer
+
+    sent, outcomes, in_flight = asyncio.run(scenario())
+    assert sent == [{"id": 1, "price": "10"}, {"id": 1, "price": "11", "delta": "0.5"}]
+    assert [type(outcome) for outcome in outcomes[:2]] == [RequestError] * 2
+    assert outcomes[3]["response"] == outcomes[5]["response"] == sent[1]
+    assert not in_flight
@@ -0,0 +1,101 @@
+"""Tests for the asyncio REST v2 client against a local aiohttp server"""
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+from async_bitfinex import AsyncClientV2
+from async_bitfinex.rest.cache import create_cache
+from async_bitfinex.rest.restv2 import BitfinexException
+
+# pylint: disable=C0111
+
+
+def run(handler, scenario):
+    """Runs scenario(client) with the client pointed at a local server that
+    answers every request with handler(request)."""
+    async def with_server():
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with AsyncClientV2("key", "secret") as client:
+                client.base_url = f"http://127.0.0.1:{port}/"
+                return await scenario(client)
+        finally:
+            await runner.cleanup()
+    return asyncio.run(with_server())
+
+
+def test_get_requests_run_concurrently_over_one_session():
+    in_flight = {"now": 0, "max": 0}
+
+    async def handler(request):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.05)
+        in_flight["now"] -= 1
+        return web.json_response([request.path, dict(request.query)])
+
+    async def scenario(client):
+        return await asyncio.gather(*[client.candles("1m", "tBTCUSD", "hist", limit=i)
+                                      for i in range(1, 11)])
+
+    responses = run(handler, scenario)
+    assert responses[0] == ["/v2/candles/trade:1m:tBTCUSD/hist", {"limit": "1"}]
+    assert in_flight["max"] == 10
+
+
+def test_post_is_signed_and_errors_raise():
+    async def handler(request):
+        if request.path.endswith("wallets"):
+            assert request.headers["bfx-apikey"] == "key"
+            return web.json_response([["exchange", "USD", 10.0, 0, 10.0]])
+        return web.json_response(["error", 10020, "symbol: invalid"], status=500)
+
+    async def scenario(client):
+        wallets = await client.wallets_balance()
+        with pytest.raises(BitfinexException) as error:
+            await client.performance()
+        return wallets, error.value.args
+
+    wallets, error = run(handler, scenario)
+    assert wallets == [["exchange", "USD", 10.0, 0, 10.0]]
+    assert error[0] == 500 and error[2] == ["error", 10020, "symbol: invalid"]
+
+
+def test_cached_responses_are_awaitable():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.path)
+        return web.json_response([1])
+
+    async def scenario(client):
+        client.cache, client.cache_ttls = create_cache(cache=True)
+        return [await client.platform_status() for _ in range(3)]
+
+    assert run(handler, scenario) == [[1], [1], [1]]
+    assert calls == ["/v2/platform/status"]
+
+
+def test_concurrent_identical_requests_share_one_response():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.path_qs)
+        await asyncio.sleep(0.02)
+        return web.json_response([1])
+
+    async def scenario(client):
+        return await asyncio.gather(*[client.books("tBTCUSD") for _ in range(5)],
+                                    client.books("tETHUSD"))
+
+    responses = run(handler, scenario)
+    assert len(responses) == 6
+    assert sorted(calls) == ["/v2/book/tBTCUSD/P0", "/v2/book/tETHUSD/P0"]
@@ -0,0 +1,99 @@
+"""Tests for the local on-disk candle store"""
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from async_bitfinex.rest.candle_store import (CandleStore, candle_start, merge_ranges,
+                                              missing_ranges, next_candle_start)
+from async_bitfinex.rest.scheduler import RequestScheduler
+
+# pylint: disable=C0111
+
+UNPACED = RequestScheduler({"history": None})
+
+MINUTE = 60000
+START = 1577836800000  # 2020-01-01
+
+
+class FakeCandleClient:
+    """Serves 1m candles where the close is the minute index, leaving out
+    the minutes in ``gaps`` like bitfinex does for minutes without trades."""
+
+    def __init__(self, gaps=()):
+        self.gaps = set(gaps)
+        self.requests = []
+
+    scheduler = UNPACED
+
+    async def candles(self, timeframe, symbol, section, start, end, limit, sort):
+        self.requests.append((start, end))
+        return [[mts, 1.0, float((mts - START) // MINUTE), 2.0, 0.5, 10.0]
+                for mts in range(start, end + 1, MINUTE)
+                if (mts - START) // MINUTE not in self.gaps][:limit]
+
+
+def minutes(first, last):
+    return START + first * MINUTE, START + last * MINUTE
+
+
+def test_ranges():
+    assert merge_ranges([[10, 20], [0, 5], [6, 8], [30, 40]]) == [[0, 8], [10, 20], [30, 40]]
+    assert missing_ranges([[0, 8], [10, 20]], 5, 25) == [(9, 9), (21, 25)]
+    assert missing_ranges([], 5, 25) == [(5, 25)]
+
+
+def test_sync_fetches_only_missing_ranges(tmpdir):
+    store = CandleStore(str(tmpdir))
+    client = FakeCandleClient(gaps={5})
+    assert asyncio.run(store.sync(client, "tBTCUSD", "1m", *minutes(0, 9))) == 9
+    assert asyncio.run(store.sync(client, "tBTCUSD", "1m", *minutes(0, 9))) == 0
+    assert len(client.requests) == 1
+
+    # Appends after the stored candles and backfills before them
+    assert asyncio.run(store.sync(client, "tBTCUSD", "1m", *minutes(8, 14))) == 5
+    assert asyncio.run(store.sync(client, "tBTCUSD", "1m", *minutes(-3, 2))) == 3
+    assert client.requests[1:] == [(START + 10 * MINUTE, START + 15 * MINUTE - 1),
+                                   (START - 3 * MINUTE, START - 1)]
+    assert store.meta("tBTCUSD", "1m")["ranges"] == [[START - 3 * MINUTE, START + 15 * MINUTE - 1]]
+
+    candles = store.read("tBTCUSD", "1m")
+    assert list(candles["close"]) == [-3, -2, -1, 0, 1, 2, 3, 4, 6, 7, 8, 9, 10, 11, 12, 13, 14]
+    assert list(candles["mts"]) == sorted(candles["mts"])
+
+
+def test_read_returns_memory_mapped_slices(tmpdir):
+    store = CandleStore(str(tmpdir))
+    asyncio.run(store.sync(FakeCandleClient(), "tBTCUSD", "1m", *minutes(0, 99)))
+    candles = CandleStore(str(tmpdir)).read("tBTCUSD", "1m", *minutes(10, 19))
+    assert isinstance(candles["mts"], memoryview) and candles["mts"].readonly
+    assert list(candles["close"]) == list(range(10, 20))
+    assert candles["mts"][0] == START + 10 * MINUTE
+    assert len(store.read("tETHUSD", "1m")["mts"]) == 0
+
+
+def test_open_candle_is_not_marked_synced(tmpdir):
+    now = datetime(2026, 10, 19, 12, 30, 20, tzinfo=timezone.utc).timestamp()
+    store = CandleStore(str(tmpdir), clock=lambda: now)
+    october = int(datetime(2026, 10, 1, tzinfo=timezone.utc).timestamp()) * 1000
+    asyncio.run(store.sync(FakeCandleClient(), "tBTCUSD", "1M", october - 1, october + 1))
+    assert store.meta("tBTCUSD", "1M")["ranges"] == [
+        [int(datetime(2026, 9, 1, tzinfo=timezone.utc).timestamp()) * 1000, october - 1]
+    ]
+    asyncio.run(store.sync(FakeCandleClient(), "tBTCUSD", "1m", int(now * 1000) - MINUTE,
+                           int(now * 1000)))
+    assert store.meta("tBTCUSD", "1m")["ranges"][0][1] == int(now) // 60 * MINUTE - 1
+
+
+def test_calendar_months():
+    march = int(datetime(2024, 3, 1, tzinfo=timezone.utc).timestamp()) * 1000
+    assert candle_start("1M", march + 20 * 86400000) == march
+    assert next_candle_start("1M", march - 1) == march
+    december = int(datetime(2024, 12, 1, tzinfo=timezone.utc).timestamp()) * 1000
+    assert next_candle_start("1M", december) == int(
+        datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()) * 1000
+
+
+def test_weekly_candles_are_rejected(tmpdir):
+    with pytest.raises(AssertionError):
+        asyncio.run(CandleStore(str(tmpdir)).sync(FakeCandleClient(), "tBTCUSD", "7D", 0, 1))
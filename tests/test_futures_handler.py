@@ -0,0 +1,106 @@
+"""Tests for failing futures on bitfinex error notifications and events"""
+import asyncio
+
+import pytest
+
+from async_bitfinex.websockets.exceptions import (AuthenticationError, RequestError,
+                                                  ServerUnavailableError, SubscriptionError)
+from async_bitfinex.websockets.futures_handler import (CLIENT_HANDLERS, FuturesHandler,
+                                                       TimedFuture)
+
+# pylint: disable=C0111
+
+
+def run(scenario):
+    async def with_handler():
+        return await scenario(FuturesHandler(CLIENT_HANDLERS))
+    return asyncio.run(with_handler())
+
+
+def error_notification(notification_type, order_id, cid, code=None):
+    return [0, "n", [0, notification_type, None, None,
+                     [order_id, None, cid, "tBTCUSD"] + [None] * 28,
+                     code, "ERROR", "Invalid order: not enough balance"]]
+
+
+def outcome(future):
+    return type(future.exception()) if future.done() else None
+
+
+def test_new_order_error_fails_request_and_confirm():
+    async def scenario(futures):
+        futures["on-req_5"], futures["on_5"] = TimedFuture(), TimedFuture()
+        request, confirm = futures["on-req_5"], futures["on_5"]
+        futures(error_notification("on-req", None, 5))
+        return request, confirm, len(futures)
+
+    request, confirm, pending = run(scenario)
+    assert outcome(request) is RequestError and outcome(confirm) is RequestError
+    assert request.exception().code == 10001
+    assert request.exception().message == "Invalid order: not enough balance"
+    assert pending == 0
+
+
+def test_market_order_error_fails_its_oc_confirm():
+    async def scenario(futures):
+        futures["on-req_6"], futures["oc_6"] = TimedFuture(), TimedFuture()
+        confirm = futures["oc_6"]
+        futures(error_notification("on-req", None, 6))
+        return confirm, len(futures)
+
+    confirm, pending = run(scenario)
+    assert outcome(confirm) is RequestError and pending == 0
+
+
+def test_cancel_error_fails_futures_keyed_by_cid():
+    async def scenario(futures):
+        futures["oc-req_5"], futures["oc_5"] = TimedFuture(), TimedFuture()
+        request, confirm = futures["oc-req_5"], futures["oc_5"]
+        futures(error_notification("oc-req", None, 5, code=10020))
+        return request, confirm
+
+    request, confirm = run(scenario)
+    assert outcome(confirm) is RequestError
+    assert request.exception().description == "Request parameters error"
+
+
+def test_subscribe_and_auth_errors():
+    async def scenario(futures):
+        futures["ticker_tBTCUSD"], futures["auth"] = TimedFuture(), TimedFuture()
+        ticker, auth = futures["ticker_tBTCUSD"], futures["auth"]
+        futures({"event": "error", "msg": "subscribe: dup", "code": 10301,
+                 "channel": "ticker", "symbol": "tBTCUSD"})
+        futures({"event": "auth", "status": "FAILED", "code": 10100, "msg": "apikey: invalid"})
+        return ticker, auth
+
+    ticker, auth = run(scenario)
+    assert outcome(ticker) is SubscriptionError and ticker.exception().code == 10301
+    assert outcome(auth) is AuthenticationError
+
+
+@pytest.mark.parametrize("code", [20051, 20060])
+def test_server_stopping_fails_pending_futures(code):
+    async def scenario(futures):
+        futures["on-req_5"], futures["calc_margin_base"] = TimedFuture(), TimedFuture()
+        pending = list(futures.futures.values())
+        futures({"event": "info", "code": code, "msg": "Stopping"})
+        return pending
+
+    assert [outcome(future) for future in run(scenario)] == [ServerUnavailableError] * 2
+
+
+def test_late_calc_result_after_timeout_is_ignored():
+    async def scenario(futures):
+        futures["calc_margin_base"] = TimedFuture(timeout=0.01)
+        future = futures["calc_margin_base"]
+        await asyncio.sleep(0.02)
+        futures([0, "miu", ["base", [1, 2, 3, 4]]])
+        futures["on_5"] = TimedFuture(timeout=0.01)
+        confirm = futures["on_5"]
+        await asyncio.sleep(0.02)
+        futures([0, "on", [1, None, 5, "tBTCUSD"] + [None] * 28])
+        return future, confirm, len(futures)
+
+    future, confirm, pending = run(scenario)
+    assert outcome(future) is TimeoutError and outcome(confirm) is TimeoutError
+    assert pending == 1
@@ -0,0 +1,163 @@
+"""Tests for downloading historical data over many REST pages"""
+import asyncio
+import threading
+from array import array
+
+import pytest
+
+from async_bitfinex.rest import AsyncClientV2, ClientV2
+from async_bitfinex.rest.history import (HISTORY_SCHEDULER, TRADE_COLUMNS, ColumnWriter,
+                                         candle_windows, download_candles, download_trades,
+                                         read_columns, save_trades)
+from async_bitfinex.rest.scheduler import RequestScheduler
+
+# pylint: disable=C0111
+
+UNPACED = RequestScheduler({"history": None})
+
+MINUTE = 60000
+
+
+class FakeCandleClient:
+    """Serves 1m candles, at most ``page_size`` per request and repeating
+    the candle before ``start`` like an overlapping edge."""
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+
+    scheduler = UNPACED
+
+    async def candles(self, timeframe, symbol, section, start, end, limit, sort):
+        self.requests.append((start, end))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        first = max(start - MINUTE, 0) // MINUTE * MINUTE
+        mts = range(first, end + 1, MINUTE)[:min(limit, self.page_size)]
+        return [[value, 1.0, 2.0, 3.0, 0.5, 10.0] for value in mts]
+
+
+class FakeTradesClient:
+    """Serves three trades per millisecond, oldest first, like trades hist
+    with sort=1, and ``crowded`` trades at millisecond 5."""
+
+    def __init__(self, crowded=3):
+        self.crowded = crowded
+        self.requests = []
+
+    scheduler = UNPACED
+
+    async def trades(self, symbol, start, end, limit, sort):
+        self.requests.append((start, end))
+        await asyncio.sleep(0)
+        rows = [[mts * 1000 + offset, mts, 0.1, 100.0 + mts]
+                for mts in range(start, end + 1)
+                for offset in range(self.crowded if mts == 5 else 3)]
+        return rows[:limit]
+
+
+def trade_ids(mts_range, crowded=3):
+    return [mts * 1000 + offset for mts in mts_range
+            for offset in range(crowded if mts == 5 else 3)]
+
+
+def collect(client, download=download_candles, *args, **kwargs):
+    async def scenario():
+        return [columns async for columns in download(client, *args, **kwargs)]
+    return asyncio.run(scenario())
+
+
+def test_windows_cover_the_range():
+    assert candle_windows("1m", 0, 25 * MINUTE - 1, limit=10) == [
+        (0, 10 * MINUTE - 1), (10 * MINUTE, 20 * MINUTE - 1), (20 * MINUTE, 25 * MINUTE - 1)
+    ]
+
+
+def test_download_is_concurrent_complete_and_deduplicated():
+    client = FakeCandleClient(page_size=4)
+    chunks = collect(client, download_candles, "1m", "tBTCUSD", start=0, end=99 * MINUTE,
+                     limit=10, concurrency=3)
+    mts = [value for chunk in chunks for value in chunk["mts"]]
+    assert mts == list(range(0, 100 * MINUTE, MINUTE))
+    assert chunks[0]["high"][0] == 3.0 and chunks[0]["mts"].typecode == "q"
+    assert client.max_in_flight == 3
+
+
+def test_sync_client_is_run_in_executor_and_paced(requests_mock):
+    requests_mock.get(ClientV2().base_url + "v2/candles/trade:1m:tBTCUSD/hist",
+                      text="[[0, 1, 2, 3, 0.5, 10], [60000, 1, 2, 3, 0.5, 10]]")
+    granted = HISTORY_SCHEDULER.stats()["history"]["granted"]
+    chunks = collect(ClientV2(), download_candles, "1m", "tBTCUSD", start=0, end=MINUTE)
+    assert list(chunks[0]["mts"]) == [0, MINUTE]
+    assert HISTORY_SCHEDULER.stats()["history"]["granted"] == granted + 1
+    assert requests_mock.last_request.qs == {
+        "start": ["0"], "end": ["60000"], "limit": ["10000"], "sort": ["1"]
+    }
+
+
+def test_async_client_is_called_on_the_loop():
+    class LoopCandleClient(AsyncClientV2):
+
+        def candles(self, *args, **kwargs):
+            threads.append(threading.get_ident())
+            return FakeCandleClient(page_size=10).candles(*args, **kwargs)
+
+    threads = []
+    client = LoopCandleClient(scheduler=UNPACED)
+    chunks = collect(client, download_candles, "1m", "tBTCUSD", start=0, end=MINUTE)
+    assert list(chunks[0]["mts"]) == [0, MINUTE]
+    assert threads == [threading.get_ident()]
+
+
+def test_trades_are_paged_by_mts_and_deduplicated_by_id():
+    client = FakeTradesClient()
+    chunks = collect(client, download_trades, "tBTCUSD", 0, 99, window=40, limit=10)
+    ids = [value for chunk in chunks for value in chunk["id"]]
+    assert ids == trade_ids(range(100))
+    assert [len(chunk["id"]) for chunk in chunks] == [120, 120, 60]
+    assert chunks[0]["mts"].typecode == "q" and chunks[0]["price"][3] == 101.0
+    # Pages continue from the MTS of their last trade
+    assert (3, 39) in client.requests and (6, 39) in client.requests
+
+
+def test_save_trades_writes_columns(tmpdir):
+    path = str(tmpdir.join("tBTCUSD"))
+    rows = asyncio.run(save_trades(FakeTradesClient(), "tBTCUSD", path, 0, 9, limit=7))
+    columns = read_columns(path)
+    assert rows == 30 and list(columns) == list(TRADE_COLUMNS)
+    assert list(columns["id"]) == trade_ids(range(10))
+    assert list(columns["mts"][:4]) == [0, 0, 0, 1]
+
+
+def test_column_writer_appends_chunks(tmpdir):
+    path = str(tmpdir)
+    with ColumnWriter(path, {"mts": "q", "price": "d"}) as writer:
+        writer.write({"mts": [1, 2], "price": [1.5, 2.5]})
+        writer.write({"mts": [3], "price": [3.5]})
+    assert read_columns(path) == {
+        "mts": array("q", [1, 2, 3]), "price": array("d", [1.5, 2.5, 3.5])
+    }
+
+
+def test_crowded_millisecond_is_fetched_with_a_larger_limit():
+    client = FakeTradesClient(crowded=16)
+    chunks = collect(client, download_trades, "tBTCUSD", 0, 9, limit=10)
+    assert [value for chunk in chunks for value in chunk["id"]] == trade_ids(range(10), 16)
+    assert [request[0] for request in client.requests].count(5) > 1
+
+
+def test_interrupted_save_leaves_no_metadata(tmpdir):
+    class FailingClient(FakeTradesClient):
+        async def trades(self, symbol, start, end, limit, sort):
+            if start >= 5:
+                raise ConnectionError("lost")
+            return await super().trades(symbol, start, end, limit, sort)
+
+    path = str(tmpdir.join("tBTCUSD"))
+    asyncio.run(save_trades(FakeTradesClient(), "tBTCUSD", path, 0, 2))
+    with pytest.raises(ConnectionError):
+        asyncio.run(save_trades(FailingClient(), "tBTCUSD", path, 0, 9, window=5))
+    assert not tmpdir.join("tBTCUSD", "columns.json").exists()
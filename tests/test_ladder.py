@@ -0,0 +1,48 @@
+"""Tests for the quote ladder diff"""
+from async_bitfinex.websockets.ladder import diff_ladder
+
+# pylint: disable=C0111
+
+
+def order(order_id, price, amount):
+    data = [None] * 32
+    data[0], data[3], data[6], data[8], data[16] = order_id, "tBTCUSD", amount, "EXCHANGE LIMIT", price
+    return data
+
+
+def new_order_op(price, amount):
+    return {"price": price, "amount": amount}
+
+
+def test_matching_ladder_needs_no_operations():
+    orders = [order(1, 100.0, 1.0), order(2, 110.0, -1.0)]
+    assert diff_ladder([("100", "1"), ("110", "-1")], orders, new_order_op) == []
+
+
+def test_amount_change_is_an_update():
+    operations = diff_ladder([("100", "2")], [order(1, 100.0, 1.0)], new_order_op)
+    assert operations == [["ou", {"id": 1, "amount": "2"}]]
+
+
+def test_moved_level_is_an_update_not_a_replace():
+    operations = diff_ladder([("99", "1")], [order(1, 100.0, 1.0)], new_order_op)
+    assert operations == [["ou", {"id": 1, "price": "99"}]]
+
+
+def test_sides_are_not_mixed():
+    operations = diff_ladder([("100", "-1")], [order(1, 100.0, 1.0)], new_order_op)
+    assert operations == [
+        ["oc_multi", {"id": [1]}],
+        ["on", {"price": "100", "amount": "-1"}],
+    ]
+
+
+def test_extra_orders_and_levels():
+    orders = [order(1, 100.0, 1.0), order(2, 99.0, 1.0), order(3, 98.0, 1.0)]
+    levels = [("100", "1"), ("97", "1"), ("110", "-1")]
+    operations = diff_ladder(levels, orders, new_order_op)
+    assert operations == [
+        ["oc_multi", {"id": [2]}],
+        ["ou", {"id": 3, "price": "97"}],
+        ["on", {"price": "110", "amount": "-1"}],
+    ]
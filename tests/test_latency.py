@@ -0,0 +1,21 @@
+"""Tests for the order latency histograms"""
+from async_bitfinex.websockets.latency import LatencyHistogram
+
+# pylint: disable=C0111
+
+
+def test_percentiles_are_within_a_bucket():
+    histogram = LatencyHistogram()
+    for value in range(1, 1001):
+        histogram.add(value * 1000)
+    assert histogram.count == 1000
+    assert 500e3 <= histogram.percentile(50) <= 500e3 * 1.25
+    assert 990e3 <= histogram.percentile(99) <= 1e6
+    assert histogram.percentile(100) == 1e6
+
+
+def test_summary_in_milliseconds():
+    histogram = LatencyHistogram()
+    assert histogram.summary() == {"count": 0}
+    histogram.add(2e6)
+    assert histogram.summary()["min"] == histogram.summary()["p50"] == 2.0
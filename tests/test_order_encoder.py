@@ -0,0 +1,40 @@
+"""Tests for the new order payload encoder"""
+import json
+import pytest
+from async_bitfinex.websockets.client import WssClient
+from async_bitfinex.websockets.order_encoder import OrderEncoder
+
+# pylint: disable=W0621,C0111
+
+
+@pytest.fixture
+def encoder():
+    return OrderEncoder()
+
+
+def json_payload(**order):
+    operation = WssClient.new_order_op(**order)
+    return json.loads(json.dumps([0, "on", None, operation], ensure_ascii=False))
+
+
+@pytest.mark.parametrize("order", [
+    dict(order_type="EXCHANGE LIMIT", symbol="BTCUSD", amount="0.004", price="1000.0"),
+    dict(order_type="LIMIT", symbol="tETHUSD", amount=-1.5, price=200),
+    dict(order_type="STOP LIMIT", symbol="btcusd", amount="1", price="900",
+         price_aux_limit="950", hidden=True, flags=[64, 4096]),
+    dict(order_type="TRAILING STOP", symbol="BTC", amount="1", price="0",
+         price_trailing="10", tif="2020-01-01 10:45:23"),
+])
+def test_encoder_matches_json_encoding(encoder, order):
+    payload = encoder.encode(cid=123, **order)
+    assert json.loads(payload) == json_payload(cid=123, **order)
+
+
+def test_encoder_ignores_unknown_kwargs(encoder):
+    payload = encoder.encode("LIMIT", "BTCUSD", "1", "1", cid=1, timeout=10)
+    assert "timeout" not in json.loads(payload)[3]
+
+
+def test_new_order_op_uses_given_cid():
+    operation = WssClient.new_order_op("LIMIT", "BTCUSD", "1", "1", cid=42)
+    assert operation["cid"] == 42
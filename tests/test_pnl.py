@@ -0,0 +1,71 @@
+"""Tests for the incremental PnL engine"""
+import pytest
+
+from async_bitfinex.websockets import pnl as pnl_module
+from async_bitfinex.websockets.pnl import PnLEngine, quote_currency
+
+# pylint: disable=C0111
+
+
+def test_average_cost_and_realised_pnl():
+    pnl = PnLEngine()
+    pnl.fill("tBTCUSD", 1.0, 100.0)
+    pnl.fill("tBTCUSD", 1.0, 110.0)
+    assert pnl.as_dict("tBTCUSD")["base_price"] == 105.0
+    pnl.fill("tBTCUSD", -0.5, 115.0)
+    assert pnl.as_dict("tBTCUSD")["realised"] == 5.0
+    # Flip to short: close 1.5 at 95 and open -0.5 at 95
+    pnl.fill("tBTCUSD", -2.0, 95.0)
+    row = pnl.as_dict("tBTCUSD")
+    assert row["realised"] == pytest.approx(5.0 - 15.0)
+    assert (row["amount"], row["base_price"]) == (-0.5, 95.0)
+
+
+def test_unrealised_uses_marks_and_ignores_unmarked_symbols():
+    pnl = PnLEngine()
+    pnl.seed([["tBTCUSD", "ACTIVE", 2.0, 100.0], ["tETHUSD", "ACTIVE", -1.0, 10.0]])
+    pnl.fill("tLTCUSD", 1.0, 50.0)
+    pnl.update_ticker("tBTCUSD", [109.0, 1.0, 111.0, 1.0])
+    pnl.ticker_callback("tETHUSD")([5, [8.0, 1.0, 10.0, 1.0]])
+    pnl.ticker_callback("tETHUSD")([5, "hb"])
+    assert pnl.unrealised("tBTCUSD") == 20.0
+    assert pnl.unrealised() == pytest.approx({"USD": 21.0})
+    assert pnl.total() == pytest.approx({"USD": 21.0})
+
+
+def test_fees_from_trade_events():
+    pnl = PnLEngine()
+    trade = [1, "tBTCUSD", 0, 10, 1.0, 100.0, "LIMIT", 100.0, 1, -0.2, "USD"]
+    pnl.on_trade("trade", trade)
+    pnl.on_trade("fee", trade)
+    pnl.on_trade("fee", trade[:10] + ["BTC"])
+    assert pnl.realised_total() == pytest.approx({"USD": -0.2})
+
+
+@pytest.mark.parametrize("with_numpy", [True, False])
+def test_totals_are_kept_per_quote_currency(monkeypatch, with_numpy):
+    if with_numpy and pnl_module.numpy is None:
+        pytest.skip("numpy is not installed")
+    if not with_numpy:
+        monkeypatch.setattr(pnl_module, "numpy", None)
+    pnl = PnLEngine()
+    assert pnl.total() == {}
+    pnl.fill("tBTCUSD", 1.0, 100.0)
+    pnl.fill("tBTCUSD", -1.0, 110.0)
+    pnl.fill("tETHBTC", 2.0, 0.05)
+    pnl.update_mark("tETHBTC", 0.06)
+    pnl.fill("tLTCUSD", 1.0, 50.0)
+    assert pnl.realised_total() == pytest.approx({"USD": 10.0, "BTC": 0.0})
+    assert pnl.total() == pytest.approx({"USD": 10.0, "BTC": 0.02})
+
+
+def test_zero_fill_on_flat_position():
+    pnl = PnLEngine()
+    pnl.fill("tBTCUSD", 0.0, 100.0, fee=-0.1)
+    row = pnl.as_dict("tBTCUSD")
+    assert (row["amount"], row["base_price"], row["fees"]) == (0.0, 0.0, -0.1)
+
+
+def test_quote_currency():
+    assert quote_currency("tBTCUSD") == "USD"
+    assert quote_currency("tTESTBTC:TESTUSD") == "TESTUSD"
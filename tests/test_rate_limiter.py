@@ -0,0 +1,84 @@
+"""Tests for pacing of inputs sent over the auth channel"""
+import asyncio
+import pytest
+from async_bitfinex.utils import TokenBucket
+from async_bitfinex.websockets.rate_limiter import AuthRateLimiter, RateLimitExceeded
+
+# pylint: disable=W0621,C0111
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_token_bucket_allows_burst(clock):
+    bucket = TokenBucket(8, 8, clock=clock)
+    assert all(bucket.try_consume() for _ in range(8))
+    assert not bucket.try_consume()
+
+
+def test_token_bucket_refills_over_time(clock):
+    bucket = TokenBucket(8, 8, clock=clock)
+    for _ in range(8):
+        bucket.reserve()
+    clock.now = 0.25
+    assert bucket.tokens == pytest.approx(2)
+
+
+def test_token_bucket_reservations_queue_in_order(clock):
+    bucket = TokenBucket(2, 2, clock=clock)
+    waits = [bucket.reserve() for _ in range(5)]
+    assert waits == [0.0, 0.0, 0.5, 1.0, 1.5]
+
+
+def test_rate_limiter_passes_unlimited_input_types():
+    limiter = AuthRateLimiter()
+    assert limiter.reserve("on") == 0.0
+    assert "on" not in limiter.metrics()
+
+
+def test_rate_limiter_limits_calc_by_default():
+    limiter = AuthRateLimiter()
+    waits = [limiter.reserve("calc") for _ in range(9)]
+    assert waits[:8] == [0.0] * 8
+    assert waits[8] > 0
+
+
+def test_rate_limiter_fail_fast_raises():
+    limiter = AuthRateLimiter({"on": (1, 1)}, fail_fast=True)
+    limiter.reserve("on")
+    with pytest.raises(RateLimitExceeded) as error:
+        limiter.reserve("on")
+    assert error.value.input_type == "on"
+    assert limiter.metrics()["on"]["rejected"] == 1
+
+
+def test_rate_limiter_default_can_be_removed():
+    limiter = AuthRateLimiter({"calc": None})
+    assert "calc" not in limiter.buckets
+
+
+def test_rate_limiter_wait_metrics():
+    limiter = AuthRateLimiter({"oc": (100, 1)})
+    delays = [limiter.reserve("oc") for _ in range(3)]
+
+    async def wait_all():
+        await asyncio.gather(*[limiter.wait("oc", delay) for delay in delays])
+
+    asyncio.run(wait_all())
+    metrics = limiter.metrics()["oc"]
+    assert metrics["sent"] == 3
+    assert metrics["delayed"] == 2
+    assert metrics["max_queued"] == 2
+    assert metrics["queued"] == 0
+    assert metrics["max_wait"] == pytest.approx(0.02, abs=1e-3)
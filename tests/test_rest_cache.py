@@ -0,0 +1,94 @@
+"""Tests for the REST response cache"""
+from concurrent.futures import ThreadPoolExecutor
+
+from async_bitfinex.rest import ClientV1, ClientV2
+from async_bitfinex.rest.cache import MISSING, TTLCache
+
+# pylint: disable=C0111
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_their_ttl():
+    clock = FakeClock()
+    cache = TTLCache(clock=clock)
+    cache.set("tickers", "a", [1], ttl=1.0)
+    assert cache.get("tickers", "a") == [1]
+    clock.now = 1.0
+    assert cache.get("tickers", "a") is MISSING
+    assert cache.metrics()["tickers"] == {
+        "hits": 1, "misses": 1, "expirations": 1, "evictions": 0, "hit_rate": 0.5
+    }
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set("books", 1, "one", ttl=10)
+    cache.set("books", 2, "two", ttl=10)
+    cache.get("books", 1)
+    cache.set("books", 3, "three", ttl=10)
+    assert cache.get("books", 2) is MISSING
+    assert cache.get("books", 1) == "one"
+    assert cache.evictions["books"] == 1
+
+
+def test_client_caching_is_opt_in(requests_mock):
+    url = ClientV2().base_url + "v2/tickers?symbols=tBTCUSD,tETHUSD"
+    requests_mock.get(url, text="[]")
+    ClientV2().tickers(["tBTCUSD", "tETHUSD"])
+    ClientV2().tickers(["tBTCUSD", "tETHUSD"])
+    assert requests_mock.call_count == 2
+
+    client = ClientV2(cache=True)
+    assert client.tickers(["tBTCUSD", "tETHUSD"]) == client.tickers(["tBTCUSD", "tETHUSD"])
+    assert requests_mock.call_count == 3
+    assert client.cache.metrics()["tickers"]["hits"] == 1
+
+
+def test_per_endpoint_ttls(requests_mock):
+    requests_mock.get("https://api.bitfinex.com/v1/symbols", text='["btcusd"]')
+    requests_mock.get("https://api.bitfinex.com/v1/pubticker/btcusd", text="{}")
+    client = ClientV1(cache_ttls={"ticker": 0})
+    for _ in range(2):
+        client.symbols()
+        client.ticker("btcusd")
+    assert [request.path for request in requests_mock.request_history] == [
+        "/v1/symbols", "/v1/pubticker/btcusd", "/v1/pubticker/btcusd"
+    ]
+
+
+def test_clients_sharing_a_cache_keep_their_own_entries(requests_mock):
+    requests_mock.get("https://api.bitfinex.com/v1/pubticker/btcusd", text='{"mid": "1"}')
+    requests_mock.get(ClientV2().base_url + "v2/ticker/btcusd", text="[2]")
+    requests_mock.get("https://test.bitfinex.com/v2/ticker/btcusd", text="[3]")
+    v1_client = ClientV1(cache=True)
+    v2_client = ClientV2(cache=v1_client.cache)
+    test_client = ClientV2(cache=v1_client.cache)
+    test_client.base_url = "https://test.bitfinex.com/"
+    for _ in range(2):
+        assert v1_client.ticker("btcusd") == {"mid": "1"}
+        assert v2_client.ticker("btcusd") == [2]
+        assert test_client.ticker("btcusd") == [3]
+    assert requests_mock.call_count == 3
+
+
+def test_cache_is_shared_safely_between_threads():
+    cache = TTLCache(maxsize=8)
+
+    def worker(offset):
+        for index in range(2000):
+            cache.set("ticker", (offset + index) % 16, index, ttl=0.0 if index % 2 else 10.0)
+            cache.get("ticker", index % 16)
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(worker, range(8)))
+    assert len(cache) <= 8
+    metrics = cache.metrics()["ticker"]
+    assert metrics["hits"] + metrics["misses"] == 16000
@@ -0,0 +1,34 @@
+"""Tests for the pooled sessions of the sync REST clients"""
+from async_bitfinex.rest import ClientV1, ClientV2
+from async_bitfinex.rest.session import create_session
+
+# pylint: disable=C0111
+
+
+def test_clients_share_settings_through_their_session(requests_mock):
+    requests_mock.get(ClientV2().base_url + "v2/platform/status", text="[1]")
+    client = ClientV2(pool_size=4, retries=0, timeout=1.5)
+    assert client.platform_status() == [1]
+    adapter = client.session.get_adapter("https://")
+    assert adapter._pool_maxsize == 4 and adapter.max_retries.total == 0
+    assert requests_mock.last_request.timeout == 1.5
+
+
+def test_post_has_a_timeout(requests_mock):
+    requests_mock.post(ClientV2().base_url + "v2/auth/r/wallets", text="[]")
+    ClientV2("key", "secret", timeout=2.0).wallets_balance()
+    assert requests_mock.last_request.timeout == 2.0
+
+
+def test_v1_client_uses_given_session(requests_mock):
+    session = create_session()
+    requests_mock.get("https://api.bitfinex.com/v1/symbols", text='["btcusd"]')
+    client = ClientV1(session=session)
+    assert client.session is session
+    assert client.symbols() == ["btcusd"]
+
+
+def test_posts_are_not_retried_after_sending():
+    retry = create_session().get_adapter("https://").max_retries
+    assert not retry.is_retry("POST", 503)
+    assert retry.is_retry("GET", 503)
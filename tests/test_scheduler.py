@@ -0,0 +1,101 @@
+"""Tests for the REST request scheduler"""
+import asyncio
+import threading
+
+from async_bitfinex.rest import ClientV1, ClientV2
+from async_bitfinex.rest.scheduler import (PRIORITY_ACCOUNT, PRIORITY_HISTORY, PRIORITY_MARKET,
+                                           PRIORITY_ORDERS, RequestScheduler)
+
+# pylint: disable=C0111
+
+
+def test_classify_paths():
+    scheduler = RequestScheduler()
+    assert scheduler.classify("v2/auth/w/order/submit") == ("auth", PRIORITY_ORDERS)
+    assert scheduler.classify("v2/auth/r/orders") == ("auth", PRIORITY_ORDERS)
+    assert scheduler.classify("v2/auth/r/trades/tBTCUSD/hist") == ("auth", PRIORITY_HISTORY)
+    assert scheduler.classify("v2/auth/r/wallets") == ("auth", PRIORITY_ACCOUNT)
+    assert scheduler.classify("v2/candles/trade:1m:tBTCUSD/hist") == ("history", PRIORITY_HISTORY)
+    assert scheduler.classify("v2/tickers?symbols=tBTCUSD") == ("tickers", PRIORITY_MARKET)
+    assert scheduler.classify("v2/book/tBTCUSD/P0") == ("public", PRIORITY_MARKET)
+    assert scheduler.classify("order/new") == ("auth", PRIORITY_ORDERS)
+
+
+def test_classify_v1_paths():
+    scheduler = RequestScheduler()
+    assert scheduler.classify("/order/new") == ("auth", PRIORITY_ORDERS)
+    assert scheduler.classify("/order/cancel") == ("auth", PRIORITY_ORDERS)
+    assert scheduler.classify("orders") == ("auth", PRIORITY_ORDERS)
+    assert scheduler.classify("/mytrades") == ("auth", PRIORITY_HISTORY)
+    assert scheduler.classify("/history/movements") == ("auth", PRIORITY_HISTORY)
+    assert scheduler.classify("/offers/hist") == ("auth", PRIORITY_HISTORY)
+    assert scheduler.classify("/balances") == ("auth", PRIORITY_ACCOUNT)
+    assert scheduler.classify("symbols") == ("public", PRIORITY_MARKET)
+
+
+def test_waiting_requests_are_served_by_priority():
+    async def scenario():
+        scheduler = RequestScheduler({"auth": (1200, 1)})
+        granted = []
+
+        async def request(name, path):
+            await scheduler.acquire_async(path)
+            granted.append(name)
+
+        await request("first", "v2/auth/r/wallets")
+        tasks = [asyncio.ensure_future(request("history", "v2/auth/r/ledgers/USD/hist"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(request("order", "v2/auth/w/order/submit")))
+        await asyncio.gather(*tasks)
+        return granted, scheduler.stats()["auth"]
+
+    granted, stats = asyncio.run(scenario())
+    assert granted == ["first", "order", "history"]
+    assert stats["granted"] == 3 and stats["queued"] == 0 and stats["delayed"] == 2
+    assert stats["granted_by_priority"] == {PRIORITY_ACCOUNT: 1, PRIORITY_ORDERS: 1,
+                                            PRIORITY_HISTORY: 1}
+
+
+def test_threads_are_paced():
+    scheduler = RequestScheduler({"public": (1200, 2)})
+    threads = [threading.Thread(target=scheduler.acquire, args=("v2/book/tBTCUSD/P0",))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = scheduler.stats()["public"]
+    assert stats["granted"] == 4 and stats["max_queued"] >= 2
+    assert stats["max_wait"] >= 0.05
+
+
+def test_cancelled_waiters_leave_the_queue():
+    async def scenario():
+        scheduler = RequestScheduler({"public": (60, 1)})
+        await scheduler.acquire_async("v2/platform/status")
+        waiting = asyncio.ensure_future(scheduler.acquire_async("v2/platform/status"))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        return scheduler.stats()["public"]
+
+    stats = asyncio.run(scenario())
+    assert (stats["queued"], stats["cancelled"]) == (0, 1)
+
+
+def test_clients_acquire_before_sending(requests_mock):
+    requests_mock.get(ClientV2().base_url + "v2/platform/status", text="[1]")
+    requests_mock.post(ClientV2().base_url + "v2/auth/r/wallets", text="[]")
+    scheduler = RequestScheduler()
+    client = ClientV2("key", "secret", scheduler=scheduler)
+    client.platform_status()
+    client.wallets_balance()
+    stats = scheduler.stats()
+    assert stats["public"]["granted"] == 1 and stats["auth"]["granted"] == 1
+
+
+def test_v1_orders_are_classified_as_orders(requests_mock):
+    requests_mock.post("https://api.bitfinex.com/v1//order/cancel", text="{}")
+    scheduler = RequestScheduler()
+    ClientV1("key", "secret", scheduler=scheduler).delete_order(1)
+    assert scheduler.stats()["auth"]["granted_by_priority"] == {PRIORITY_ORDERS: 1}
@@ -0,0 +1,64 @@
+"""Tests for sharing concurrent identical requests"""
+import asyncio
+import threading
+import time
+
+from async_bitfinex.rest.singleflight import AsyncSingleFlight, SingleFlight, request_key
+
+# pylint: disable=C0111
+
+
+def test_threads_share_one_call():
+    flight, calls, results = SingleFlight(), [], []
+
+    def slow_request():
+        calls.append(1)
+        time.sleep(0.05)
+        return ["ticker"]
+
+    threads = [threading.Thread(target=lambda: results.append(
+        flight.do(request_key("v2/ticker/tBTCUSD"), slow_request))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and (flight.calls, flight.shared) == (1, 7)
+    assert all(result is results[0] for result in results)
+
+
+def test_errors_are_shared_and_not_remembered():
+    async def scenario():
+        flight = AsyncSingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("down")
+
+        results = await asyncio.gather(flight.do("key", failing), flight.do("key", failing),
+                                       return_exceptions=True)
+        return results, await flight.do("key", lambda: asyncio.sleep(0)), flight.calls
+
+    results, later, calls = asyncio.run(scenario())
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert later is None and calls == 2
+
+
+def test_cancelled_caller_does_not_cancel_shared_call():
+    async def scenario():
+        flight = AsyncSingleFlight()
+
+        async def request():
+            await asyncio.sleep(0.02)
+            return 1
+        first = asyncio.ensure_future(flight.do("key", request))
+        second = asyncio.ensure_future(flight.do("key", request))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_request_key_ignores_parameter_order():
+    assert request_key("path", {"a": 1, "b": 2}) == request_key("path", {"b": 2, "a": 1})
+    assert request_key("path", {"a": 1}) != request_key("path", {"a": 2})
@@ -0,0 +1,210 @@
+"""Tests for account state tables built from auth channel messages"""
+import asyncio
+
+import pytest
+from async_bitfinex.rest import ClientV2
+from async_bitfinex.websockets.exceptions import OrderClosedError
+from async_bitfinex.websockets.state import (
+    FillTable, MarginInfoTable, OrderTable, PositionTable, WalletTable
+)
+
+# pylint: disable=W0621,C0111
+
+
+def order(order_id, cid, symbol="tBTCUSD", gid=None, amount=1.0, price=100.0):
+    data = [None] * 32
+    data[0], data[1], data[2], data[3] = order_id, gid, cid, symbol
+    data[6], data[7], data[8], data[13], data[16] = amount, amount, "LIMIT", "ACTIVE", price
+    return data
+
+
+@pytest.fixture
+def orders():
+    table = OrderTable()
+    table.snapshot([order(1, 11, gid=5), order(2, 12, "tETHUSD", gid=5)])
+    return table
+
+
+def test_order_snapshot_is_indexed(orders):
+    assert len(orders) == 2
+    assert orders.get(1)[2] == 11
+    assert orders.get_by_cid(12)[0] == 2
+    assert {o[0] for o in orders.by_gid(5)} == {1, 2}
+    assert [o[0] for o in orders.by_symbol("tETHUSD")] == [2]
+
+
+def test_order_update_reindexes(orders):
+    orders.upsert(order(1, 11, symbol="tETHUSD", amount=0.5))
+    assert orders.get(1)[6] == 0.5
+    assert orders.by_symbol("tBTCUSD") == []
+    assert orders.by_gid(5) == [orders.get(2)]
+
+
+def test_order_close_removes_order(orders):
+    orders.remove(order(1, 11))
+    assert 1 not in orders
+    assert orders.get_by_cid(11) is None
+    assert orders.by_symbol("tBTCUSD") == []
+
+
+def test_order_change_events(orders):
+    events = []
+    orders.add_listener(lambda event, item: events.append(event))
+    orders.upsert(order(3, 13))
+    orders.upsert(order(3, 13, amount=0.5))
+    orders.remove(order(3, 13))
+    assert events == ["new", "update", "close"]
+
+
+class AccountCache:
+
+    def __init__(self):
+        self.wallets = WalletTable()
+        self.positions = PositionTable()
+        self.margin = MarginInfoTable()
+
+
+def test_wallet_snapshot_and_update():
+    wallets = WalletTable()
+    wallets.snapshot([["exchange", "USD", 10.0, 0, 10.0], ["margin", "BTC", 1.0, 0, 1.0]])
+    wallets.update(["exchange", "USD", 5.0, 0, 4.0])
+    assert wallets.get("exchange", "USD")[2] == 5.0
+    assert len(wallets.as_list()) == 2
+
+
+def test_position_lifecycle():
+    positions = PositionTable()
+    positions.snapshot([])
+    positions.upsert(["tBTCUSD", "ACTIVE", 1.0, 100.0])
+    assert positions.get("tBTCUSD")[2] == 1.0
+    positions.remove(["tBTCUSD", "CLOSED", 0.0, 100.0])
+    assert positions.as_list() == []
+
+
+def test_margin_info_is_fresh_per_key():
+    margin = MarginInfoTable()
+    margin.seen()
+    margin.update(["base", [1, 2, 3, 4, 5]])
+    assert margin.is_fresh(10, "base")
+    assert not margin.is_fresh(10, "tBTCUSD")
+
+
+def test_margin_info_ages_without_miu():
+    margin = MarginInfoTable()
+    margin.update(["base", [1, 2, 3, 4, 5]])
+    margin._received["base"] -= 60
+    # Heartbeats keep the connection alive but do not refresh margin info
+    margin.seen()
+    assert not margin.is_fresh(10, "base")
+
+
+def test_table_is_not_fresh_without_snapshot():
+    wallets = WalletTable()
+    wallets.seen()
+    assert not wallets.is_fresh(10)
+
+
+def test_rest_read_through_answers_from_fresh_cache(requests_mock):
+    cache = AccountCache()
+    cache.wallets.snapshot([["exchange", "USD", 10.0, 0, 10.0]])
+    cache.margin.update(["sym", "tBTCUSD", [1, 2, 3, 4]])
+    client = ClientV2("key", "secret", account_cache=cache)
+    assert client.wallets_balance() == [["exchange", "USD", 10.0, 0, 10.0]]
+    assert client.margin_info("tBTCUSD") == ["sym", "tBTCUSD", [1, 2, 3, 4]]
+    assert not requests_mock.request_history
+    # Answers are copies, changing them does not change the cache
+    client.wallets_balance()[0][2] = 0.0
+    client.margin_info("tBTCUSD")[2][0] = 0
+    assert cache.wallets.get("exchange", "USD")[2] == 10.0
+    assert cache.margin.get("tBTCUSD")[2][0] == 1
+
+
+def test_rest_read_through_falls_back_when_stale(requests_mock):
+    requests_mock.post(ClientV2().base_url + "v2/auth/r/positions", text="[]")
+    cache = AccountCache()
+    cache.positions.snapshot([["tBTCUSD", "ACTIVE", 1.0, 100.0]])
+    cache.positions.last_seen -= 60
+    client = ClientV2("key", "secret", account_cache=cache)
+    assert client.active_positions() == []
+    assert len(requests_mock.request_history) == 1
+
+
+def trade(trade_id, order_id, amount, price, fee=None, cid=None):
+    return [trade_id, "tBTCUSD", 0, order_id, amount, price, "EXCHANGE LIMIT", price, 1,
+            fee, None if fee is None else "USD", cid]
+
+
+def test_fill_table_counts_each_trade_once_and_adds_fees():
+    fills = FillTable()
+    fills.execution(trade(1, 10, 0.5, 100.0, cid=7))
+    fills.execution_update(trade(1, 10, 0.5, 100.0, fee=-0.1, cid=7))
+    fills.execution_update(trade(2, 10, 1.5, 104.0, fee=-0.3, cid=7))
+    fills.execution(trade(2, 10, 1.5, 104.0, cid=7))
+    fill = fills.get_by_cid(7)
+    assert fill.filled == 2.0
+    assert fill.price == 103.0
+    assert fill.fees == pytest.approx(-0.4)
+    assert fill.fee_currency == "USD"
+
+
+def test_fill_table_waits_for_linked_cid():
+    async def scenario():
+        fills = FillTable()
+        fills.link(10, 7)
+        half, whole = fills.wait_filled(7, "-0.5"), fills.wait_filled(7, "-1")
+        fills.execution(trade(1, 10, -0.5, 100.0))
+        await asyncio.sleep(0)
+        return half.done(), whole.done(), await half
+
+    half_done, whole_done, fill = asyncio.run(scenario())
+    assert half_done and not whole_done
+    assert fill.order_id == 10 and fill.cid == 7
+
+
+def closed(order_id, cid, amount_orig, amount, status="CANCELED"):
+    data = order(order_id, cid, amount=amount)
+    data[7], data[13] = amount_orig, status
+    return data
+
+
+def test_fill_waiters_fail_when_order_closes_partly_filled():
+    async def scenario():
+        fills = FillTable()
+        fills.link(10, 7)
+        whole, half = fills.wait_filled(7, "1"), fills.wait_filled(7, "0.4")
+        # The close arrives before the last trade of the executed 0.5
+        fills.close(closed(10, 7, 1.0, 0.5, "PARTIALLY FILLED @ 100(0.5), CANCELED"))
+        fills.execution(trade(1, 10, 0.2, 100.0))
+        assert not whole.done()
+        fills.execution(trade(2, 10, 0.3, 100.0))
+        with pytest.raises(OrderClosedError) as error:
+            await whole
+        assert (await half).filled == 0.5
+        assert error.value.fill.filled == 0.5
+        # Waiting after the close fails at once
+        with pytest.raises(OrderClosedError):
+            await fills.wait_filled(7, "1")
+
+    asyncio.run(scenario())
+
+
+def test_unfilled_order_close_fails_waiters():
+    async def scenario():
+        fills = FillTable()
+        fills.link(10, 7)
+        waiter = fills.wait_filled(7, "1")
+        fills.close(closed(10, 7, 1.0, 1.0))
+        with pytest.raises(OrderClosedError) as error:
+            await waiter
+        assert error.value.fill is None
+
+    asyncio.run(scenario())
+
+
+def test_closed_orders_are_evicted_after_retention():
+    fills = FillTable(retention=0.0)
+    fills.link(10, 7)
+    fills.execution(trade(1, 10, 1.0, 100.0))
+    fills.close(closed(10, 7, 1.0, 0.0, "EXECUTED @ 100(1.0)"))
+    assert fills.get(10) is None and fills.get_by_cid(7) is None
+    assert len(fills) == 0 and not fills._cids and not fills._order_cids
@@ -0,0 +1,48 @@
+"""Tests for batching ticker requests into tickers calls"""
+import asyncio
+
+from async_bitfinex.rest import ClientV2
+from async_bitfinex.rest.ticker_batcher import TickerBatcher
+
+# pylint: disable=C0111
+
+
+class FakeAsyncClient:
+
+    def __init__(self):
+        self.calls = []
+
+    async def tickers(self, symbol_list):
+        self.calls.append(symbol_list)
+        return [[symbol, float(index)] for index, symbol in enumerate(symbol_list)
+                if symbol != "tMISSING"]
+
+
+def test_requests_in_a_window_share_one_tickers_call():
+    async def scenario():
+        client = FakeAsyncClient()
+        batcher = TickerBatcher(client, batch_size=2)
+        results = await asyncio.gather(
+            batcher.ticker("tBTCUSD"), batcher.ticker("tETHUSD"),
+            batcher.ticker("tBTCUSD"), batcher.ticker("tMISSING"),
+            return_exceptions=True
+        )
+        return client.calls, results, batcher.requests, batcher.batches
+
+    calls, results, requests, batches = asyncio.run(scenario())
+    assert calls == [["tBTCUSD", "tETHUSD"], ["tMISSING"]]
+    assert results[:3] == [[0.0], [1.0], [0.0]]
+    assert isinstance(results[3], KeyError)
+    assert (requests, batches) == (4, 2)
+
+
+def test_sync_client_runs_in_executor(requests_mock):
+    requests_mock.get(ClientV2().base_url + "v2/tickers?symbols=tBTCUSD,fUSD",
+                      text='[["tBTCUSD", 1, 2], ["fUSD", 3, 4]]')
+
+    async def scenario():
+        batcher = TickerBatcher(ClientV2())
+        return await asyncio.gather(batcher.ticker("tBTCUSD"), batcher.ticker("fUSD"))
+
+    assert asyncio.run(scenario()) == [[1, 2], [3, 4]]
+    assert requests_mock.call_count == 1
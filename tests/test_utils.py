@@ -1,5 +1,6 @@
 import pytest
-from bitfinex import utils
+from datetime import datetime
+from async_bitfinex import utils
 
 def test_order_symbol_adds_t_to_symbol():
     assert utils.order_symbol("BTCUSD") == "tBTCUSD"
@@ -24,3 +25,16 @@ def test_order_symbol_capital_letters():
 
 def test_order_symbol_passes_on_unknown_symbols_unchanged():
     assert utils.order_symbol("custom_sym") == "custom_sym"
+
+def test_create_cid_is_unique_and_increasing():
+    cids = [utils.create_cid() for _ in range(10000)]
+    assert cids == sorted(set(cids))
+
+def test_create_cid_is_compatible_with_cid_to_date():
+    assert utils.cid_to_date(utils.create_cid()) == datetime.utcnow().strftime("%Y-%m-%d")
+
+def test_cid_generator_workers_do_not_collide():
+    generators = [utils.CidGenerator(worker_id, 4) for worker_id in range(4)]
+    cids = [generator() for _ in range(1000) for generator in generators]
+    assert len(set(cids)) == len(cids)
+    assert all(cid % 4 == 1 for cid in [generators[1]() for _ in range(10)])
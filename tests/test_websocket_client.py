@@ -0,0 +1,461 @@
+"""Tests for the v2 websocket client, using a fake auth connection"""
+import asyncio
+import json
+
+import pytest
+
+from async_bitfinex import WssClient
+from async_bitfinex.websockets.exceptions import OrderClosedError, RequestError
+from async_bitfinex.websockets.rate_limiter import RateLimitExceeded
+
+# pylint: disable=W0621,C0111
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, payload):
+        self.sent.append(json.loads(payload))
+
+
+def run(coroutine_function):
+    """Runs a test coroutine with an authenticated client on a fresh loop"""
+    async def with_client():
+        client = WssClient("key", "secret")
+        client.connections["auth"] = FakeConnection()
+        return await coroutine_function(client, client.connections["auth"])
+    return asyncio.run(with_client())
+
+
+def test_request_calc_batches_and_deduplicates():
+    async def scenario(client, connection):
+        client.request_calc("margin_base", "position_tBTCUSD")
+        client.request_calc("margin_base", *[f"margin_sym_t{i}USD" for i in range(35)])
+        await asyncio.sleep(0.1)
+        return connection.sent
+
+    sent = run(scenario)
+    assert [len(message[3]) for message in sent] == [30, 7]
+    assert sent[0][:2] == [0, "calc"]
+    assert sent[0][3][:2] == [["margin_base"], ["position_tBTCUSD"]]
+
+
+def test_request_calc_resolves_from_auth_messages():
+    async def scenario(client, _):
+        result = client.request_calc("margin_sym_tBTCUSD", "wallet_exchange_USD", timeout=1)
+        await asyncio.sleep(0.1)
+        client.futures([0, "miu", ["sym", "tBTCUSD", [1, 2, 3]]])
+        client.futures([0, "wu", ["exchange", "USD", 10.0, 0, 10.0]])
+        return await result
+
+    margin, wallet = run(scenario)
+    assert margin == ["sym", "tBTCUSD", [1, 2, 3]]
+    assert wallet[:2] == ["exchange", "USD"]
+
+
+def test_calc_limits_the_calculations_sent():
+    async def scenario(client, connection):
+        with pytest.raises(ValueError):
+            client.calc([f"margin_sym_t{i}USD" for i in range(20)],
+                        [f"position_t{i}USD" for i in range(11)])
+        client.calc(*[[f"margin_sym_t{i}USD"] for i in range(30)])
+        await asyncio.sleep(0)
+        return connection.sent
+
+    assert [len(message[3]) for message in run(scenario)] == [30]
+
+
+def test_request_calc_fails_without_auth_connection():
+    async def scenario():
+        client = WssClient("key", "secret")
+        result = client.request_calc("margin_base", timeout=1)
+        return await asyncio.gather(result, return_exceptions=True)
+
+    assert isinstance(asyncio.run(scenario())[0], KeyError)
+
+
+def test_auth_messages_update_order_table():
+    async def scenario(client, _):
+        client._update_state([0, "on", [1, None, 11, "tBTCUSD"] + [None] * 28])
+        client._update_state([0, "hb"])
+        return client.orders.get_by_cid(11)
+
+    assert run(scenario)[0] == 1
+
+
+def test_send_without_auth_connection_raises_in_caller():
+    async def scenario():
+        client = WssClient("key", "secret")
+        with pytest.raises(KeyError):
+            client.new_order("LIMIT", "BTCUSD", "1", "1", cid=5)
+        with pytest.raises(KeyError):
+            client.cancel_order(order_id=1)
+        return len(client.futures)
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_malformed_state_message_is_skipped(caplog):
+    async def scenario(client, _):
+        client._update_state([0, "os", None])
+        client._update_state([0, "ps", "unexpected"])
+        client._update_state([0, "on", [1, None, 11, "tBTCUSD"] + [None] * 28])
+        return client.orders.get_by_cid(11)
+
+    assert run(scenario)[0] == 1
+    assert len(caplog.records) == 2
+
+
+def order_notification(notification_type, order_id, cid, status="SUCCESS"):
+    return [0, "n", [0, notification_type, None, None,
+                     [order_id, None, cid, "tBTCUSD"] + [None] * 28,
+                     None, status, "Submitting"]]
+
+
+def order_message(message_type, order_id, cid):
+    order = [order_id, None, cid, "tBTCUSD"] + [None] * 28
+    order[13] = "ACTIVE"
+    return [0, message_type, order]
+
+
+def test_multi_op_chunks_operations():
+    async def scenario(client, connection):
+        handle = client.multi_op(
+            [client.new_order_op("LIMIT", "BTCUSD", "1", str(100 + i)) for i in range(80)]
+            + [{"id": 1}, {"id": 2, "price": "10"}, {"id": [3, 4]}]
+        )
+        await asyncio.gather(*handle.send_tasks)
+        return handle, connection.sent
+
+    handle, sent = run(scenario)
+    assert [len(message[3]) for message in sent] == [75, 8]
+    assert all(message[1] == "ox_multi" for message in sent)
+    assert [operation[0] for operation in sent[1][3]] == ["on"] * 5 + ["oc", "ou", "oc_multi"]
+    assert len(handle) == 83
+
+
+def test_multi_op_handle_resolves_when_all_confirmed():
+    async def scenario(client, _):
+        handle = client.multi_op([["on", client.new_order_op("LIMIT", "BTCUSD", "1", "1", cid=7)],
+                                  ["oc", {"id": 8}]], timeout=1)
+        client.futures([0, "n", [0, "ox_multi-req", None, None, [
+            order_notification("on-req", 1, 7)[2],
+            order_notification("oc-req", 8, None)[2],
+        ], None, "SUCCESS", "Submitting 2 orders."]])
+        requests = await handle.request_future
+        client.futures(order_message("on", 1, 7))
+        client.futures(order_message("oc", 8, None))
+        return requests, await handle
+
+    requests, confirmations = run(scenario)
+    assert [request["id"] for request in requests] == [1, 8]
+    assert [confirmation["id"] for confirmation in confirmations] == [1, 8]
+
+
+def limit_sends(client, allowed):
+    """Makes the client fail fast after sending ``allowed`` inputs"""
+    send_auth = client._send_auth
+    sent = []
+
+    def limited_send_auth(payload, input_type, timings=None):
+        if len(sent) >= allowed:
+            raise RateLimitExceeded(input_type, 1.0)
+        sent.append(payload)
+        return send_auth(payload, input_type, timings)
+
+    client._send_auth = limited_send_auth
+
+
+def test_multi_op_input_failing_to_send_leaves_no_futures():
+    async def scenario(client, _):
+        limit_sends(client, 1)
+        operations = [client.new_order_op("LIMIT", "BTCUSD", "1", str(100 + i)) for i in range(75)]
+        with pytest.raises(RateLimitExceeded) as raised:
+            client.multi_op(operations + [{"id": 1, "price": "10"}], timeout=1)
+        return raised.value.handle, list(client.futures), 1 in client.amend_coalescer
+
+    handle, future_ids, in_flight = run(scenario)
+    assert len(handle) == 75
+    assert not any(future_id.startswith("ou") for future_id in future_ids)
+    assert not in_flight
+
+
+def test_multi_op_input_rejected_as_a_whole_fails_its_operations():
+    async def scenario(client, _):
+        handle = client.multi_op([["on", client.new_order_op("LIMIT", "BTCUSD", "1", "1", cid=7)],
+                                  {"id": 8, "price": "10"}], timeout=1)
+        client.futures([0, "n", [0, "ox_multi-req", None, None, None, None, "ERROR",
+                                 "Invalid multi-op"]])
+        results = await asyncio.gather(handle.request_future, handle.confirm_future,
+                                       return_exceptions=True)
+        await asyncio.sleep(0)
+        return results, list(client.futures), 8 in client.amend_coalescer
+
+    results, future_ids, in_flight = run(scenario)
+    assert [type(result) for result in results] == [RequestError, RequestError]
+    assert future_ids == []
+    assert not in_flight
+
+
+def test_multi_order_returns_cids():
+    async def scenario(client, _):
+        return await client.multi_order([
+            client.new_order_op("LIMIT", "BTCUSD", "1", "1", cid=5),
+            {"cid": 6, "cid_date": "2019-01-01"},
+        ])
+
+    assert run(scenario) == [5, 6]
+
+
+def test_multi_op_cancel_by_gid_and_all_waits_for_the_cancels():
+    async def scenario(client, _):
+        orders = [order_message("on", order_id, order_id + 10)[2] for order_id in (1, 2, 3)]
+        orders[0][1] = orders[1][1] = 5
+        client.orders.snapshot(orders)
+        results = []
+        for operation, cancelled in (({"gid": [5]}, orders[:2]), ({"all": 1}, orders)):
+            handle = client.multi_op([operation], timeout=1)
+            await asyncio.sleep(0)
+            results.append(handle.confirm_future.done())
+            client.futures([0, "n", [0, "ox_multi-req", None, None, [
+                [0, "oc_multi-req", None, None, cancelled, None, "SUCCESS", ""]
+            ], None, "SUCCESS", ""]])
+            await asyncio.sleep(0)
+            results.append(handle.confirm_future.done())
+            for order in cancelled:
+                client.futures([0, "oc", order])
+            results.append(await handle)
+        return results
+
+    gid_waiting, gid_acknowledged, by_gid, all_waiting, all_acknowledged, by_all = run(scenario)
+    assert not any((gid_waiting, gid_acknowledged, all_waiting, all_acknowledged))
+    assert by_gid[0][0]["status"] == "SUCCESS"
+    assert [confirmation["id"] for confirmation in by_gid[0][1:]] == [1, 2]
+    assert [confirmation["id"] for confirmation in by_all[0][1:]] == [1, 2, 3]
+
+
+def test_multi_op_cancel_all_waits_for_its_own_notification():
+    async def scenario(client, _):
+        client.orders.snapshot([order_message("on", 1, None)[2]])
+        handle = client.multi_op([{"all": 1}], timeout=1)
+        # The notification of another oc_multi input does not resolve it
+        client.futures([0, "n", [0, "oc_multi-req", None, None, [], None, "SUCCESS", ""]])
+        await asyncio.sleep(0)
+        waiting = handle.request_future.done()
+        client.futures([0, "n", [0, "ox_multi-req", None, None, [
+            [0, "oc_multi-req", None, None, [], None, "SUCCESS", ""]
+        ], None, "SUCCESS", ""]])
+        return waiting, await handle.request_future
+
+    waiting, requests = run(scenario)
+    assert not waiting
+    assert requests[0][0]["status"] == "SUCCESS"
+
+
+def test_multi_order_futures_time_out():
+    async def scenario(client, _):
+        await client.multi_order([client.new_order_op("LIMIT", "BTCUSD", "1", "1", cid=5)],
+                                 timeout=0.01)
+        future = client.futures["on_5"]
+        await asyncio.sleep(0.02)
+        return future
+
+    assert isinstance(run(scenario).exception(), TimeoutError)
+
+
+def test_set_ladder_sends_minimal_operations():
+    async def scenario(client, connection):
+        client.orders.snapshot([order_message("on", 1, 11)[2], order_message("on", 2, 12)[2]])
+        for order, price in zip(client.orders, (100.0, 101.0)):
+            order[6], order[8], order[16] = 1.0, "EXCHANGE LIMIT", price
+        handle = client.set_ladder("BTCUSD", [("100", "1"), ("102", "1"), ("103", "1")])
+        await asyncio.gather(*handle.send_tasks)
+        return connection.sent
+
+    sent = run(scenario)
+    assert len(sent) == 1
+    assert [operation[0] for operation in sent[0][3]] == ["ou", "on"]
+
+
+def test_cancel_orders_by_predicate():
+    async def scenario(client, connection):
+        orders = []
+        for order_id in range(200):
+            order = order_message("on", order_id, order_id + 1000)[2]
+            order[4], order[6], order[16] = 0, 1.0 if order_id % 2 else -1.0, float(order_id)
+            orders.append(order)
+        client.orders.snapshot(orders)
+        handle = client.cancel_orders(symbol="BTCUSD", side="buy", price_range=(0, 160), timeout=1)
+        await asyncio.gather(*handle.send_tasks)
+        for message in connection.sent:
+            cancelled = [orders[order_id] for order_id in message[3]["id"]]
+            client.futures([0, "n", [0, "oc_multi-req", None, None, cancelled, None, "SUCCESS", ""]])
+        for order in orders[1:161:2]:
+            client.futures([0, "oc", order])
+        return connection.sent, await handle.request_future, await handle
+
+    sent, requests, confirmations = run(scenario)
+    assert [message[1] for message in sent] == ["oc_multi", "oc_multi"]
+    assert [len(message[3]["id"]) for message in sent] == [75, 5]
+    assert [request["status"] for request in requests] == ["SUCCESS", "SUCCESS"]
+    assert len(confirmations) == 2
+
+
+def test_cancel_orders_input_rejected_as_a_whole_fails_its_cancels():
+    async def scenario(client, _):
+        client.orders.snapshot([order_message("on", order_id, None)[2] for order_id in (1, 2)])
+        handle = client.cancel_orders(all=True, timeout=1)
+        client.futures([0, "n", [0, "oc_multi-req", None, None, None, None, "ERROR", "Invalid"]])
+        results = await asyncio.gather(handle.request_future, handle.confirm_future,
+                                       return_exceptions=True)
+        await asyncio.sleep(0)
+        return results, list(client.futures)
+
+    results, future_ids = run(scenario)
+    assert [type(result) for result in results] == [RequestError, RequestError]
+    assert future_ids == []
+
+
+def test_cancel_orders_batch_failing_to_send_returns_the_sent_batches():
+    async def scenario(client, _):
+        client.orders.snapshot([order_message("on", order_id, None)[2] for order_id in range(100)])
+        limit_sends(client, 1)
+        with pytest.raises(RateLimitExceeded) as raised:
+            client.cancel_orders(all=True, timeout=1)
+        return raised.value.handle, list(client.futures)
+
+    handle, future_ids = run(scenario)
+    assert len(handle) == 1
+    assert handle.handles[0]["id"] == list(range(75))
+    assert "oc_75" not in future_ids
+
+
+def test_cancel_orders_without_filters_needs_all():
+    async def scenario(client, connection):
+        client.orders.snapshot([order_message("on", order_id, None)[2] for order_id in (1, 2)])
+        with pytest.raises(AssertionError):
+            client.cancel_orders()
+        with pytest.raises(AssertionError):
+            client.cancel_orders(symbol="BTCUSD", all=True)
+        handle = client.cancel_orders(all=True)
+        await asyncio.gather(*handle.send_tasks)
+        return connection.sent
+
+    assert [message[3] for message in run(scenario)] == [{"id": [1, 2]}]
+
+
+def test_update_order_coalesces_while_in_flight():
+    async def scenario(client, connection):
+        first = client.update_order(id=1, price="100", timeout=1)
+        second = client.update_order(id=1, delta="0.5", timeout=1)
+        third = client.update_order(id=1, price="101", delta="0.25", timeout=1)
+        await asyncio.sleep(0)
+        sent_before_ack = len(connection.sent)
+        client.futures(order_notification("ou-req", 1, None))
+        client.futures(order_message("ou", 1, None))
+        await asyncio.sleep(0)
+        client.futures(order_notification("ou-req", 1, None))
+        client.futures(order_message("ou", 1, None))
+        results = await asyncio.gather(*[handle["confirm_future"]
+                                         for handle in (first, second, third)])
+        return sent_before_ack, connection.sent, results, 1 in client.amend_coalescer
+
+    sent_before_ack, sent, results, in_flight = run(scenario)
+    assert sent_before_ack == 1
+    assert [message[3] for message in sent] == [
+        {"id": 1, "price": "100"}, {"id": 1, "delta": "0.75", "price": "101"}
+    ]
+    assert [result["id"] for result in results] == [1, 1, 1]
+    assert not in_flight
+
+
+def test_update_order_sends_pending_after_rejection():
+    async def scenario(client, connection):
+        first = client.update_order(id=1, amount="1", timeout=1)
+        second = client.update_order(id=1, delta="-0.5", timeout=1)
+        client.futures(order_notification("ou-req", 1, None, status="ERROR"))
+        await asyncio.sleep(0)
+        client.futures(order_notification("ou-req", 1, None))
+        client.futures(order_message("ou", 1, None))
+        first_results = await asyncio.gather(first["request_future"], first["confirm_future"],
+                                             return_exceptions=True)
+        return connection.sent, first_results, await second["confirm_future"]
+
+    sent, first_results, confirm = run(scenario)
+    assert [message[3] for message in sent] == [{"id": 1, "amount": "1"}, {"id": 1, "delta": "-0.5"}]
+    # The rejected update fails its caller, the pending one is still sent
+    assert all(isinstance(result, RequestError) for result in first_results)
+    assert confirm["id"] == 1
+
+
+def test_multi_op_updates_are_coalesced_with_update_order():
+    async def scenario(client, connection):
+        single = client.update_order(id=1, price="100", timeout=1)
+        handle = client.multi_op([{"id": 1, "price": "101"}, {"id": 2, "price": "200"}],
+                                 timeout=1)
+        later = client.update_order(id=2, price="201", timeout=1)
+        await asyncio.sleep(0)
+        sent_before_ack = [message[1] for message in connection.sent]
+        for order_id in (1, 2):
+            client.futures(order_notification("ou-req", order_id, None))
+            client.futures(order_message("ou", order_id, None))
+        await asyncio.sleep(0)
+        for order_id in (1, 2):
+            client.futures(order_notification("ou-req", order_id, None))
+            client.futures(order_message("ou", order_id, None))
+        await asyncio.gather(single["confirm_future"], handle.confirm_future,
+                             later["confirm_future"])
+        return sent_before_ack, connection.sent
+
+    sent_before_ack, sent = run(scenario)
+    assert sent_before_ack == ["ou", "ox_multi"]
+    assert sent[1][3] == [["ou", {"id": 2, "price": "200"}]]
+    assert [message[3] for message in sent[2:]] == [{"id": 1, "price": "101"},
+                                                    {"id": 2, "price": "201"}]
+
+
+def test_order_latency_is_tracked_per_symbol_and_type():
+    async def scenario(client, _):
+        handle = client.new_order("EXCHANGE LIMIT", "BTCUSD", "1", "100", cid=9, timeout=1)
+        await asyncio.sleep(0.01)
+        client.futures(order_notification("on-req", 1, 9))
+        client.futures(order_message("on", 1, 9))
+        await handle["confirm_future"]
+        await asyncio.sleep(0)
+        return client.latency.report()
+
+    report = run(scenario)
+    assert set(report) == {("on", "tBTCUSD", "EXCHANGE LIMIT", stage)
+                           for stage in ("send", "ack", "confirm")}
+    assert all(summary["count"] == 1 for summary in report.values())
+
+
+def test_new_order_handle_waits_for_fill():
+    async def scenario(client, _):
+        handle = client.new_order("EXCHANGE LIMIT", "BTCUSD", "2", "100", cid=9)
+        client._update_state(order_message("on", 1, 9))
+        for trade_id, amount in ((1, 1.0), (2, 1.0)):
+            client._update_state([0, "te", [trade_id, "tBTCUSD", 0, 1, amount, 100.0,
+                                            "EXCHANGE LIMIT", 100.0, 1, None, None]])
+        return handle["cid"], await handle.filled()
+
+    cid, fill = run(scenario)
+    assert cid == 9
+    assert (fill.filled, fill.price) == (2.0, 100.0)
+
+
+def test_new_order_handle_fails_when_order_is_canceled():
+    async def scenario(client, _):
+        handle = client.new_order("EXCHANGE LIMIT", "BTCUSD", "2", "100", cid=9)
+        client._update_state(order_message("on", 1, 9))
+        canceled = order_message("oc", 1, 9)
+        canceled[2][6], canceled[2][7], canceled[2][13] = 2.0, 2.0, "CANCELED"
+        client._update_state(canceled)
+        try:
+            await handle.filled()
+        except OrderClosedError as error:
+            return error.fill
+
+    assert run(scenario) is None